@@ -18,6 +18,7 @@ from kivymd.uix.label import MDLabel
 from kivymd.uix.boxlayout import MDBoxLayout
 from kivymd.uix.card import MDCard
 from kivymd.uix.button import MDButton, MDButtonText
+import os
 import socketio
 import threading
 from datetime import datetime
@@ -27,6 +28,7 @@ from datetime import datetime
 # ============================================================================
 
 SERVER_URL = "http://localhost:5000"  # Change to your server IP (e.g., "http://192.168.1.100:5000")
+AUTH_TOKEN = os.getenv("AERIUM_TOKEN")  # Access token from /api/auth/login; readings are only pushed to authenticated clients
 
 # ============================================================================
 # MAIN SCREEN
@@ -220,7 +222,7 @@ class CO2MonitorScreen(MDScreen):
         """Connect to WebSocket server (background thread)"""
         try:
             print(f"📡 Attempting connection to {SERVER_URL}...")
-            self.sio.connect(SERVER_URL)
+            self.sio.connect(SERVER_URL, auth={'token': AUTH_TOKEN} if AUTH_TOKEN else None)
         except Exception as e:
             print(f"❌ Connection error: {e}")
             error_msg = str(e)  # Capture error message before lambda
@@ -0,0 +1,354 @@
+"""
+Threshold alerts tracked as episodes rather than one alert per reading.
+
+Every (sensor, metric) pair runs a small state machine:
+
+    idle    --breach-->                          active  (row written, email queued)
+    active  --breach-->                          active  (peak and duration updated)
+    active  --back past threshold +- band-->     cleared (row resolved)
+    cleared --breach within ALERT_COOLDOWN-->    active  (same row reopened, no email)
+    cleared --cooldown elapsed-->                idle
+
+The hysteresis band (ALERT_HYSTERESIS_*) keeps a value hovering around the
+threshold from flapping between episodes. State lives in memory per process
+and is rebuilt from `alert_history` at startup by `rebuild_alert_state`.
+
+Readings are evaluated inside `evaluation`, which holds the locks of the
+sensors' (sensor, metric) keys, works on copies of their episodes and
+publishes them to memory only once the alert rows are committed. A rolled
+back transaction leaves the in-memory state untouched.
+"""
+from database import db, AlertHistory, User
+from email_service import queue_alert_email
+from alert_stats import invalidate_alert_stats
+from flask import current_app
+from datetime import datetime, timedelta
+from sqlalchemy import or_
+from contextlib import contextmanager
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Seconds between writes of an active episode whose peak did not change
+UPDATE_INTERVAL = 60
+
+# metric -> (alert_type, email label, hysteresis config key)
+RULES = {
+    'co2': ('high_co2', 'High CO2', 'ALERT_HYSTERESIS_CO2'),
+    'temperature': ('temperature_alert', 'Temperature Alert', 'ALERT_HYSTERESIS_TEMP'),
+    'humidity': ('high_humidity', 'High Humidity', 'ALERT_HYSTERESIS_HUMIDITY'),
+}
+
+_episodes = {}
+# Guards _episodes and _key_locks only; evaluation holds the per-key locks
+_lock = threading.Lock()
+_key_locks = {}
+
+
+class Episode:
+    """In-memory state of one (sensor, metric) alert episode"""
+
+    __slots__ = ('history_id', 'direction', 'threshold', 'peak', 'started_at',
+                 'written_at', 'cleared_at')
+
+    def __init__(self, history_id, direction, threshold, peak, started_at, cleared_at=None):
+        self.history_id = history_id
+        self.direction = direction  # 'high' or 'low'
+        self.threshold = threshold
+        self.peak = peak
+        self.started_at = started_at
+        self.written_at = started_at
+        self.cleared_at = cleared_at
+
+    def copy(self):
+        other = Episode(self.history_id, self.direction, self.threshold, self.peak,
+                        self.started_at, cleared_at=self.cleared_at)
+        other.written_at = self.written_at
+        return other
+
+    def worse(self, value):
+        return value > self.peak if self.direction == 'high' else value < self.peak
+
+    def cleared_by(self, value, band):
+        if self.direction == 'high':
+            return value <= self.threshold - band
+        return value >= self.threshold + band
+
+
+def _breach(metric, value, config):
+    """Return (direction, threshold) when value is past its threshold, else None"""
+    if metric == 'co2':
+        threshold = config.get('ALERT_CO2_THRESHOLD', 1200)
+        return ('high', threshold) if value > threshold else None
+    if metric == 'temperature':
+        temp_min = config.get('ALERT_TEMP_MIN', 15)
+        temp_max = config.get('ALERT_TEMP_MAX', 28)
+        if value < temp_min:
+            return ('low', temp_min)
+        if value > temp_max:
+            return ('high', temp_max)
+        return None
+    threshold = config.get('ALERT_HUMIDITY_THRESHOLD', 80)
+    return ('high', threshold) if value > threshold else None
+
+
+def _message(metric, value, threshold, duration=None):
+    """Alert message; ongoing episodes also report their peak and duration"""
+    if metric == 'co2':
+        text = f'CO2 level {value} ppm exceeds threshold {threshold} ppm'
+    elif metric == 'temperature':
+        text = f'Temperature {value}°C outside range'
+    else:
+        text = f'Humidity level {value}% exceeds threshold {threshold}%'
+    if duration is not None:
+        text += f' (peak over {int(duration.total_seconds() // 60)} min)'
+    return text
+
+
+def _open_episode(sensor, user_id, metric, value, direction, threshold, now):
+    """Write the AlertHistory row of a new episode and queue its email"""
+    alert_type, label, _ = RULES[metric]
+    alert_history = AlertHistory(
+        user_id=user_id,
+        sensor_id=sensor.id,
+        alert_type=alert_type,
+        metric=metric,
+        metric_value=value,
+        threshold_value=threshold,
+        message=_message(metric, value, threshold),
+        status='triggered',
+        created_at=now
+    )
+    db.session.add(alert_history)
+    db.session.flush()
+
+    # Queue email notification if enabled (delivered in the background)
+    user = User.query.get(user_id) if current_app.config.get('ENABLE_EMAIL_NOTIFICATIONS') else None
+    if user and user.email:
+        queue_alert_email(
+            to_email=user.email,
+            sensor_name=sensor.name,
+            alert_type=label,
+            alert_value=value,
+            threshold=threshold,
+            user_id=user.id
+        )
+
+    logger.info(f"Alert episode opened for sensor {sensor.id}: {alert_type}")
+    return Episode(alert_history.id, direction, threshold, value, now)
+
+
+def _update_row(key, episode, values):
+    """Update the episode row; returns False when the row no longer exists"""
+    # Bulk updates skip the ORM flush hooks, so evaluation drops the
+    # cached alert statistics itself
+    db.session.info['alert_rows_updated'] = True
+    return db.session.query(AlertHistory).filter(
+        AlertHistory.id == episode.history_id,
+        AlertHistory.sensor_id == key[0],
+        AlertHistory.metric == key[1]
+    ).update(values, synchronize_session=False) > 0
+
+
+def _locks_of(sensor_ids):
+    """Locks of every (sensor, metric) key of the sensors, in a fixed order"""
+    keys = sorted((sensor_id, metric) for sensor_id in set(sensor_ids) for metric in RULES)
+    with _lock:
+        return [_key_locks.setdefault(key, threading.Lock()) for key in keys]
+
+
+@contextmanager
+def evaluation(sensor_ids):
+    """
+    Transaction in which readings of `sensor_ids` advance the alert state
+    machines. Yields an `evaluate(sensor, user_id, values, now=None)` function
+    (see `_evaluate`); on exit the alert rows are committed, then the
+    episodes published. On error the session is rolled back and the
+    in-memory episodes are left as they were.
+
+    Readings of other sensors are evaluated concurrently.
+    """
+    locks = _locks_of(sensor_ids)
+    for lock in locks:
+        lock.acquire()
+    try:
+        pending = {}
+        try:
+            yield lambda sensor, user_id, values, now=None: _evaluate(pending, sensor, user_id, values, now)
+            db.session.commit()
+        except Exception:
+            db.session.info.pop('alert_rows_updated', None)
+            db.session.rollback()
+            raise
+        if db.session.info.pop('alert_rows_updated', False):
+            invalidate_alert_stats()
+        with _lock:
+            for key, episode in pending.items():
+                if episode is None:
+                    _episodes.pop(key, None)
+                else:
+                    _episodes[key] = episode
+    finally:
+        for lock in reversed(locks):
+            lock.release()
+
+
+def _evaluate(pending, sensor, user_id, values, now=None):
+    """
+    Advance the alert state machines of a sensor with one reading.
+
+    Changed episodes are copies kept in `pending` (None for forgotten ones)
+    until `evaluation` commits. A row that no longer exists (deleted with
+    its history) is detected on the next update and replaced by a new episode.
+    Readings older than an episode's last write or clearing are skipped for it.
+
+    Args:
+        pending: Dictionary of (sensor id, metric) -> episode of the transaction
+        sensor: Sensor the reading belongs to
+        user_id: User the alerts are recorded for (and emailed to)
+        values: Dictionary of metric -> value (co2, temperature, humidity)
+        now: Time of the reading (default: now)
+
+    Returns:
+        Number of episodes opened
+    """
+    now = now or datetime.utcnow()
+    config = current_app.config
+    cooldown = timedelta(seconds=config.get('ALERT_COOLDOWN', 600))
+    opened = 0
+
+    for metric, value in values.items():
+        if metric not in RULES or value is None:
+            continue
+        key = (sensor.id, metric)
+        if key in pending:
+            episode = pending[key]
+        else:
+            with _lock:
+                episode = _episodes.get(key)
+            episode = pending[key] = episode.copy() if episode else None
+
+        # A back-filled reading older than the episode's last change cannot
+        # resolve or reopen it
+        if episode and now < (episode.cleared_at or episode.written_at):
+            continue
+        breach = _breach(metric, value, config)
+
+        # Cleared episodes are forgotten once their cooldown is over, and
+        # a breach on the opposite side (cold after hot) is a new episode
+        if episode and episode.cleared_at and now - episode.cleared_at >= cooldown:
+            pending[key] = None
+            episode = None
+        if episode and breach and breach[0] != episode.direction:
+            if not episode.cleared_at:
+                _update_row(key, episode, {'status': 'resolved', 'resolved_at': now})
+            episode = None
+
+        if episode is None:
+            if breach:
+                pending[key] = _open_episode(sensor, user_id, metric, value, breach[0], breach[1], now)
+                opened += 1
+            continue
+
+        if episode.cleared_at:
+            if not breach:
+                continue
+            # Breach within the cooldown: reopen the same episode quietly
+            episode.cleared_at = None
+            episode.written_at = now
+            if episode.worse(value):
+                episode.peak = value
+            reopened = _update_row(key, episode, {
+                'status': 'triggered',
+                'resolved_at': None,
+                'metric_value': episode.peak,
+                'message': _message(metric, episode.peak, episode.threshold, now - episode.started_at)
+            })
+            if not reopened:
+                pending[key] = _open_episode(sensor, user_id, metric, value, breach[0], breach[1], now)
+                opened += 1
+            continue
+
+        band = config.get(RULES[metric][2], 0)
+        if episode.cleared_by(value, band):
+            episode.cleared_at = now
+            _update_row(key, episode, {
+                'status': 'resolved',
+                'resolved_at': now,
+                'metric_value': episode.peak,
+                'message': _message(metric, episode.peak, episode.threshold, now - episode.started_at)
+            })
+            logger.info(f"Alert episode cleared for sensor {sensor.id}: {metric}")
+            continue
+
+        # Still active (past the threshold or inside the hysteresis band)
+        peaked = episode.worse(value)
+        if peaked:
+            episode.peak = value
+        if peaked or (now - episode.written_at).total_seconds() >= UPDATE_INTERVAL:
+            episode.written_at = now
+            updated = _update_row(key, episode, {
+                'metric_value': episode.peak,
+                'message': _message(metric, episode.peak, episode.threshold, now - episode.started_at)
+            })
+            if not updated:
+                pending[key] = None
+                if breach:
+                    pending[key] = _open_episode(sensor, user_id, metric, value, breach[0], breach[1], now)
+                    opened += 1
+
+    return opened
+
+
+def forget_sensor(sensor_id):
+    """Drop the state of a deleted sensor"""
+    locks = _locks_of([sensor_id])
+    for lock in locks:
+        lock.acquire()
+    try:
+        with _lock:
+            for key in [key for key in _episodes if key[0] == sensor_id]:
+                del _episodes[key]
+    finally:
+        for lock in reversed(locks):
+            lock.release()
+
+
+def rebuild_alert_state():
+    """
+    Rebuild the in-memory episodes from alert_history: the latest unresolved
+    row of each (sensor, metric) becomes an active episode, and rows resolved
+    within ALERT_COOLDOWN become cleared episodes that can still reopen.
+    """
+    now = datetime.utcnow()
+    cooldown_start = now - timedelta(seconds=current_app.config.get('ALERT_COOLDOWN', 600))
+
+    rows = db.session.query(
+        AlertHistory.id,
+        AlertHistory.sensor_id,
+        AlertHistory.metric,
+        AlertHistory.metric_value,
+        AlertHistory.threshold_value,
+        AlertHistory.created_at,
+        AlertHistory.resolved_at
+    ).filter(
+        AlertHistory.metric.in_(list(RULES)),
+        AlertHistory.threshold_value.isnot(None),
+        or_(AlertHistory.resolved_at.is_(None), AlertHistory.resolved_at >= cooldown_start)
+    ).order_by(AlertHistory.created_at)
+
+    episodes = {}
+    for row in rows:
+        direction = 'low' if row.metric_value < row.threshold_value else 'high'
+        episodes[(row.sensor_id, row.metric)] = Episode(
+            row.id, direction, row.threshold_value, row.metric_value,
+            row.created_at, cleared_at=row.resolved_at
+        )
+
+    with _lock:
+        _episodes.clear()
+        _episodes.update(episodes)
+
+    logger.info(f"Alert state rebuilt: {len(episodes)} episodes")
+    return len(episodes)
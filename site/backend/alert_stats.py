@@ -0,0 +1,103 @@
+"""
+Alert history statistics computed with a single GROUP BY, with a small
+per-user result cache.
+
+Cached results are dropped whenever a transaction that wrote AlertHistory
+rows commits, and expire after ALERT_STATS_CACHE_TTL seconds regardless.
+Bulk UPDATE/DELETE statements bypass the ORM unit of work, so their callers
+(alert_state, retention) call `invalidate_alert_stats` after committing.
+"""
+from database import AlertHistory
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session
+import threading
+import time
+
+DEFAULT_TTL = 30
+MAX_ENTRIES = 1024
+
+_cache = {}
+_lock = threading.Lock()
+
+
+def summarize_alerts(query):
+    """
+    Tally an AlertHistory query by status, type and metric in one query.
+
+    Args:
+        query: Filtered AlertHistory query
+
+    Returns:
+        Dictionary with totalAlerts, triggered, acknowledged, resolved,
+        byType and byMetric
+    """
+    rows = query.with_entities(
+        AlertHistory.status,
+        AlertHistory.alert_type,
+        AlertHistory.metric,
+        func.count()
+    ).group_by(
+        AlertHistory.status,
+        AlertHistory.alert_type,
+        AlertHistory.metric
+    ).all()
+
+    stats = {
+        'totalAlerts': 0,
+        'triggered': 0,
+        'acknowledged': 0,
+        'resolved': 0,
+        'byType': {},
+        'byMetric': {}
+    }
+    for status, alert_type, metric, count in rows:
+        stats['totalAlerts'] += count
+        if status in ('triggered', 'acknowledged', 'resolved'):
+            stats[status] += count
+        stats['byType'][alert_type] = stats['byType'].get(alert_type, 0) + count
+        stats['byMetric'][metric] = stats['byMetric'].get(metric, 0) + count
+    return stats
+
+
+def cached_stats(key, compute, ttl=DEFAULT_TTL):
+    """
+    Return the cached result for `key`, computing and storing it on a miss.
+
+    Args:
+        key: Hashable cache key; include the user id and every parameter
+        compute: Zero-argument callable producing the result
+        ttl: Lifetime of the entry in seconds
+    """
+    now = time.monotonic()
+    with _lock:
+        entry = _cache.get(key)
+        if entry and entry[0] > now:
+            return entry[1]
+
+    result = compute()
+
+    with _lock:
+        if len(_cache) >= MAX_ENTRIES:
+            _cache.clear()
+        _cache[key] = (now + ttl, result)
+    return result
+
+
+def invalidate_alert_stats():
+    """Drop every cached statistics result"""
+    with _lock:
+        _cache.clear()
+
+
+@event.listens_for(Session, 'after_flush')
+def _track_alert_history_writes(session, flush_context):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, AlertHistory):
+            session.info['alert_history_written'] = True
+            return
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_after_commit(session):
+    if session.info.pop('alert_history_written', False):
+        invalidate_alert_stats()
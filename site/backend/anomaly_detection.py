@@ -0,0 +1,267 @@
+"""
+Anomaly detection over sensor readings: rolling z-scores and IsolationForest.
+
+Each sensor keeps a detector in memory holding:
+
+    - an IsolationForest fitted on up to ANOMALY_TRAIN_DAYS of readings
+      (co2, temperature, humidity and the co2 step), refitted when it is
+      older than ANOMALY_MODEL_TTL or the sensor has since produced more than
+      a quarter as many readings as the model was trained on
+    - a baseline (count, sum and sum of squares per metric), updated with
+      every new reading
+    - the last ANOMALY_WINDOW readings, the context of the rolling z-score
+    - the anomalies found so far
+
+A request only loads and scores the readings recorded since the previous
+one, so repeated calls cost one small query per sensor. Loading, fitting and
+scoring hold the sensor's own lock only, so a cold fit of one sensor never
+blocks requests for the others. The rolling z-score
+of a point compares it with the ANOMALY_WINDOW points before it (vectorized
+with cumulative sums); a point is anomalous when a metric is more than
+ANOMALY_Z_THRESHOLD deviations away, or when IsolationForest isolates it.
+
+scikit-learn is optional: without it only the z-score method runs.
+"""
+from sensor_providers import readings_provider, METRICS
+from flask import current_app
+from datetime import datetime, timedelta
+import numpy as np
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Deviation floors per metric, so flat series do not flag sensor noise
+MIN_STD = np.array([5.0, 0.1, 0.5])
+# Readings needed before the rolling z-score or a model are trusted
+MIN_PERIODS = 10
+MIN_TRAIN_SAMPLES = 50
+
+_detectors = {}
+_sensor_locks = {}
+# Guards the two dicts only; work on a detector holds its sensor's lock
+_lock = threading.Lock()
+
+
+def rolling_zscores(values, window, context=0):
+    """
+    z-score of each row of `values` against the `window` rows before it.
+
+    Args:
+        values: Array of shape (n, metrics), oldest first
+        window: Number of previous rows each point is compared with
+        context: Leading rows that only serve as history (not scored)
+
+    Returns:
+        Array of shape (n - context, metrics); 0 where fewer than
+        MIN_PERIODS previous rows exist
+    """
+    n = len(values)
+    zeros = np.zeros((1, values.shape[1]))
+    sums = np.vstack([zeros, np.cumsum(values, axis=0)])
+    squares = np.vstack([zeros, np.cumsum(values ** 2, axis=0)])
+
+    index = np.arange(context, n)
+    start = np.maximum(index - window, 0)
+    count = (index - start)[:, None].astype(float)
+    safe_count = np.maximum(count, 1)
+    mean = (sums[index] - sums[start]) / safe_count
+    variance = (squares[index] - squares[start]) / safe_count - mean ** 2
+    std = np.maximum(np.sqrt(np.maximum(variance, 0)), MIN_STD[:values.shape[1]])
+
+    z = (values[context:] - mean) / std
+    return np.where(count >= MIN_PERIODS, z, 0.0)
+
+
+def _features(values, previous=None):
+    """IsolationForest features: the metrics and the co2 step from the previous reading"""
+    co2 = values[:, 0]
+    before = np.concatenate([[co2[0] if previous is None else previous], co2[:-1]])
+    return np.column_stack([values, co2 - before])
+
+
+class Detector:
+    """Anomaly state of one sensor"""
+
+    def __init__(self, sensor_id):
+        self.sensor_id = sensor_id
+        self.model = None
+        self.model_fitted_at = None
+        self.model_samples = 0
+        self.samples_since_fit = 0
+        self.count = 0
+        self.sums = np.zeros(len(METRICS))
+        self.squares = np.zeros(len(METRICS))
+        self.tail = np.empty((0, len(METRICS)))
+        self.covered_from = None
+        self.last_seen = None
+        self.anomalies = []
+
+    def baseline(self):
+        if not self.count:
+            return None
+        mean = self.sums / self.count
+        std = np.sqrt(np.maximum(self.squares / self.count - mean ** 2, 0))
+        return {
+            metric: {'mean': round(float(mean[i]), 2), 'std': round(float(std[i]), 2)}
+            for i, metric in enumerate(METRICS)
+        }
+
+    def summary(self):
+        return {
+            'baseline': self.baseline(),
+            'isolation_forest': self.model is not None,
+            'model_fitted_at': self.model_fitted_at.isoformat() if self.model_fitted_at else None
+        }
+
+    def needs_refit(self, config, now):
+        if self.model_fitted_at is None:
+            return True
+        age = (now - self.model_fitted_at).total_seconds()
+        return age > config.get('ANOMALY_MODEL_TTL', 21600) or self.samples_since_fit > self.model_samples / 4
+
+    def fit(self, values, config, now):
+        """Fit the IsolationForest on (a subsample of) the training readings"""
+        self.model = None
+        self.model_fitted_at = now
+        self.model_samples = len(values)
+        self.samples_since_fit = 0
+        if len(values) < MIN_TRAIN_SAMPLES:
+            return
+        try:
+            from sklearn.ensemble import IsolationForest
+        except ImportError:
+            return
+        max_samples = config.get('ANOMALY_MAX_TRAIN', 10000)
+        if len(values) > max_samples:
+            values = values[np.linspace(0, len(values) - 1, max_samples).astype(int)]
+        self.model = IsolationForest(
+            n_estimators=100,
+            contamination=config.get('ANOMALY_CONTAMINATION', 0.01),
+            random_state=0
+        ).fit(_features(values))
+
+    def observe(self, recorded_at, values, config):
+        """Score new readings (oldest first) and fold them into the state"""
+        if not len(values):
+            return
+        window = config.get('ANOMALY_WINDOW', 60)
+        threshold = config.get('ANOMALY_Z_THRESHOLD', 3.0)
+
+        context = len(self.tail)
+        z = rolling_zscores(np.vstack([self.tail, values]), window, context=context)
+        z_flags = np.abs(z) > threshold
+
+        forest_flags = np.zeros(len(values), dtype=bool)
+        forest_scores = np.zeros(len(values))
+        if self.model is not None:
+            previous = self.tail[-1, 0] if context else None
+            features = _features(values, previous)
+            forest_flags = self.model.predict(features) == -1
+            forest_scores = -self.model.score_samples(features)
+
+        epoch = recorded_at.astype(np.int64) / 1e6
+        for i in np.flatnonzero(z_flags.any(axis=1) | forest_flags):
+            methods = []
+            if z_flags[i].any():
+                methods.append('zscore')
+            if forest_flags[i]:
+                methods.append('isolation_forest')
+            self.anomalies.append({
+                'sensor_id': self.sensor_id,
+                'recorded_at': recorded_at[i].item().isoformat(),
+                'epoch': float(epoch[i]),
+                **{metric: round(float(values[i, j]), 2) for j, metric in enumerate(METRICS)},
+                'z_scores': {metric: round(float(z[i, j]), 2) for j, metric in enumerate(METRICS)},
+                'metrics': [metric for j, metric in enumerate(METRICS) if z_flags[i, j]],
+                'score': round(float(forest_scores[i]), 3) if self.model is not None else None,
+                'methods': methods
+            })
+
+        self.count += len(values)
+        self.sums += values.sum(axis=0)
+        self.squares += (values ** 2).sum(axis=0)
+        self.samples_since_fit += len(values)
+        self.tail = np.vstack([self.tail, values])[-window:]
+        self.last_seen = recorded_at[-1].item()
+
+    def prune(self, start):
+        """Forget anomalies before `start`"""
+        cutoff = (start - datetime(1970, 1, 1)).total_seconds()
+        self.anomalies = [anomaly for anomaly in self.anomalies if anomaly['epoch'] >= cutoff]
+
+
+def _rebuild(sensor, start, now, config):
+    """Fresh detector: fit on the training window and score from `start`"""
+    detector = Detector(sensor.id)
+    train_start = min(start, now - timedelta(days=config.get('ANOMALY_TRAIN_DAYS', 30)))
+    recorded_at, values = readings_provider(sensor).arrays(sensor, train_start, now)
+    detector.fit(values, config, now)
+
+    first = np.searchsorted(recorded_at, np.datetime64(start, 'us'), side='right')
+    window = config.get('ANOMALY_WINDOW', 60)
+    detector.tail = values[max(first - window, 0):first]
+    detector.count = first
+    detector.sums = values[:first].sum(axis=0)
+    detector.squares = (values[:first] ** 2).sum(axis=0)
+    detector.observe(recorded_at[first:], values[first:], config)
+    detector.samples_since_fit = 0
+    detector.covered_from = start
+    if detector.last_seen is None:
+        detector.last_seen = recorded_at[-1].item() if len(recorded_at) else start
+    return detector
+
+
+def detect_anomalies(sensor, hours, now=None):
+    """
+    Anomalies of a sensor over the last `hours`, most recent first.
+
+    Args:
+        sensor: Sensor or SensorRef
+        hours: Window length (at most ANOMALY_TRAIN_DAYS days)
+
+    Returns:
+        Tuple of (list of anomaly dicts, detector summary dict)
+    """
+    config = current_app.config
+    now = now or datetime.utcnow()
+    hours = min(hours, config.get('ANOMALY_TRAIN_DAYS', 30) * 24)
+    start = now - timedelta(hours=hours)
+
+    with _lock:
+        sensor_lock = _sensor_locks.setdefault(sensor.id, threading.Lock())
+
+    with sensor_lock:
+        with _lock:
+            detector = _detectors.get(sensor.id)
+        if detector is None or start < detector.covered_from or detector.needs_refit(config, now):
+            started = time.perf_counter()
+            detector = _rebuild(sensor, start, now, config)
+            with _lock:
+                _detectors[sensor.id] = detector
+            logger.info(f"Anomaly detector of sensor {sensor.id} rebuilt in {time.perf_counter() - started:.2f}s")
+        else:
+            recorded_at, values = readings_provider(sensor).arrays(sensor, detector.last_seen, now)
+            detector.observe(recorded_at, values, config)
+            detector.prune(now - timedelta(days=config.get('ANOMALY_TRAIN_DAYS', 30)))
+
+        cutoff = (start - datetime(1970, 1, 1)).total_seconds()
+        anomalies = [anomaly for anomaly in reversed(detector.anomalies) if anomaly['epoch'] > cutoff]
+        return anomalies, detector.summary()
+
+
+def forget_detector(sensor_id):
+    """Drop the detector of a deleted sensor"""
+    with _lock:
+        _detectors.pop(sensor_id, None)
+        _sensor_locks.pop(sensor_id, None)
+
+
+def anomaly_cache_stats():
+    """Cached detectors and fitted models (for /api/health)"""
+    with _lock:
+        return {
+            'detectors': len(_detectors),
+            'models': sum(1 for detector in _detectors.values() if detector.model is not None)
+        }
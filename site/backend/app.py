@@ -8,19 +8,33 @@ from flask_caching import Cache
 from datetime import timedelta
 from dotenv import load_dotenv
 import os
+import hmac
 import logging
 from logging.handlers import RotatingFileHandler
 import urllib.request
 
 from database import db, init_db
+from db_engine import init_engines, engine_stats
+from metrics import init_metrics, render_prometheus
 from routes.auth import auth_bp
 from routes.sensors import sensors_bp
 from routes.readings import readings_bp
 from routes.users import users_bp
 from routes.alerts import alerts_bp
 from routes.reports import reports_bp
+from routes.analytics import analytics_bp
+from routes.visualization import visualization_bp
+from routes.system import system_bp, metric_gauges
 from scheduler import init_scheduler
-from email_service import init_email
+from email_service import init_email, start_email_senders
+from report_jobs import init_report_jobs
+from archive import init_archive, archive_stats
+from anomaly_detection import anomaly_cache_stats
+from forecasting import forecast_cache_stats
+from alert_state import rebuild_alert_state
+from realtime import init_realtime
+from sensor_simulator import simulation_cache_stats
+from audit_logger import start_audit_writer, audit_queue_stats
 from config import Config
 
 load_dotenv()
@@ -60,7 +74,7 @@ def create_app():
     # Load configuration
     app.config.from_object(Config)
     app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'aerium-dev-secret-key-change-in-production')
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///aerium.db'
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///aerium.db')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
     app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'jwt-secret-key-change-in-production')
     app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=24)
@@ -87,8 +101,12 @@ def create_app():
     
     # Initialize extensions
     db.init_app(app)
+    init_engines(app, db)
+    init_metrics(app, db)
     jwt = JWTManager(app)
     init_email(app)
+    init_report_jobs(app)
+    init_archive(app)
     
     CORS(app, resources={
         r"/api/*": {
@@ -120,6 +138,9 @@ def create_app():
     app.register_blueprint(users_bp, url_prefix='/api/users')
     app.register_blueprint(alerts_bp, url_prefix='/api/alerts')
     app.register_blueprint(reports_bp, url_prefix='/api/reports')
+    app.register_blueprint(analytics_bp, url_prefix='/api/analytics')
+    app.register_blueprint(visualization_bp, url_prefix='/api/visualization')
+    app.register_blueprint(system_bp, url_prefix='/api/system')
     
     # Health check endpoint
     @app.route('/api/health')
@@ -130,9 +151,33 @@ def create_app():
             'features': {
                 'email_notifications': app.config.get('ENABLE_EMAIL_NOTIFICATIONS', False),
                 'rate_limiting': app.config.get('ENABLE_RATE_LIMITING', False)
-            }
+            },
+            'audit_queue': audit_queue_stats(),
+            'simulation_cache': simulation_cache_stats(),
+            'database': engine_stats(),
+            'archive': archive_stats(),
+            'anomaly_detection': anomaly_cache_stats(),
+            'forecasting': forecast_cache_stats()
         }), 200
     
+    # Prometheus scrape endpoint (request, SQL and cache metrics); scraped
+    # every few seconds, so it is kept out of the rate limits. It exposes what
+    # /api/system/performance keeps for admins, so scrapers must present
+    # METRICS_TOKEN, or come from localhost when no token is set
+    @app.route('/metrics')
+    @limiter.exempt
+    def prometheus_metrics():
+        if not app.config.get('METRICS_ENABLED', True):
+            return jsonify({'error': 'Resource not found'}), 404
+        token = app.config.get('METRICS_TOKEN')
+        if token:
+            supplied = request.headers.get('Authorization', '')
+            if not hmac.compare_digest(supplied.encode(), f'Bearer {token}'.encode()):
+                return jsonify({'error': 'Invalid or missing metrics token'}), 401
+        elif request.remote_addr not in ('127.0.0.1', '::1'):
+            return jsonify({'error': 'Unauthorized - set METRICS_TOKEN to scrape remotely'}), 403
+        return Response(render_prometheus(metric_gauges()), mimetype='text/plain; version=0.0.4')
+    
     # API documentation endpoint
     @app.route('/api/docs')
     def api_docs():
@@ -146,7 +191,10 @@ def create_app():
                 'readings': '/api/readings - Sensor readings',
                 'alerts': '/api/alerts - Alert management',
                 'users': '/api/users - User management',
-                'reports': '/api/reports - Reports generation'
+                'reports': '/api/reports - Reports generation',
+                'analytics': '/api/analytics - Anomaly detection and forecasts',
+                'visualization': '/api/visualization - Chart data (heatmaps, correlations)',
+                'system': '/api/system - Request and SQL metrics (admin)'
             }
         }), 200
 
@@ -216,10 +264,20 @@ def create_app():
     # Initialize database
     with app.app_context():
         init_db()
+        rebuild_alert_state()
     
     # Initialize scheduler for sensor simulation
     init_scheduler(app, socketio)
     
+    # Push new readings to Socket.IO clients
+    init_realtime(app, socketio)
+    
+    # Deliver queued alert emails in the background
+    start_email_senders(app)
+    
+    # Write audit log entries in batches in the background
+    start_audit_writer(app)
+    
     app.logger.info('Aerium app initialized successfully')
     return app, socketio
 
@@ -0,0 +1,249 @@
+"""
+Cold archive of raw readings in Parquet files, queried with DuckDB.
+
+Before retention purges a day of raw readings (see retention.py), the rows are
+appended to one Parquet file per sensor and month:
+
+    ARCHIVE_DIR/sensor_<id>/<YYYY-MM>.parquet
+
+`manifest.json` records `archived_until`: readings recorded before it are
+served from the archive, readings recorded at or after it from the
+`sensor_readings` table. Splitting on that single boundary means a range
+crossing it is answered by concatenating the two parts, without duplicates
+even when a purge stopped between archiving and deleting.
+
+pyarrow (writing) and duckdb (querying) are optional dependencies, only
+needed with ARCHIVE_ENABLED=True.
+"""
+from database import db, SensorReading
+from datetime import datetime
+import json
+import logging
+import os
+import shutil
+import threading
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = ('id', 'sensor_id', 'co2', 'temperature', 'humidity', 'recorded_at')
+
+_app = None
+_lock = threading.Lock()
+_manifest = None
+
+
+def init_archive(app):
+    """Resolve ARCHIVE_DIR (default: instance/archive)"""
+    global _app, _manifest
+    _app = app
+    _manifest = None
+    if not app.config.get('ARCHIVE_DIR'):
+        app.config['ARCHIVE_DIR'] = os.path.join(app.instance_path, 'archive')
+
+
+def archive_available():
+    """True when archiving is enabled and its libraries are installed"""
+    if not _app or not _app.config.get('ARCHIVE_ENABLED'):
+        return False
+    try:
+        import pyarrow  # noqa: F401
+        import duckdb  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _manifest_path():
+    return os.path.join(_app.config['ARCHIVE_DIR'], 'manifest.json')
+
+
+def _load_manifest():
+    global _manifest
+    with _lock:
+        if _manifest is None:
+            try:
+                with open(_manifest_path()) as f:
+                    _manifest = json.load(f)
+            except (OSError, ValueError):
+                _manifest = {}
+        return _manifest
+
+
+def archived_until():
+    """Readings recorded before this datetime live in the archive (or None)"""
+    if not archive_available():
+        return None
+    value = _load_manifest().get('archived_until')
+    return datetime.fromisoformat(value) if value else None
+
+
+def _set_archived_until(boundary):
+    manifest = dict(_load_manifest())
+    current = manifest.get('archived_until')
+    if current and datetime.fromisoformat(current) >= boundary:
+        return
+    manifest['archived_until'] = boundary.isoformat()
+    path = _manifest_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f'{path}.tmp', 'w') as f:
+        json.dump(manifest, f)
+    os.replace(f'{path}.tmp', path)
+    global _manifest
+    with _lock:
+        _manifest = manifest
+
+
+def _month_path(sensor_id, month):
+    return os.path.join(_app.config['ARCHIVE_DIR'], f'sensor_{sensor_id}', f'{month}.parquet')
+
+
+def _months(start, end):
+    """'YYYY-MM' of every month overlapping [start, end)"""
+    months = []
+    year, month = start.year, start.month
+    while (year, month) <= (end.year, end.month):
+        months.append(f'{year:04d}-{month:02d}')
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+
+def _write_month(path, table):
+    """Merge `table` into the Parquet file at `path` (rows already there are replaced)"""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+
+    if os.path.exists(path):
+        existing = pq.read_table(path)
+        existing = existing.filter(pc.invert(pc.is_in(existing['id'], value_set=table['id'])))
+        table = pa.concat_tables([existing, table.cast(existing.schema)])
+    table = table.sort_by('recorded_at')
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    pq.write_table(table, f'{path}.tmp', compression='zstd')
+    os.replace(f'{path}.tmp', path)
+
+
+def archive_readings(start, end):
+    """
+    Copy the raw readings of [start, end) into the archive and move the
+    `archived_until` boundary to `end`. Idempotent: readings archived
+    earlier are overwritten, not duplicated.
+
+    Returns:
+        Number of readings archived
+    """
+    import pyarrow as pa
+
+    rows = db.session.query(*[getattr(SensorReading, name) for name in COLUMNS]).filter(
+        SensorReading.recorded_at >= start,
+        SensorReading.recorded_at < end
+    ).order_by(SensorReading.sensor_id, SensorReading.recorded_at).all()
+
+    groups = {}
+    for row in rows:
+        groups.setdefault((row.sensor_id, row.recorded_at.strftime('%Y-%m')), []).append(row)
+
+    for (sensor_id, month), group in groups.items():
+        table = pa.table({
+            'id': pa.array([row.id for row in group], pa.int64()),
+            'sensor_id': pa.array([row.sensor_id for row in group], pa.int64()),
+            'co2': pa.array([row.co2 for row in group], pa.float64()),
+            'temperature': pa.array([row.temperature for row in group], pa.float64()),
+            'humidity': pa.array([row.humidity for row in group], pa.float64()),
+            'recorded_at': pa.array([row.recorded_at for row in group], pa.timestamp('us')),
+        })
+        _write_month(_month_path(sensor_id, month), table)
+
+    _set_archived_until(end)
+    return len(rows)
+
+
+def _archive_files(sensor_ids, start, end):
+    files = []
+    for sensor_id in sensor_ids:
+        for month in _months(start, end):
+            path = _month_path(sensor_id, month)
+            if os.path.exists(path):
+                files.append(path)
+    return files
+
+
+def iter_archived_readings(sensor_ids, start, end=None, descending=False, limit=None, batch_size=2000):
+    """
+    Yield archived readings of `sensor_ids` recorded in [start, end) as tuples
+    of COLUMNS, ordered by recorded_at. `end` is capped at `archived_until`.
+    """
+    boundary = archived_until()
+    if boundary is None or start >= boundary:
+        return
+    end = min(end, boundary) if end else boundary
+    files = _archive_files(sensor_ids, start, end)
+    if not files:
+        return
+
+    import duckdb
+
+    sql = (
+        f"SELECT {', '.join(COLUMNS)} FROM read_parquet(?) "
+        f"WHERE recorded_at >= ? AND recorded_at < ? "
+        f"ORDER BY recorded_at {'DESC' if descending else 'ASC'}"
+    )
+    params = [files, start, end]
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(limit)
+
+    connection = duckdb.connect()
+    try:
+        cursor = connection.execute(sql, params)
+        while True:
+            batch = cursor.fetchmany(batch_size)
+            if not batch:
+                return
+            yield from batch
+    finally:
+        connection.close()
+
+
+def archived_reading_dicts(sensor_id, start, limit):
+    """Archived readings of a sensor since `start`, most recent first (SensorReading.to_dict format)"""
+    return [
+        {
+            'id': reading_id,
+            'sensor_id': reading_sensor_id,
+            'co2': co2,
+            'temperature': temperature,
+            'humidity': humidity,
+            'recorded_at': recorded_at.isoformat()
+        }
+        for reading_id, reading_sensor_id, co2, temperature, humidity, recorded_at
+        in iter_archived_readings([sensor_id], start, descending=True, limit=limit)
+    ]
+
+
+def delete_sensor_archive(sensor_id):
+    """Remove the archived readings of a deleted sensor"""
+    if _app is None:
+        return
+    shutil.rmtree(os.path.join(_app.config['ARCHIVE_DIR'], f'sensor_{sensor_id}'), ignore_errors=True)
+
+
+def archive_stats():
+    """Archive boundary and size (for /api/health)"""
+    if not archive_available():
+        return {'enabled': False}
+    files = 0
+    size = 0
+    for root, _, names in os.walk(_app.config['ARCHIVE_DIR']):
+        for name in names:
+            if name.endswith('.parquet'):
+                files += 1
+                size += os.path.getsize(os.path.join(root, name))
+    boundary = archived_until()
+    return {
+        'enabled': True,
+        'archived_until': boundary.isoformat() if boundary else None,
+        'files': files,
+        'bytes': size
+    }
@@ -1,12 +1,32 @@
 """
 Audit logging for tracking user actions
+
+`log_action` only enqueues the entry; a background writer inserts queued
+entries in batches of AUDIT_BATCH_SIZE or every AUDIT_FLUSH_INTERVAL seconds,
+whichever comes first, and drains the queue on shutdown. When the queue is
+full (AUDIT_QUEUE_MAX) new entries are dropped and counted rather than
+blocking the request. Without a running writer (scripts, shells) entries are
+written synchronously as before.
 """
 from database import db
+from sqlalchemy import insert
 from datetime import datetime
+import atexit
 import logging
+import queue
+import threading
+import time
 
 logger = logging.getLogger(__name__)
 
+_queue = None
+_writer = None
+_writer_app = None
+_stop = threading.Event()
+_flush_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_stats = {'queued': 0, 'written': 0, 'dropped': 0, 'failed': 0, 'batches': 0}
+
 
 class AuditLog(db.Model):
     """Model for tracking user actions"""
@@ -19,7 +39,7 @@ class AuditLog(db.Model):
     resource_id = db.Column(db.Integer)
     details = db.Column(db.JSON)  # Additional context like old/new values
     ip_address = db.Column(db.String(45))  # IPv4 or IPv6
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
     
     def __repr__(self):
         return f'<AuditLog {self.action} by user {self.user_id}>'
@@ -49,23 +69,138 @@ def log_action(user_id, action, resource_type, resource_id=None, details=None, i
         details: Dictionary of additional details
         ip_address: IP address of the request
     """
+    entry = {
+        'user_id': user_id,
+        'action': f"{action}_{resource_type}",
+        'resource_type': resource_type,
+        'resource_id': resource_id,
+        'details': details or {},
+        'ip_address': ip_address,
+        'timestamp': datetime.utcnow()
+    }
+    
+    if _writer is None:
+        _write_now(entry)
+        return
+    
     try:
-        audit = AuditLog(
-            user_id=user_id,
-            action=f"{action}_{resource_type}",
-            resource_type=resource_type,
-            resource_id=resource_id,
-            details=details or {},
-            ip_address=ip_address
-        )
-        db.session.add(audit)
+        _queue.put_nowait(entry)
+        _count('queued')
+    except queue.Full:
+        _count('dropped')
+        logger.warning(f"Audit queue full, dropped: {action} on {resource_type} by user {user_id}")
+
+
+def _write_now(entry):
+    """Synchronous write used when no background writer is running"""
+    try:
+        db.session.add(AuditLog(**entry))
         db.session.commit()
-        logger.debug(f"Audit log created: {action} on {resource_type} by user {user_id}")
+        logger.debug(f"Audit log created: {entry['action']} by user {entry['user_id']}")
     except Exception as e:
         logger.error(f"Failed to create audit log: {str(e)}")
         db.session.rollback()
 
 
+def _count(name, amount=1):
+    with _stats_lock:
+        _stats[name] += amount
+
+
+def _write_batch(app, entries):
+    """Insert a batch of entries in one statement and commit"""
+    with app.app_context():
+        try:
+            db.session.execute(insert(AuditLog), entries)
+            db.session.commit()
+            _count('written', len(entries))
+            _count('batches')
+        except Exception as e:
+            db.session.rollback()
+            _count('failed', len(entries))
+            logger.error(f"Failed to write {len(entries)} audit log entries: {str(e)}")
+
+
+def _drain(limit):
+    entries = []
+    while len(entries) < limit:
+        try:
+            entries.append(_queue.get_nowait())
+        except queue.Empty:
+            break
+    return entries
+
+
+def _writer_loop(app):
+    batch_size = app.config.get('AUDIT_BATCH_SIZE', 200)
+    flush_interval = app.config.get('AUDIT_FLUSH_INTERVAL', 2.0)
+    
+    while not _stop.is_set():
+        batch = []
+        deadline = time.monotonic() + flush_interval
+        while len(batch) < batch_size and not _stop.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(_queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+            batch += _drain(batch_size - len(batch))
+        if batch:
+            with _flush_lock:
+                _write_batch(app, batch)
+
+
+def flush_audit_log(app=None):
+    """Write every queued entry now (used on shutdown)"""
+    app = app or _writer_app
+    if _queue is None or app is None:
+        return 0
+    written = 0
+    with _flush_lock:
+        while True:
+            batch = _drain(app.config.get('AUDIT_BATCH_SIZE', 200))
+            if not batch:
+                break
+            _write_batch(app, batch)
+            written += len(batch)
+    return written
+
+
+def start_audit_writer(app):
+    """Start the background audit writer (once per process)"""
+    global _queue, _writer, _writer_app
+    if _writer is not None:
+        return
+    
+    _queue = queue.Queue(maxsize=app.config.get('AUDIT_QUEUE_MAX', 10000))
+    _writer_app = app
+    _writer = threading.Thread(target=_writer_loop, args=(app,), name='audit-writer', daemon=True)
+    _writer.start()
+    atexit.register(stop_audit_writer)
+
+
+def stop_audit_writer():
+    """Stop the writer thread and write whatever is still queued"""
+    global _writer
+    if _writer is None:
+        return
+    _stop.set()
+    _writer.join(timeout=5)
+    _writer = None
+    flush_audit_log()
+
+
+def audit_queue_stats():
+    """Counters of the audit writer, with the current queue depth"""
+    with _stats_lock:
+        stats = dict(_stats)
+    stats['depth'] = _queue.qsize() if _queue is not None else 0
+    stats['running'] = _writer is not None
+    return stats
+
+
 def get_user_audit_history(user_id, limit=100):
     """Get audit history for a specific user"""
     try:
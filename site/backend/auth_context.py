@@ -0,0 +1,100 @@
+"""
+Request-scoped identity and a sensor ownership cache shared by the routes.
+
+Access tokens carry the user's role as a claim (see `identity_claims`), so
+`current_identity()` answers "who is calling and are they admin" without a
+database query. Role changes take effect when the user next logs in or
+refreshes their token. The User row is only loaded when a route needs it.
+
+`sensor_ref()` resolves a sensor's owner, type and name through a small
+TTL/LRU cache; routes that change those fields call `invalidate_sensor`.
+"""
+from flask import g, current_app
+from flask_jwt_extended import get_jwt, get_jwt_identity
+from collections import OrderedDict, namedtuple
+from database import db, User, Sensor
+import threading
+import time
+
+SensorRef = namedtuple('SensorRef', ['id', 'user_id', 'sensor_type', 'name'])
+
+_sensor_cache = OrderedDict()
+_sensor_lock = threading.Lock()
+
+
+def identity_claims(user):
+    """Additional JWT claims for the user's tokens"""
+    return {'role': user.role}
+
+
+class Identity:
+    """The authenticated caller of the current request"""
+
+    def __init__(self, user_id, role):
+        self.user_id = user_id
+        self.role = role
+        self._user = None
+
+    @property
+    def is_admin(self):
+        return self.role == 'admin'
+
+    @property
+    def user(self):
+        """User row, loaded on first access"""
+        if self._user is None:
+            self._user = User.query.get(self.user_id)
+        return self._user
+
+    def can_access(self, owner_id):
+        """Admins can access everything, users only what they own"""
+        return self.is_admin or owner_id == self.user_id
+
+
+def current_identity():
+    """Identity of the JWT of the current request, built once per request"""
+    identity = g.get('identity')
+    if identity is None:
+        identity = Identity(int(get_jwt_identity()), get_jwt().get('role'))
+        # Tokens issued before the role claim existed
+        if identity.role is None and identity.user is not None:
+            identity.role = identity.user.role
+        g.identity = identity
+    return identity
+
+
+def sensor_ref(sensor_id):
+    """
+    Return the SensorRef of a sensor, or None when it does not exist.
+
+    Lookups are cached for SENSOR_CACHE_TTL seconds, keeping at most
+    SENSOR_CACHE_SIZE sensors (least recently used are evicted first).
+    """
+    now = time.monotonic()
+    with _sensor_lock:
+        entry = _sensor_cache.get(sensor_id)
+        if entry and entry[0] > now:
+            _sensor_cache.move_to_end(sensor_id)
+            return entry[1]
+
+    row = db.session.query(
+        Sensor.id, Sensor.user_id, Sensor.sensor_type, Sensor.name
+    ).filter(Sensor.id == sensor_id).first()
+    if row is None:
+        return None
+    ref = SensorRef(*row)
+
+    ttl = current_app.config.get('SENSOR_CACHE_TTL', 60)
+    max_size = current_app.config.get('SENSOR_CACHE_SIZE', 4096)
+    with _sensor_lock:
+        _sensor_cache[sensor_id] = (now + ttl, ref)
+        _sensor_cache.move_to_end(sensor_id)
+        while len(_sensor_cache) > max_size:
+            _sensor_cache.popitem(last=False)
+    return ref
+
+
+def invalidate_sensor(sensor_id):
+    """Forget the cached SensorRef of a sensor (after update or delete)"""
+    with _sensor_lock:
+        _sensor_cache.pop(sensor_id, None)
@@ -0,0 +1,152 @@
+"""
+Benchmark mixed read/write throughput of the SQLite database under contention.
+
+Runs the same workload twice on a scratch database file: first with SQLite
+defaults (rollback journal, one pool for everything), then with the engine
+profile of db_engine.py (WAL, pragmas, read-only pool for readers). Writer
+threads insert small batches of readings, reader threads run the dashboard
+queries (latest readings of a sensor, hourly averages).
+
+Usage:
+    python benchmark_db.py [--seconds 10] [--readers 8] [--writers 2]
+"""
+from db_engine import sqlite_pragmas, install_pragmas
+from config import Config
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from datetime import datetime, timedelta
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+
+SENSORS = 20
+SEED_READINGS = 50000
+
+READ_QUERIES = [
+    text("SELECT co2, temperature, humidity, recorded_at FROM bench_readings "
+         "WHERE sensor_id = :sensor_id ORDER BY recorded_at DESC LIMIT 100"),
+    text("SELECT strftime('%Y-%m-%d %H', recorded_at) AS hour, AVG(co2) FROM bench_readings "
+         "WHERE sensor_id = :sensor_id AND recorded_at >= :since GROUP BY hour"),
+]
+INSERT = text("INSERT INTO bench_readings (sensor_id, co2, temperature, humidity, recorded_at) "
+              "VALUES (:sensor_id, :co2, :temperature, :humidity, :recorded_at)")
+
+
+def _reading(now):
+    return {
+        'sensor_id': random.randint(1, SENSORS),
+        'co2': random.uniform(400, 1500),
+        'temperature': random.uniform(18, 26),
+        'humidity': random.uniform(30, 60),
+        'recorded_at': now.isoformat(' ')
+    }
+
+
+def create_database(path):
+    """Scratch database with an index like sensor_readings and some history"""
+    engine = create_engine(f'sqlite:///{path}')
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE bench_readings (id INTEGER PRIMARY KEY, sensor_id INTEGER, "
+            "co2 FLOAT, temperature FLOAT, humidity FLOAT, recorded_at DATETIME)"
+        ))
+        conn.execute(text("CREATE INDEX ix_bench_sensor_time ON bench_readings (sensor_id, recorded_at)"))
+        conn.execute(INSERT, [
+            _reading(now - timedelta(seconds=index * 30)) for index in range(SEED_READINGS)
+        ])
+    engine.dispose()
+
+
+def make_engines(path, tuned):
+    """(write engine, read engine) for the default or the tuned profile"""
+    config = vars(Config)
+    write_engine = create_engine(f'sqlite:///{path}')
+    if not tuned:
+        return write_engine, write_engine
+
+    install_pragmas(write_engine, sqlite_pragmas(config))
+    with write_engine.connect():
+        pass
+    read_engine = create_engine(
+        f'sqlite:///file:{path}?mode=ro&uri=true',
+        pool_size=Config.DB_READ_POOL_SIZE,
+        max_overflow=Config.DB_READ_POOL_SIZE
+    )
+    install_pragmas(read_engine, sqlite_pragmas(config, read_only=True))
+    return write_engine, read_engine
+
+
+def run_workload(write_engine, read_engine, seconds, readers, writers):
+    """Run reader and writer threads for `seconds`; returns the counters"""
+    stop = threading.Event()
+    lock = threading.Lock()
+    counts = {'reads': 0, 'writes': 0, 'errors': 0}
+
+    def count(name, amount=1):
+        with lock:
+            counts[name] += amount
+
+    def reader():
+        while not stop.is_set():
+            params = {
+                'sensor_id': random.randint(1, SENSORS),
+                'since': (datetime.utcnow() - timedelta(hours=24)).isoformat(' ')
+            }
+            try:
+                with read_engine.connect() as conn:
+                    conn.execute(random.choice(READ_QUERIES), params).fetchall()
+                count('reads')
+            except OperationalError:
+                count('errors')
+
+    def writer():
+        while not stop.is_set():
+            now = datetime.utcnow()
+            try:
+                with write_engine.begin() as conn:
+                    conn.execute(INSERT, [_reading(now) for _ in range(10)])
+                count('writes', 10)
+            except OperationalError:
+                count('errors')
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    threads += [threading.Thread(target=writer) for _ in range(writers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return counts
+
+
+def benchmark(seconds, readers, writers):
+    results = {}
+    for name, tuned in (('default', False), ('tuned', True)):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'bench.db')
+            create_database(path)
+            write_engine, read_engine = make_engines(path, tuned)
+            counts = run_workload(write_engine, read_engine, seconds, readers, writers)
+            write_engine.dispose()
+            read_engine.dispose()
+        results[name] = counts
+        print(f"{name:>8}: {counts['reads'] / seconds:10.1f} reads/s "
+              f"{counts['writes'] / seconds:10.1f} writes/s "
+              f"{counts['errors']:6d} errors")
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=2)
+    args = parser.parse_args()
+
+    print(f"Mixed workload: {args.readers} readers, {args.writers} writers, {args.seconds}s per profile")
+    benchmark(args.seconds, args.readers, args.writers)
@@ -7,7 +7,7 @@ from datetime import timedelta
 class Config:
     """Base configuration"""
     SECRET_KEY = os.getenv('SECRET_KEY', 'aerium-dev-secret-key-change-in-production')
-    SQLALCHEMY_DATABASE_URI = 'sqlite:///aerium.db'
+    SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', 'sqlite:///aerium.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'jwt-secret-key-change-in-production')
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=24)
@@ -24,6 +24,25 @@ class Config:
     MAIL_PASSWORD = os.getenv('MAIL_PASSWORD', '')
     MAIL_DEFAULT_SENDER = os.getenv('MAIL_DEFAULT_SENDER', 'noreply@aerium.app')
     
+    # Email outbox (background delivery of alert emails)
+    EMAIL_SENDER_THREADS = int(os.getenv('EMAIL_SENDER_THREADS', 1))
+    EMAIL_POLL_INTERVAL = float(os.getenv('EMAIL_POLL_INTERVAL', 5))  # Seconds between outbox scans
+    EMAIL_BATCH_SIZE = int(os.getenv('EMAIL_BATCH_SIZE', 200))  # Outbox rows per SMTP connection
+    EMAIL_MAX_ATTEMPTS = int(os.getenv('EMAIL_MAX_ATTEMPTS', 5))
+    EMAIL_RETRY_BASE = int(os.getenv('EMAIL_RETRY_BASE', 30))  # Seconds, doubled after each failure
+    EMAIL_RETRY_MAX = int(os.getenv('EMAIL_RETRY_MAX', 3600))
+    
+    # Database engine (see db_engine.py)
+    DATABASE_READ_URL = os.getenv('DATABASE_READ_URL', '')  # Read-only pool for GET requests (default: same SQLite file, mode=ro)
+    DB_READ_POOL = os.getenv('DB_READ_POOL', 'True') == 'True'
+    DB_READ_POOL_SIZE = int(os.getenv('DB_READ_POOL_SIZE', 5))
+    SQLITE_AUTO_VACUUM = os.getenv('SQLITE_AUTO_VACUUM', 'INCREMENTAL')  # Applies to new database files
+    SQLITE_JOURNAL_MODE = os.getenv('SQLITE_JOURNAL_MODE', 'WAL')
+    SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_BUSY_TIMEOUT = int(os.getenv('SQLITE_BUSY_TIMEOUT', 5000))  # Milliseconds a connection waits for a lock
+    SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', 268435456))  # Bytes memory-mapped (256MB)
+    SQLITE_CACHE_SIZE = int(os.getenv('SQLITE_CACHE_SIZE', -65536))  # Pages, or KiB when negative (64MB)
+    
     # Rate Limiting
     RATELIMIT_STORAGE_URL = 'memory://'
     RATELIMIT_DEFAULT = os.getenv('RATELIMIT_DEFAULT', '200/day;50/hour;10/minute')
@@ -45,6 +64,67 @@ class Config:
     ALERT_TEMP_MAX = float(os.getenv('ALERT_TEMP_MAX', 28))
     ALERT_HUMIDITY_THRESHOLD = float(os.getenv('ALERT_HUMIDITY_THRESHOLD', 80))
     ALERT_SEND_INTERVAL = int(os.getenv('ALERT_SEND_INTERVAL', 300))  # Seconds between alert emails
+    ALERT_COOLDOWN = int(os.getenv('ALERT_COOLDOWN', 600))  # Seconds a cleared alert can reopen without a new alert
+    ALERT_HYSTERESIS_CO2 = float(os.getenv('ALERT_HYSTERESIS_CO2', 50))  # Margin below threshold to clear (ppm)
+    ALERT_HYSTERESIS_TEMP = float(os.getenv('ALERT_HYSTERESIS_TEMP', 0.5))  # Celsius
+    ALERT_HYSTERESIS_HUMIDITY = float(os.getenv('ALERT_HYSTERESIS_HUMIDITY', 2))  # %
+    ALERT_STATS_CACHE_TTL = int(os.getenv('ALERT_STATS_CACHE_TTL', 30))  # Seconds a stats result is cached
+    
+    # Readings ingest
+    READINGS_BATCH_MAX = int(os.getenv('READINGS_BATCH_MAX', 10000))  # Max items per batch upload
+    
+    # Sensor ownership cache (auth_context.sensor_ref)
+    SENSOR_CACHE_TTL = int(os.getenv('SENSOR_CACHE_TTL', 60))  # Seconds a cached sensor owner is trusted
+    SENSOR_CACHE_SIZE = int(os.getenv('SENSOR_CACHE_SIZE', 4096))  # Max cached sensors (LRU)
+    
+    # Real-time push (Socket.IO)
+    SOCKET_DEFAULT_RATE = float(os.getenv('SOCKET_DEFAULT_RATE', 1))  # Updates per second until a client sets its own
+    SOCKET_MAX_RATE = float(os.getenv('SOCKET_MAX_RATE', 5))  # Highest rate a client may request
+    
+    # Audit log writer
+    AUDIT_BATCH_SIZE = int(os.getenv('AUDIT_BATCH_SIZE', 200))  # Entries per insert
+    AUDIT_FLUSH_INTERVAL = float(os.getenv('AUDIT_FLUSH_INTERVAL', 2.0))  # Max seconds an entry waits in the queue
+    AUDIT_QUEUE_MAX = int(os.getenv('AUDIT_QUEUE_MAX', 10000))  # Entries beyond this are dropped
+    
+    # Retention (see retention.py); 0 keeps a table forever. Off by default:
+    # purged raw readings are gone unless ARCHIVE_ENABLED
+    RETENTION_ENABLED = os.getenv('RETENTION_ENABLED', 'False') == 'True'
+    RETENTION_INTERVAL_HOURS = float(os.getenv('RETENTION_INTERVAL_HOURS', 6))  # Hours between retention runs
+    READINGS_RETENTION_DAYS = int(os.getenv('READINGS_RETENTION_DAYS', 90))  # Raw readings (hourly/daily rollups are kept)
+    ROLLUP_MINUTE_RETENTION_DAYS = int(os.getenv('ROLLUP_MINUTE_RETENTION_DAYS', 30))
+    ALERT_HISTORY_RETENTION_DAYS = int(os.getenv('ALERT_HISTORY_RETENTION_DAYS', 365))  # Resolved alerts only
+    AUDIT_RETENTION_DAYS = int(os.getenv('AUDIT_RETENTION_DAYS', 365))
+    RETENTION_CHUNK_SIZE = int(os.getenv('RETENTION_CHUNK_SIZE', 5000))  # Rows deleted per transaction
+    RETENTION_CHUNK_PAUSE = float(os.getenv('RETENTION_CHUNK_PAUSE', 0.05))  # Seconds between chunks
+    RETENTION_VACUUM_PAGES = int(os.getenv('RETENTION_VACUUM_PAGES', 2000))  # Pages released per incremental_vacuum
+    
+    # Cold archive of purged readings (see archive.py; needs pyarrow and duckdb)
+    ARCHIVE_ENABLED = os.getenv('ARCHIVE_ENABLED', 'False') == 'True'
+    ARCHIVE_DIR = os.getenv('ARCHIVE_DIR', '')  # Default: instance/archive
+    
+    # Anomaly detection (see anomaly_detection.py)
+    ANOMALY_Z_THRESHOLD = float(os.getenv('ANOMALY_Z_THRESHOLD', 3.0))  # Rolling z-score beyond which a reading is flagged
+    ANOMALY_WINDOW = int(os.getenv('ANOMALY_WINDOW', 60))  # Previous readings a rolling z-score compares with
+    ANOMALY_CONTAMINATION = float(os.getenv('ANOMALY_CONTAMINATION', 0.01))  # Share of outliers IsolationForest expects
+    ANOMALY_TRAIN_DAYS = int(os.getenv('ANOMALY_TRAIN_DAYS', 30))  # Days of readings a model is fitted on
+    ANOMALY_MAX_TRAIN = int(os.getenv('ANOMALY_MAX_TRAIN', 10000))  # Readings sampled for a fit
+    ANOMALY_MODEL_TTL = int(os.getenv('ANOMALY_MODEL_TTL', 21600))  # Seconds before a model is refitted
+    
+    # Forecasting (see forecasting.py)
+    FORECAST_TRAIN_DAYS = int(os.getenv('FORECAST_TRAIN_DAYS', 28))  # Days of hourly readings a model is fitted on
+    FORECAST_REFIT_MINUTES = int(os.getenv('FORECAST_REFIT_MINUTES', 60))  # Minutes between scheduled refits
+    FORECAST_MAX_HOURS = int(os.getenv('FORECAST_MAX_HOURS', 168))  # Longest horizon /predict accepts
+    FORECAST_INTERVAL_Z = float(os.getenv('FORECAST_INTERVAL_Z', 1.96))  # Interval half-width in standard deviations (95%)
+    FORECAST_SHRINKAGE = float(os.getenv('FORECAST_SHRINKAGE', 2.0))  # Pseudo-count towards the hour-of-day profile
+    
+    # Request and SQL metrics (see metrics.py; /api/system/performance and /metrics)
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True') == 'True'
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')  # Bearer token /metrics requires; empty: scrapes from localhost only
+    
+    # Report jobs
+    REPORT_WORKERS = int(os.getenv('REPORT_WORKERS', 2))  # Background rendering threads
+    REPORT_CACHE_TTL = int(os.getenv('REPORT_CACHE_TTL', 600))  # Seconds a rendered report is reused
+    REPORT_WAIT_TIMEOUT = float(os.getenv('REPORT_WAIT_TIMEOUT', 2))  # Seconds /export/pdf waits before answering 202
     
     # Frontend URL
     FRONTEND_URL = os.getenv('FRONTEND_URL', 'http://localhost:5173')
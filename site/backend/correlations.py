@@ -0,0 +1,237 @@
+"""
+Pearson correlations between co2, temperature and humidity.
+
+`sensor_correlation_daily` holds, per sensor and UTC day, the sufficient
+statistics of the readings: their count, the sum of every metric and the
+sum of every product of two metrics (squares included). Ingest folds new
+readings in with one upsert per sensor and day (`apply_readings`).
+
+Sums add up, so the statistics of any window of days (and of any set of
+sensors) are one SUM over its daily rows, and the correlation matrix
+follows without reading a single raw row:
+
+    cov(x, y) = n * Sxy - Sx * Sy
+    r(x, y)   = cov(x, y) / sqrt(cov(x, x) * cov(y, y))
+
+Simulated sensors are not stored; their statistics are computed from their
+generated readings over the window.
+
+Daily rows outlive raw readings purged by retention. Days that still have
+raw readings can be rebuilt with `rebuild_correlations`; run this module
+directly to rebuild them.
+"""
+from database import db, SensorCorrelationDay, SensorReading, dialect_insert
+from sensor_providers import SIMULATED, METRICS
+from rollups import bucket_epoch
+from sqlalchemy import func
+from datetime import datetime, timedelta
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Index pairs of the product columns: (co2, co2), (co2, temperature), ...
+PAIRS = [(i, j) for i in range(len(METRICS)) for j in range(i, len(METRICS))]
+PRODUCT_COLUMNS = [f'{METRICS[i]}_{METRICS[j]}' for i, j in PAIRS]
+SUM_COLUMNS = [f'{metric}_sum' for metric in METRICS]
+# Display names of the pairs, as the dashboard charts them against co2
+PAIR_NAMES = {
+    ('co2', 'temperature'): 'Temperature',
+    ('co2', 'humidity'): 'Humidity',
+    ('temperature', 'humidity'): 'Temperature / Humidity',
+}
+# Relative variance below which a metric counts as constant
+MIN_RELATIVE_VARIANCE = 1e-12
+
+
+def empty_statistics():
+    """Statistics vector of no readings"""
+    return np.zeros(1 + len(SUM_COLUMNS) + len(PRODUCT_COLUMNS))
+
+
+def _statistics(values):
+    """Statistics vector [count, sums..., products...] of an (n, 3) array"""
+    products = [float(np.dot(values[:, i], values[:, j])) for i, j in PAIRS]
+    return np.array([len(values), *values.sum(axis=0), *products], dtype=float)
+
+
+def apply_readings(rows):
+    """
+    Fold newly stored readings into the daily statistics.
+
+    Runs in the caller's transaction; the caller commits.
+
+    Args:
+        rows: Iterable of dicts with sensor_id, co2, temperature, humidity
+            and recorded_at (naive UTC datetime)
+    """
+    partials = {}
+    for row in rows:
+        key = (row['sensor_id'], row['recorded_at'].date())
+        partial = partials.get(key)
+        if partial is None:
+            partial = {'sensor_id': key[0], 'day': key[1], 'count': 0}
+            for column in SUM_COLUMNS + PRODUCT_COLUMNS:
+                partial[column] = 0.0
+            partials[key] = partial
+        partial['count'] += 1
+        values = [row[metric] for metric in METRICS]
+        for column, value in zip(SUM_COLUMNS, values):
+            partial[column] += value
+        for column, (i, j) in zip(PRODUCT_COLUMNS, PAIRS):
+            partial[column] += values[i] * values[j]
+    if not partials:
+        return
+
+    stmt = dialect_insert(SensorCorrelationDay)[0]
+    excluded = stmt.excluded
+    table = SensorCorrelationDay.__table__.c
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['sensor_id', 'day'],
+        set_={
+            column: table[column] + excluded[column]
+            for column in ['count'] + SUM_COLUMNS + PRODUCT_COLUMNS
+        }
+    )
+    db.session.execute(stmt, list(partials.values()))
+
+
+def delete_correlations(sensor_id):
+    """Remove the daily statistics of a sensor (used when the sensor is deleted)"""
+    SensorCorrelationDay.query.filter_by(sensor_id=sensor_id).delete(synchronize_session=False)
+
+
+def rebuild_correlations(sensor_id=None):
+    """
+    Recompute the daily statistics of every day that still has raw readings
+    with one GROUP BY. Days whose raw readings were purged are kept as is.
+
+    Args:
+        sensor_id: Only rebuild this sensor (default: all sensors)
+
+    Returns:
+        Number of daily rows written
+    """
+    day = bucket_epoch(SensorReading.recorded_at, 86400).label('day')
+    metrics = [getattr(SensorReading, metric) for metric in METRICS]
+    columns = [SensorReading.sensor_id, day, func.count().label('count')]
+    columns += [func.sum(column).label(name) for column, name in zip(metrics, SUM_COLUMNS)]
+    columns += [
+        func.sum(metrics[i] * metrics[j]).label(name)
+        for (i, j), name in zip(PAIRS, PRODUCT_COLUMNS)
+    ]
+    query = db.session.query(*columns)
+    if sensor_id is not None:
+        query = query.filter(SensorReading.sensor_id == sensor_id)
+
+    rows = []
+    for result in query.group_by(SensorReading.sensor_id, day):
+        row = result._asdict()
+        row['day'] = datetime.utcfromtimestamp(int(row['day'])).date()
+        rows.append(row)
+
+    if rows:
+        stmt = dialect_insert(SensorCorrelationDay)[0]
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['sensor_id', 'day'],
+            set_={
+                column: stmt.excluded[column]
+                for column in ['count'] + SUM_COLUMNS + PRODUCT_COLUMNS
+            }
+        )
+        db.session.execute(stmt, rows)
+    db.session.commit()
+    logger.info(f"Correlation statistics rebuilt: {len(rows)} days")
+    return len(rows)
+
+
+def load_statistics(sensors, days, now=None):
+    """
+    Statistics of several sensors over the last `days` UTC days (today
+    included), stored ones in a single query.
+
+    Args:
+        sensors: Objects with id, name and sensor_type
+
+    Returns:
+        Dictionary of sensor id -> statistics vector
+    """
+    now = now or datetime.utcnow()
+    first_day = now.date() - timedelta(days=days - 1)
+    statistics = {sensor.id: empty_statistics() for sensor in sensors}
+
+    stored = [sensor.id for sensor in sensors if sensor.sensor_type != 'simulation']
+    if stored:
+        columns = [func.sum(getattr(SensorCorrelationDay, column)) for column in ['count'] + SUM_COLUMNS + PRODUCT_COLUMNS]
+        query = db.session.query(SensorCorrelationDay.sensor_id, *columns).filter(
+            SensorCorrelationDay.sensor_id.in_(stored),
+            SensorCorrelationDay.day >= first_day
+        ).group_by(SensorCorrelationDay.sensor_id)
+        for row in query:
+            statistics[row[0]] = np.array(row[1:], dtype=float)
+
+    start = datetime.combine(first_day, datetime.min.time())
+    for sensor in sensors:
+        if sensor.sensor_type == 'simulation':
+            _, values = SIMULATED.arrays(sensor, start - timedelta(microseconds=1), now)
+            if len(values):
+                statistics[sensor.id] = _statistics(values)
+    return statistics
+
+
+def correlation_matrix(statistics):
+    """
+    Pearson matrix (METRICS x METRICS) of a statistics vector; entries are
+    None where a metric is constant or fewer than 3 readings exist.
+    """
+    count = statistics[0]
+    sums = statistics[1:1 + len(METRICS)]
+    products = np.zeros((len(METRICS), len(METRICS)))
+    for value, (i, j) in zip(statistics[1 + len(METRICS):], PAIRS):
+        products[i, j] = products[j, i] = value
+
+    size = len(METRICS)
+    if count < 3:
+        return [[None] * size for _ in range(size)]
+
+    covariance = count * products - np.outer(sums, sums)
+    variance = np.diag(covariance)
+    constant = variance <= MIN_RELATIVE_VARIANCE * count * np.abs(np.diag(products))
+    matrix = []
+    for i in range(size):
+        row = []
+        for j in range(size):
+            if constant[i] or constant[j]:
+                row.append(None)
+            else:
+                r = covariance[i, j] / np.sqrt(variance[i] * variance[j])
+                row.append(round(float(np.clip(r, -1.0, 1.0)), 4))
+        matrix.append(row)
+    return matrix
+
+
+def correlation_pairs(matrix, count):
+    """The off-diagonal pairs of a matrix that are defined, as dicts"""
+    pairs = []
+    for i in range(len(METRICS)):
+        for j in range(i + 1, len(METRICS)):
+            value = matrix[i][j]
+            if value is None:
+                continue
+            var1, var2 = METRICS[i], METRICS[j]
+            pairs.append({
+                'name': PAIR_NAMES[(var1, var2)],
+                'var1': var1,
+                'var2': var2,
+                'value': value,
+                'correlation': value,
+                'samples': int(count)
+            })
+    return pairs
+
+
+if __name__ == '__main__':
+    from app import app
+
+    with app.app_context():
+        print(f"Correlation days rebuilt: {rebuild_correlations()}")
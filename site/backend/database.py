@@ -1,7 +1,11 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import func
+from sqlalchemy.dialects import sqlite, postgresql
+from sqlalchemy.orm import declared_attr
 from datetime import datetime
+from db_engine import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 class User(db.Model):
     __tablename__ = 'users'
@@ -44,6 +48,7 @@ class Sensor(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     readings = db.relationship('SensorReading', backref='sensor', lazy=True, cascade='all, delete-orphan')
+    latest = db.relationship('SensorLatest', uselist=False, lazy=True, cascade='all, delete-orphan')
     
     def to_dict(self, include_latest_reading=False):
         result = {
@@ -59,8 +64,8 @@ class Sensor(db.Model):
             'updated_at': self.updated_at.isoformat()
         }
         
-        if include_latest_reading and self.readings:
-            latest = max(self.readings, key=lambda r: r.recorded_at)
+        if include_latest_reading and self.latest:
+            latest = self.latest
             result['co2'] = latest.co2
             result['temperature'] = latest.temperature
             result['humidity'] = latest.humidity
@@ -79,6 +84,12 @@ class SensorReading(db.Model):
     humidity = db.Column(db.Float, nullable=False)
     recorded_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    __table_args__ = (
+        db.Index('ix_sensor_readings_sensor_recorded', 'sensor_id', 'recorded_at'),
+        # Retention purges by age across all sensors
+        db.Index('ix_sensor_readings_recorded', 'recorded_at'),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -90,6 +101,132 @@ class SensorReading(db.Model):
         }
 
 
+class SensorLatest(db.Model):
+    """Most recent reading of each sensor, upserted by every ingest path"""
+    __tablename__ = 'sensor_latest'
+    
+    sensor_id = db.Column(db.Integer, db.ForeignKey('sensors.id'), primary_key=True)
+    reading_id = db.Column(db.Integer)
+    co2 = db.Column(db.Float, nullable=False)
+    temperature = db.Column(db.Float, nullable=False)
+    humidity = db.Column(db.Float, nullable=False)
+    recorded_at = db.Column(db.DateTime, nullable=False)
+    
+    def to_dict(self):
+        return {
+            'id': self.reading_id,
+            'sensor_id': self.sensor_id,
+            'co2': self.co2,
+            'temperature': self.temperature,
+            'humidity': self.humidity,
+            'recorded_at': self.recorded_at.isoformat()
+        }
+
+
+class ReadingRollupMixin:
+    """
+    Columns shared by the rollup tables. Sums are stored instead of averages
+    so buckets can be merged incrementally; averages are derived in to_dict.
+    """
+    bucket_seconds = None
+    
+    @declared_attr
+    def sensor_id(cls):
+        return db.Column(db.Integer, db.ForeignKey('sensors.id'), primary_key=True)
+    
+    bucket_start = db.Column(db.DateTime, primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    co2_min = db.Column(db.Float)
+    co2_max = db.Column(db.Float)
+    co2_sum = db.Column(db.Float, default=0)
+    temperature_min = db.Column(db.Float)
+    temperature_max = db.Column(db.Float)
+    temperature_sum = db.Column(db.Float, default=0)
+    humidity_min = db.Column(db.Float)
+    humidity_max = db.Column(db.Float)
+    humidity_sum = db.Column(db.Float, default=0)
+    
+    def to_dict(self):
+        count = self.count or 1
+        return {
+            'sensor_id': self.sensor_id,
+            'co2': round(self.co2_sum / count, 2),
+            'temperature': round(self.temperature_sum / count, 2),
+            'humidity': round(self.humidity_sum / count, 2),
+            'co2_min': self.co2_min,
+            'co2_max': self.co2_max,
+            'temperature_min': self.temperature_min,
+            'temperature_max': self.temperature_max,
+            'humidity_min': self.humidity_min,
+            'humidity_max': self.humidity_max,
+            'count': self.count,
+            'recorded_at': self.bucket_start.isoformat()
+        }
+
+
+class SensorReadingMinute(ReadingRollupMixin, db.Model):
+    __tablename__ = 'sensor_readings_1m'
+    bucket_seconds = 60
+
+
+class SensorReadingHour(ReadingRollupMixin, db.Model):
+    __tablename__ = 'sensor_readings_1h'
+    bucket_seconds = 3600
+
+
+class SensorReadingDay(ReadingRollupMixin, db.Model):
+    __tablename__ = 'sensor_readings_1d'
+    bucket_seconds = 86400
+
+
+# Rollup models keyed by resolution name, finest first
+ROLLUP_MODELS = {
+    '1m': SensorReadingMinute,
+    '1h': SensorReadingHour,
+    '1d': SensorReadingDay,
+}
+
+
+class SensorHeatmapCell(db.Model):
+    """
+    Running totals of a sensor's readings per hour of the week (UTC, Monday
+    00h = 0), updated on ingest so heatmaps never scan readings
+    """
+    __tablename__ = 'sensor_heatmap'
+
+    sensor_id = db.Column(db.Integer, db.ForeignKey('sensors.id'), primary_key=True)
+    hour_of_week = db.Column(db.Integer, primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    co2_sum = db.Column(db.Float, default=0)
+    co2_max = db.Column(db.Float)
+    temperature_sum = db.Column(db.Float, default=0)
+    temperature_max = db.Column(db.Float)
+    humidity_sum = db.Column(db.Float, default=0)
+    humidity_max = db.Column(db.Float)
+
+
+class SensorCorrelationDay(db.Model):
+    """
+    Sufficient statistics of a sensor's readings per UTC day (sums, sums of
+    squares and cross products of co2, temperature and humidity), updated on
+    ingest so correlations over any window of days never scan readings
+    """
+    __tablename__ = 'sensor_correlation_daily'
+
+    sensor_id = db.Column(db.Integer, db.ForeignKey('sensors.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    co2_sum = db.Column(db.Float, default=0)
+    temperature_sum = db.Column(db.Float, default=0)
+    humidity_sum = db.Column(db.Float, default=0)
+    co2_co2 = db.Column(db.Float, default=0)
+    temperature_temperature = db.Column(db.Float, default=0)
+    humidity_humidity = db.Column(db.Float, default=0)
+    co2_temperature = db.Column(db.Float, default=0)
+    co2_humidity = db.Column(db.Float, default=0)
+    temperature_humidity = db.Column(db.Float, default=0)
+
+
 class Alert(db.Model):
     __tablename__ = 'alerts'
     
@@ -102,10 +239,13 @@ class Alert(db.Model):
     status = db.Column(db.String(50), default='nouvelle')  # 'nouvelle', 'reconnue', 'résolue'
     acknowledged_at = db.Column(db.DateTime)
     resolved_at = db.Column(db.DateTime)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    
+    # Joined eagerly so a page of alerts resolves its sensors in the same query
+    sensor = db.relationship('Sensor', lazy='joined')
     
     def to_dict(self):
-        sensor = Sensor.query.get(self.sensor_id)
+        sensor = self.sensor
         result = {
             'id': str(self.id),
             'sensorId': str(self.sensor_id),
@@ -138,10 +278,13 @@ class AlertHistory(db.Model):
     status = db.Column(db.String(50), default='triggered')  # 'triggered', 'acknowledged', 'resolved'
     acknowledged_at = db.Column(db.DateTime)
     resolved_at = db.Column(db.DateTime)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    
+    # Joined eagerly so listings and exports resolve sensors in the same query
+    sensor = db.relationship('Sensor', lazy='joined')
     
     def to_dict(self):
-        sensor = Sensor.query.get(self.sensor_id)
+        sensor = self.sensor
         return {
             'id': str(self.id),
             'sensorId': str(self.sensor_id),
@@ -159,7 +302,156 @@ class AlertHistory(db.Model):
         }
 
 
+class EmailOutbox(db.Model):
+    """Alert email waiting for (or done with) background delivery"""
+    __tablename__ = 'email_outbox'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'))
+    to_email = db.Column(db.String(255), nullable=False, index=True)
+    kind = db.Column(db.String(50), nullable=False, default='alert')
+    payload = db.Column(db.JSON, nullable=False)  # sensor_name, alert_type, alert_value, threshold, timestamp
+    status = db.Column(db.String(20), nullable=False, default='pending', index=True)  # 'pending', 'sending', 'sent', 'failed'
+    claimed_by = db.Column(db.String(32))
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.String(500))
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+    
+    def __repr__(self):
+        return f'<EmailOutbox {self.id} to {self.to_email} ({self.status})>'
+
+
+def dialect_insert(model):
+    """
+    Return an INSERT supporting ON CONFLICT for the active dialect, together
+    with the two-argument min/max functions of that dialect.
+    """
+    if db.engine.dialect.name == 'postgresql':
+        return postgresql.insert(model), func.least, func.greatest
+    return sqlite.insert(model), func.min, func.max
+
+
+def upsert_sensor_latest(rows):
+    """
+    Record the newest of `rows` per sensor in sensor_latest. Older readings
+    (e.g. late batch uploads) never replace a newer stored value.
+    
+    Args:
+        rows: Iterable of reading dicts with sensor_id, co2, temperature,
+            humidity, recorded_at and optionally id
+    """
+    newest = {}
+    for row in rows:
+        current = newest.get(row['sensor_id'])
+        if current is None or row['recorded_at'] >= current['recorded_at']:
+            newest[row['sensor_id']] = row
+    if not newest:
+        return
+    
+    values = [
+        {
+            'sensor_id': row['sensor_id'],
+            'reading_id': row.get('id'),
+            'co2': row['co2'],
+            'temperature': row['temperature'],
+            'humidity': row['humidity'],
+            'recorded_at': row['recorded_at']
+        }
+        for row in newest.values()
+    ]
+    stmt, _, _ = dialect_insert(SensorLatest)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['sensor_id'],
+        set_={
+            'reading_id': stmt.excluded.reading_id,
+            'co2': stmt.excluded.co2,
+            'temperature': stmt.excluded.temperature,
+            'humidity': stmt.excluded.humidity,
+            'recorded_at': stmt.excluded.recorded_at
+        },
+        where=stmt.excluded.recorded_at >= SensorLatest.__table__.c.recorded_at
+    )
+    db.session.execute(stmt, values)
+
+
+def backfill_sensor_latest():
+    """Populate sensor_latest from raw readings for sensors missing a row"""
+    missing = db.session.query(Sensor.id).outerjoin(SensorLatest).filter(
+        SensorLatest.sensor_id.is_(None)
+    ).all()
+    
+    rows = []
+    for (sensor_id,) in missing:
+        # Served by the (sensor_id, recorded_at) index
+        reading = SensorReading.query.filter_by(sensor_id=sensor_id).order_by(
+            SensorReading.recorded_at.desc()
+        ).first()
+        if reading:
+            rows.append({
+                'id': reading.id,
+                'sensor_id': reading.sensor_id,
+                'co2': reading.co2,
+                'temperature': reading.temperature,
+                'humidity': reading.humidity,
+                'recorded_at': reading.recorded_at
+            })
+    
+    upsert_sensor_latest(rows)
+    db.session.commit()
+    return len(rows)
+
+
+def create_missing_indexes():
+    """
+    Create declared indexes missing from existing tables (create_all only
+    creates the indexes of tables it creates itself)
+    """
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
+
+
+def backfill_empty_rollups():
+    """Build the rollups from raw readings when every rollup table is empty"""
+    import rollups
+    
+    if any(model.query.first() is not None for model in ROLLUP_MODELS.values()):
+        return None
+    if SensorReading.query.first() is None:
+        return None
+    return rollups.backfill_rollups()
+
+
+def backfill_empty_heatmaps():
+    """Build the heatmap cells from the hourly rollups when the table is empty"""
+    import heatmaps
+    
+    if SensorHeatmapCell.query.first() is not None:
+        return None
+    if ROLLUP_MODELS['1h'].query.first() is None:
+        return None
+    return heatmaps.rebuild_heatmaps()
+
+
+def backfill_empty_correlations():
+    """Build the daily correlation statistics from raw readings when the table is empty"""
+    import correlations
+    
+    if SensorCorrelationDay.query.first() is not None:
+        return None
+    if SensorReading.query.first() is None:
+        return None
+    return correlations.rebuild_correlations()
+
+
 def init_db():
     """Initialize the database and create tables"""
     db.create_all()
+    create_missing_indexes()
+    backfill_sensor_latest()
+    backfill_empty_rollups()
+    backfill_empty_heatmaps()
+    backfill_empty_correlations()
     print("Database initialized successfully")
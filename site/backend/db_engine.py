@@ -0,0 +1,131 @@
+"""
+Database engine profile: SQLite pragmas and a read-only pool for GET requests.
+
+Every SQLite connection gets the pragmas of `sqlite_pragmas` when it is
+opened: incremental auto-vacuum, WAL journaling so readers never block the writer, `synchronous=NORMAL`
+(durable at checkpoints, safe with WAL), a busy timeout instead of failing
+immediately on a locked database, and memory-mapped I/O with a larger page
+cache.
+
+GET and HEAD requests run their queries on a separate pool of read-only
+connections (`DATABASE_READ_URL`, or the same SQLite file opened with
+`mode=ro`). Anything that writes (a flush or an INSERT/UPDATE/DELETE) goes to
+the primary engine, and the rest of that transaction stays there so it sees
+its own changes.
+"""
+from flask import current_app, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine, event
+import logging
+
+logger = logging.getLogger(__name__)
+
+READ_METHODS = ('GET', 'HEAD')
+
+
+def sqlite_pragmas(config, read_only=False):
+    """PRAGMA statements run on every new SQLite connection"""
+    pragmas = [
+        f"PRAGMA busy_timeout = {int(config.get('SQLITE_BUSY_TIMEOUT', 5000))}",
+        f"PRAGMA mmap_size = {int(config.get('SQLITE_MMAP_SIZE', 268435456))}",
+        f"PRAGMA cache_size = {int(config.get('SQLITE_CACHE_SIZE', -65536))}",
+    ]
+    if read_only:
+        pragmas.append("PRAGMA query_only = ON")
+    else:
+        # auto_vacuum only takes effect on a new file (see retention.py)
+        pragmas[:0] = [
+            f"PRAGMA auto_vacuum = {config.get('SQLITE_AUTO_VACUUM', 'INCREMENTAL')}",
+            f"PRAGMA journal_mode = {config.get('SQLITE_JOURNAL_MODE', 'WAL')}",
+            f"PRAGMA synchronous = {config.get('SQLITE_SYNCHRONOUS', 'NORMAL')}",
+        ]
+    return pragmas
+
+
+def install_pragmas(engine, pragmas):
+    """Run `pragmas` on each connection the engine opens"""
+
+    @event.listens_for(engine, 'connect')
+    def _apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+
+def _read_url(engine, config):
+    """URL of the read-only pool, or None when reads share the primary engine"""
+    if config.get('DATABASE_READ_URL'):
+        return config['DATABASE_READ_URL']
+    url = engine.url
+    if url.get_backend_name() != 'sqlite' or url.database in (None, '', ':memory:'):
+        return None
+    return f"sqlite:///file:{url.database}?mode=ro&uri=true"
+
+
+def init_engines(app, db):
+    """
+    Apply the SQLite profile to the primary engine and create the read-only
+    pool (stored in app.extensions['db_read_engine']).
+    """
+    config = app.config
+    with app.app_context():
+        engine = db.engine
+        if engine.dialect.name == 'sqlite':
+            install_pragmas(engine, sqlite_pragmas(config))
+            # Switch the file to WAL now, before the read-only pool opens it
+            with engine.connect():
+                pass
+
+        read_url = _read_url(engine, config) if config.get('DB_READ_POOL', True) else None
+        if read_url is None:
+            return None
+
+        read_engine = create_engine(
+            read_url,
+            pool_size=config.get('DB_READ_POOL_SIZE', 5),
+            max_overflow=config.get('DB_READ_POOL_SIZE', 5)
+        )
+        if read_engine.dialect.name == 'sqlite':
+            install_pragmas(read_engine, sqlite_pragmas(config, read_only=True))
+        app.extensions['db_read_engine'] = read_engine
+        logger.info("Read-only database pool enabled for GET requests")
+        return read_engine
+
+
+def _read_engine():
+    """Read-only engine when serving a GET/HEAD request, else None"""
+    if not has_request_context() or request.method not in READ_METHODS:
+        return None
+    return current_app.extensions.get('db_read_engine')
+
+
+class RoutingSession(Session):
+    """Session that sends the reads of GET requests to the read-only pool"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self.info.get('db_wrote'):
+            writes = self._flushing or getattr(clause, 'is_dml', False)
+            if writes:
+                self.info['db_wrote'] = True
+            else:
+                read_engine = _read_engine()
+                if read_engine is not None:
+                    return read_engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+@event.listens_for(RoutingSession, 'after_rollback')
+def _end_write_transaction(session):
+    session.info.pop('db_wrote', None)
+
+
+def engine_stats():
+    """Pool status of the primary and read-only engines (for /api/health)"""
+    stats = {'primary': current_app.extensions['sqlalchemy'].engine.pool.status()}
+    read_engine = current_app.extensions.get('db_read_engine')
+    stats['read_pool'] = read_engine.pool.status() if read_engine is not None else None
+    return stats
@@ -1,38 +1,66 @@
 """
 Email notification service for sending alerts to users
+
+Alert emails are not sent from the request that triggers them. They are
+queued in the `email_outbox` table and delivered by background sender
+threads, which reuse one SMTP connection per batch, retry failures with
+exponential backoff and coalesce alerts for the same recipient into one
+digest per ALERT_SEND_INTERVAL.
 """
 from flask_mail import Mail, Message
 from flask import current_app
+from database import db, EmailOutbox
+from datetime import datetime, timedelta
 import logging
+import threading
+import uuid
 
 mail = Mail()
 logger = logging.getLogger(__name__)
 
+_wake = threading.Event()
+_senders = []
+
 
 def init_email(app):
     """Initialize Flask-Mail with app"""
     mail.init_app(app)
 
 
-def send_alert_email(to_email, sensor_name, alert_type, alert_value, threshold):
+def queue_alert_email(to_email, sensor_name, alert_type, alert_value, threshold, user_id=None):
     """
-    Send alert email to user
+    Queue an alert email for background delivery.
     
-    Args:
-        to_email: User email address
-        sensor_name: Name of the sensor
-        alert_type: Type of alert (e.g., "High CO2", "High Temperature")
-        alert_value: Current value that triggered the alert
-        threshold: Threshold that was exceeded
+    The row is added to the current session; it is sent once the caller
+    commits. Arguments are the same as send_alert_email.
     """
     if not current_app.config.get('ENABLE_EMAIL_NOTIFICATIONS'):
         logger.info(f"Email notifications disabled, skipping email to {to_email}")
-        return
+        return None
     
-    try:
-        subject = f"🚨 Air Sense Alert: {alert_type} on {sensor_name}"
-        
-        body = f"""
+    entry = EmailOutbox(
+        user_id=user_id,
+        to_email=to_email,
+        kind='alert',
+        payload={
+            'sensor_name': sensor_name,
+            'alert_type': alert_type,
+            'alert_value': alert_value,
+            'threshold': threshold,
+            'timestamp': datetime.utcnow().isoformat()
+        }
+    )
+    db.session.add(entry)
+    _wake.set()
+    return entry
+
+
+def build_alert_message(to_email, sensor_name, alert_type, alert_value, threshold, timestamp=None):
+    """Build the alert email for a single threshold crossing"""
+    timestamp = timestamp or datetime.now()
+    subject = f"🚨 Air Sense Alert: {alert_type} on {sensor_name}"
+    
+    body = f"""
 Hello,
 
 An alert has been triggered on your sensor: {sensor_name}
@@ -40,15 +68,15 @@ An alert has been triggered on your sensor: {sensor_name}
 Alert Type: {alert_type}
 Current Value: {alert_value}
 Threshold: {threshold}
-Timestamp: {__import__('datetime').datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+Timestamp: {timestamp.strftime('%Y-%m-%d %H:%M:%S')}
 
 Please check the Air Sense Dashboard for more details.
 
 Best regards,
 Air Sense Dashboard
-        """
-        
-        html = f"""
+    """
+    
+    html = f"""
         <html>
             <body style="font-family: Arial, sans-serif;">
                 <div style="max-width: 600px; margin: 0 auto;">
@@ -75,21 +103,238 @@ Air Sense Dashboard
             </body>
         </html>
         """
-        
-        msg = Message(
-            subject=subject,
-            recipients=[to_email],
-            body=body,
-            html=html
-        )
-        
-        mail.send(msg)
+    
+    return Message(
+        subject=subject,
+        recipients=[to_email],
+        body=body,
+        html=html
+    )
+
+
+def build_digest_message(to_email, alerts):
+    """
+    Build one email summarizing several alerts for the same recipient.
+    
+    Args:
+        to_email: Recipient address
+        alerts: List of outbox payload dictionaries, oldest first
+    """
+    sensors = sorted({a['sensor_name'] for a in alerts})
+    subject = f"🚨 Air Sense: {len(alerts)} alerts on {', '.join(sensors[:3])}{'…' if len(sensors) > 3 else ''}"
+    
+    lines = [
+        f"- {a['timestamp'][:19].replace('T', ' ')} | {a['sensor_name']} | {a['alert_type']}: "
+        f"{a['alert_value']} (threshold {a['threshold']})"
+        for a in alerts
+    ]
+    body = (
+        "Hello,\n\n"
+        f"{len(alerts)} alerts were triggered on your sensors:\n\n"
+        + "\n".join(lines)
+        + "\n\nPlease check the Air Sense Dashboard for more details.\n\n"
+        "Best regards,\nAir Sense Dashboard\n"
+    )
+    
+    rows = ''.join(
+        f"""<tr>
+                            <td style="padding: 8px; border: 1px solid #ddd;">{a['timestamp'][:19].replace('T', ' ')}</td>
+                            <td style="padding: 8px; border: 1px solid #ddd;">{a['sensor_name']}</td>
+                            <td style="padding: 8px; border: 1px solid #ddd;">{a['alert_type']}</td>
+                            <td style="padding: 8px; border: 1px solid #ddd;">{a['alert_value']}</td>
+                            <td style="padding: 8px; border: 1px solid #ddd;">{a['threshold']}</td>
+                        </tr>"""
+        for a in alerts
+    )
+    html = f"""
+        <html>
+            <body style="font-family: Arial, sans-serif;">
+                <div style="max-width: 600px; margin: 0 auto;">
+                    <h2>🚨 Air Sense Alerts</h2>
+                    <p>Hello,</p>
+                    <p>{len(alerts)} alerts were triggered on your sensors:</p>
+                    <table style="width: 100%; border-collapse: collapse; margin: 20px 0;">
+                        <tr style="background-color: #f5f5f5;">
+                            <th style="padding: 8px; border: 1px solid #ddd;">Time</th>
+                            <th style="padding: 8px; border: 1px solid #ddd;">Sensor</th>
+                            <th style="padding: 8px; border: 1px solid #ddd;">Alert Type</th>
+                            <th style="padding: 8px; border: 1px solid #ddd;">Value</th>
+                            <th style="padding: 8px; border: 1px solid #ddd;">Threshold</th>
+                        </tr>
+                        {rows}
+                    </table>
+                    <p>Please check the <a href="{current_app.config.get('FRONTEND_URL', 'http://localhost:5173')}/alerts">Air Sense Dashboard</a> for more details.</p>
+                    <p style="color: #666; font-size: 12px; margin-top: 20px;">Air Sense Dashboard</p>
+                </div>
+            </body>
+        </html>
+        """
+    
+    return Message(subject=subject, recipients=[to_email], body=body, html=html)
+
+
+def send_alert_email(to_email, sensor_name, alert_type, alert_value, threshold):
+    """
+    Send alert email to user synchronously (prefer queue_alert_email)
+    
+    Args:
+        to_email: User email address
+        sensor_name: Name of the sensor
+        alert_type: Type of alert (e.g., "High CO2", "High Temperature")
+        alert_value: Current value that triggered the alert
+        threshold: Threshold that was exceeded
+    """
+    if not current_app.config.get('ENABLE_EMAIL_NOTIFICATIONS'):
+        logger.info(f"Email notifications disabled, skipping email to {to_email}")
+        return
+    
+    try:
+        mail.send(build_alert_message(to_email, sensor_name, alert_type, alert_value, threshold))
         logger.info(f"Alert email sent to {to_email} for {sensor_name}")
         
     except Exception as e:
         logger.error(f"Failed to send email to {to_email}: {str(e)}")
 
 
+def _retry_delay(attempts):
+    """Exponential backoff after `attempts` failed deliveries"""
+    base = current_app.config.get('EMAIL_RETRY_BASE', 30)
+    cap = current_app.config.get('EMAIL_RETRY_MAX', 3600)
+    return timedelta(seconds=min(base * 2 ** (attempts - 1), cap))
+
+
+def process_outbox():
+    """
+    Deliver due outbox emails once. Must run inside an app context.
+    
+    Alerts for a recipient who got an email less than ALERT_SEND_INTERVAL
+    seconds ago stay queued; when the interval has elapsed, everything
+    queued for them goes out as one digest. All messages of a run share
+    one SMTP connection.
+    
+    Returns:
+        Number of emails sent
+    """
+    now = datetime.utcnow()
+    interval = current_app.config.get('ALERT_SEND_INTERVAL', 300)
+    batch_size = current_app.config.get('EMAIL_BATCH_SIZE', 200)
+    
+    due = EmailOutbox.query.filter(
+        EmailOutbox.status == 'pending',
+        EmailOutbox.next_attempt_at <= now
+    ).order_by(EmailOutbox.created_at).limit(batch_size).all()
+    if not due:
+        return 0
+    
+    recipients = {entry.to_email for entry in due}
+    last_sent = dict(
+        db.session.query(EmailOutbox.to_email, db.func.max(EmailOutbox.sent_at)).filter(
+            EmailOutbox.to_email.in_(recipients),
+            EmailOutbox.status == 'sent'
+        ).group_by(EmailOutbox.to_email).all()
+    )
+    ready_ids = [
+        entry.id for entry in due
+        if not last_sent.get(entry.to_email)
+        or (now - last_sent[entry.to_email]).total_seconds() >= interval
+    ]
+    if not ready_ids:
+        return 0
+    
+    # Claim the rows so concurrent senders never deliver them twice
+    token = uuid.uuid4().hex
+    EmailOutbox.query.filter(
+        EmailOutbox.id.in_(ready_ids),
+        EmailOutbox.status == 'pending'
+    ).update({'status': 'sending', 'claimed_by': token}, synchronize_session=False)
+    db.session.commit()
+    
+    claimed = EmailOutbox.query.filter_by(claimed_by=token).order_by(EmailOutbox.created_at).all()
+    by_recipient = {}
+    for entry in claimed:
+        by_recipient.setdefault(entry.to_email, []).append(entry)
+    
+    sent = 0
+    try:
+        with mail.connect() as connection:
+            for to_email, entries in by_recipient.items():
+                payloads = [entry.payload for entry in entries]
+                try:
+                    if len(payloads) == 1:
+                        p = payloads[0]
+                        message = build_alert_message(
+                            to_email, p['sensor_name'], p['alert_type'], p['alert_value'], p['threshold'],
+                            datetime.fromisoformat(p['timestamp'])
+                        )
+                    else:
+                        message = build_digest_message(to_email, payloads)
+                    connection.send(message)
+                except Exception as e:
+                    _mark_failed(entries, e)
+                    continue
+                for entry in entries:
+                    entry.status = 'sent'
+                    entry.sent_at = datetime.utcnow()
+                sent += 1
+                logger.info(f"Alert email sent to {to_email} ({len(entries)} alerts)")
+    except Exception as e:
+        # Connection-level failure: everything still claimed is retried
+        _mark_failed([entry for entry in claimed if entry.status == 'sending'], e)
+    
+    db.session.commit()
+    return sent
+
+
+def _mark_failed(entries, error):
+    """Schedule a retry with backoff, or give up after EMAIL_MAX_ATTEMPTS"""
+    max_attempts = current_app.config.get('EMAIL_MAX_ATTEMPTS', 5)
+    for entry in entries:
+        entry.attempts += 1
+        entry.last_error = str(error)[:500]
+        entry.claimed_by = None
+        if entry.attempts >= max_attempts:
+            entry.status = 'failed'
+        else:
+            entry.status = 'pending'
+            entry.next_attempt_at = datetime.utcnow() + _retry_delay(entry.attempts)
+    logger.error(f"Failed to send email to {entries[0].to_email if entries else '?'}: {str(error)}")
+
+
+def _sender_loop(app):
+    poll_interval = app.config.get('EMAIL_POLL_INTERVAL', 5)
+    while True:
+        _wake.wait(poll_interval)
+        _wake.clear()
+        try:
+            with app.app_context():
+                process_outbox()
+        except Exception as e:
+            logger.error(f"Email outbox sender error: {str(e)}")
+
+
+def start_email_senders(app):
+    """Start the background outbox sender threads (once per process)"""
+    if _senders:
+        return
+    
+    # Rows claimed by a sender that died with the previous process
+    with app.app_context():
+        EmailOutbox.query.filter_by(status='sending').update(
+            {'status': 'pending', 'claimed_by': None}, synchronize_session=False
+        )
+        db.session.commit()
+    
+    for index in range(app.config.get('EMAIL_SENDER_THREADS', 1)):
+        thread = threading.Thread(
+            target=_sender_loop,
+            args=(app,),
+            name=f'email-sender-{index}',
+            daemon=True
+        )
+        thread.start()
+        _senders.append(thread)
+
+
 def send_daily_report_email(to_email, user_name, report_data):
     """
     Send daily sensor report email
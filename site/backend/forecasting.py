@@ -0,0 +1,222 @@
+"""
+Per-sensor forecasts of co2, temperature and humidity, hour by hour.
+
+Each model combines:
+
+    - a seasonal baseline per hour of the week (168 values per metric), the
+      mean of the hourly readings at that hour, shrunk towards the
+      hour-of-day profile when the hour has few samples
+    - an AR(1) regression of the deviation from that baseline,
+      r[t+1] = a + b * r[t], fitted by least squares on consecutive hours
+
+A forecast k hours ahead is the baseline plus the deviation carried forward,
+a * (1 - b^k) / (1 - b) + b^k * r0, where r0 is the deviation of the latest
+reading. The interval is FORECAST_INTERVAL_Z standard deviations of the
+k-step error, sigma^2 * (1 - b^2k) / (1 - b^2).
+
+Models are fitted on FORECAST_TRAIN_DAYS of hourly rollups by a scheduler
+job every FORECAST_REFIT_MINUTES and kept in memory, so a request only
+evaluates the cached parameters. A sensor without a model yet (new sensor,
+before the first job run) is fitted on its first request.
+"""
+from sensor_providers import readings_provider, METRICS
+from rollups import HOURS_PER_WEEK, hour_of_week
+from database import db, Sensor
+from auth_context import SensorRef
+from flask import current_app
+from datetime import datetime, timedelta
+import numpy as np
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Consecutive hourly pairs needed before the AR(1) term is trusted
+MIN_PAIRS = 24
+# Physical bounds of the forecasts (co2, temperature, humidity)
+LOWER_BOUNDS = np.array([0.0, -np.inf, 0.0])
+UPPER_BOUNDS = np.array([np.inf, np.inf, 100.0])
+
+_models = {}
+_lock = threading.Lock()
+
+
+class Forecaster:
+    """Fitted forecast parameters of one sensor"""
+
+    def __init__(self, sensor_id, fitted_at):
+        self.sensor_id = sensor_id
+        self.fitted_at = fitted_at
+        self.training_hours = 0
+        self.seasonal = None
+        self.intercept = np.zeros(len(METRICS))
+        self.slope = np.zeros(len(METRICS))
+        self.sigma = np.zeros(len(METRICS))
+        self.last_hour = None
+        self.last_residual = np.zeros(len(METRICS))
+
+    def fit(self, hours, values, shrinkage):
+        """
+        Fit the seasonal baseline and the AR(1) term.
+
+        Args:
+            hours: Bucket starts (datetime64[h]), oldest first
+            values: Hourly means, shape (n, 3)
+            shrinkage: Pseudo-count pulling sparse hours of the week towards
+                the hour-of-day profile
+        """
+        self.training_hours = len(hours)
+        if not len(hours):
+            return self
+
+        week_hour = hour_of_week(hours)
+        counts = np.bincount(week_hour, minlength=HOURS_PER_WEEK).astype(float)
+        sums = np.zeros((HOURS_PER_WEEK, values.shape[1]))
+        np.add.at(sums, week_hour, values)
+
+        overall = values.mean(axis=0)
+        day_counts = counts.reshape(7, 24).sum(axis=0)
+        day_sums = sums.reshape(7, 24, -1).sum(axis=0)
+        daily = (day_sums + shrinkage * overall) / (day_counts + shrinkage)[:, None]
+        self.seasonal = (sums + shrinkage * np.tile(daily, (7, 1))) / (counts + shrinkage)[:, None]
+
+        residuals = values - self.seasonal[week_hour]
+        consecutive = np.flatnonzero(np.diff(hours.astype(np.int64)) == 1)
+        if len(consecutive) >= MIN_PAIRS:
+            before, after = residuals[consecutive], residuals[consecutive + 1]
+            for j in range(values.shape[1]):
+                design = np.column_stack([np.ones(len(before)), before[:, j]])
+                (a, b), *_ = np.linalg.lstsq(design, after[:, j], rcond=None)
+                b = float(np.clip(b, 0.0, 0.99))
+                self.intercept[j] = a
+                self.slope[j] = b
+                self.sigma[j] = np.std(after[:, j] - a - b * before[:, j])
+        else:
+            self.sigma = residuals.std(axis=0)
+
+        self.last_hour = hours[-1]
+        self.last_residual = residuals[-1]
+        return self
+
+    def predict(self, targets, z, latest=None):
+        """
+        Forecasts at `targets` (datetime64[h], after the last observation).
+
+        Args:
+            targets: Hour buckets to forecast
+            z: Half-width of the interval in standard deviations
+            latest: Optional (hour, values) of a more recent reading, used
+                as the starting deviation instead of the one seen at fit time
+
+        Returns:
+            Tuple of (point forecasts, lower bounds, upper bounds), each of
+            shape (len(targets), 3)
+        """
+        anchor_hour, anchor = self.last_hour, self.last_residual
+        if latest is not None and latest[0] >= self.last_hour:
+            anchor_hour = latest[0]
+            anchor = latest[1] - self.seasonal[hour_of_week(np.array([latest[0]]))[0]]
+
+        # The slope is kept in [0, 0.99], so both geometric sums are finite
+        steps = np.maximum((targets - anchor_hour).astype(np.int64), 1)[:, None].astype(float)
+        decay = self.slope ** steps
+        deviation = self.intercept * (1 - decay) / (1 - self.slope) + decay * anchor
+        spread = self.sigma * np.sqrt((1 - decay ** 2) / (1 - self.slope ** 2))
+
+        point = self.seasonal[hour_of_week(targets)] + deviation
+        lower = np.clip(point - z * spread, LOWER_BOUNDS, UPPER_BOUNDS)
+        upper = np.clip(point + z * spread, LOWER_BOUNDS, UPPER_BOUNDS)
+        return np.clip(point, LOWER_BOUNDS, UPPER_BOUNDS), lower, upper
+
+
+def fit_forecaster(sensor, config, now=None):
+    """Fit a sensor's forecaster on its last FORECAST_TRAIN_DAYS of hourly readings"""
+    now = now or datetime.utcnow()
+    start = now - timedelta(days=config.get('FORECAST_TRAIN_DAYS', 28))
+    hours, values = readings_provider(sensor).hourly_arrays(sensor, start, now)
+    return Forecaster(sensor.id, now).fit(hours, values, config.get('FORECAST_SHRINKAGE', 2.0))
+
+
+def get_forecaster(sensor):
+    """Cached forecaster of a sensor, fitted on the spot the first time"""
+    with _lock:
+        forecaster = _models.get(sensor.id)
+    if forecaster is None:
+        forecaster = fit_forecaster(sensor, current_app.config)
+        with _lock:
+            _models[sensor.id] = forecaster
+    return forecaster
+
+
+def forecast(sensor, hours, now=None):
+    """
+    Hourly forecasts of a sensor for the next `hours` hour buckets.
+
+    Returns:
+        Tuple of (list of forecast dicts, forecaster); the list is empty when
+        the sensor has no history to learn from
+    """
+    config = current_app.config
+    now = now or datetime.utcnow()
+    forecaster = get_forecaster(sensor)
+    if forecaster.seasonal is None:
+        return [], forecaster
+
+    latest = None
+    reading = readings_provider(sensor).latest(sensor)
+    if reading:
+        recorded_at = np.datetime64(reading['recorded_at'], 'h')
+        latest = (recorded_at, np.array([reading[metric] for metric in METRICS], dtype=float))
+
+    targets = np.datetime64(now, 'h') + np.arange(1, hours + 1)
+    point, lower, upper = forecaster.predict(targets, config.get('FORECAST_INTERVAL_Z', 1.96), latest)
+
+    forecasts = []
+    for i, target in enumerate(targets):
+        entry = {'timestamp': target.item().isoformat()}
+        for j, metric in enumerate(METRICS):
+            entry[metric] = round(float(point[i, j]), 2)
+            entry[f'{metric}_lower'] = round(float(lower[i, j]), 2)
+            entry[f'{metric}_upper'] = round(float(upper[i, j]), 2)
+        forecasts.append(entry)
+    return forecasts, forecaster
+
+
+def refit_forecasts(app):
+    """Refit the forecaster of every sensor (scheduler job)"""
+    with app.app_context():
+        started = time.perf_counter()
+        now = datetime.utcnow()
+        models = {}
+        try:
+            rows = db.session.query(Sensor.id, Sensor.user_id, Sensor.sensor_type, Sensor.name).all()
+            for row in rows:
+                sensor = SensorRef(*row)
+                models[sensor.id] = fit_forecaster(sensor, app.config, now)
+        except Exception as e:
+            logger.error(f"Forecast refit failed: {str(e)}")
+            return
+
+        # Swapped as a whole: deleted sensors drop out
+        with _lock:
+            _models.clear()
+            _models.update(models)
+        logger.info(f"Refitted {len(models)} forecasters in {time.perf_counter() - started:.2f}s")
+
+
+def forget_forecaster(sensor_id):
+    """Drop the forecaster of a deleted sensor"""
+    with _lock:
+        _models.pop(sensor_id, None)
+
+
+def forecast_cache_stats():
+    """Cached forecasters and the age of the oldest (for /api/health)"""
+    with _lock:
+        fitted = [forecaster.fitted_at for forecaster in _models.values()]
+    oldest = min(fitted) if fitted else None
+    return {
+        'models': len(fitted),
+        'oldest_model_age_seconds': round((datetime.utcnow() - oldest).total_seconds()) if oldest else None
+    }
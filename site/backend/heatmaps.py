@@ -0,0 +1,204 @@
+"""
+Hour-of-week heatmaps of sensor readings.
+
+`sensor_heatmap` holds, per sensor and hour of the week (UTC, Monday 00h = 0),
+the count, sum and max of every metric. Ingest folds new readings in with
+one upsert per cell (`apply_readings`), so a heatmap is assembled from at
+most 168 rows per sensor whatever the length of the history. Simulated
+sensors are not stored; their cells are computed from the last
+SIMULATED_DAYS of generated readings.
+
+The table can be rebuilt from the hourly rollups (which outlive purged raw
+readings) with `rebuild_heatmaps`; run this module directly to rebuild it.
+"""
+from database import db, SensorHeatmapCell, ROLLUP_MODELS, dialect_insert
+from sensor_providers import SIMULATED, METRICS
+from rollups import HOURS_PER_WEEK, hour_of_week
+from datetime import datetime, timedelta
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+SIMULATED_DAYS = 28
+
+
+def _empty_cells():
+    """(counts, sums, maxes) of a sensor without readings"""
+    return (
+        np.zeros(HOURS_PER_WEEK),
+        np.zeros((HOURS_PER_WEEK, len(METRICS))),
+        np.full((HOURS_PER_WEEK, len(METRICS)), -np.inf)
+    )
+
+
+def apply_readings(rows):
+    """
+    Fold newly stored readings into the heatmap cells.
+
+    Runs in the caller's transaction; the caller commits.
+
+    Args:
+        rows: Iterable of dicts with sensor_id, co2, temperature, humidity
+            and recorded_at (naive UTC datetime)
+    """
+    partials = {}
+    for row in rows:
+        key = (row['sensor_id'], hour_of_week(row['recorded_at']))
+        partial = partials.get(key)
+        if partial is None:
+            partial = {'sensor_id': key[0], 'hour_of_week': key[1], 'count': 0}
+            for metric in METRICS:
+                partial[f'{metric}_sum'] = 0.0
+                partial[f'{metric}_max'] = row[metric]
+            partials[key] = partial
+        partial['count'] += 1
+        for metric in METRICS:
+            value = row[metric]
+            partial[f'{metric}_sum'] += value
+            if value > partial[f'{metric}_max']:
+                partial[f'{metric}_max'] = value
+    if not partials:
+        return
+
+    stmt, _, greatest = dialect_insert(SensorHeatmapCell)
+    excluded = stmt.excluded
+    table = SensorHeatmapCell.__table__.c
+    update = {'count': table.count + excluded.count}
+    for metric in METRICS:
+        update[f'{metric}_sum'] = table[f'{metric}_sum'] + excluded[f'{metric}_sum']
+        update[f'{metric}_max'] = greatest(table[f'{metric}_max'], excluded[f'{metric}_max'])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['sensor_id', 'hour_of_week'],
+        set_=update
+    )
+    db.session.execute(stmt, list(partials.values()))
+
+
+def delete_heatmap(sensor_id):
+    """Remove the heatmap cells of a sensor (used when the sensor is deleted)"""
+    SensorHeatmapCell.query.filter_by(sensor_id=sensor_id).delete(synchronize_session=False)
+
+
+def rebuild_heatmaps(sensor_id=None):
+    """
+    Rebuild heatmap cells from the hourly rollups.
+
+    Args:
+        sensor_id: Only rebuild this sensor (default: all sensors)
+
+    Returns:
+        Number of cells written
+    """
+    model = ROLLUP_MODELS['1h']
+    columns = [model.sensor_id, model.bucket_start, model.count]
+    for metric in METRICS:
+        columns += [getattr(model, f'{metric}_sum'), getattr(model, f'{metric}_max')]
+    query = db.session.query(*columns).filter(model.count > 0)
+    stale = SensorHeatmapCell.query
+    if sensor_id is not None:
+        query = query.filter(model.sensor_id == sensor_id)
+        stale = stale.filter(SensorHeatmapCell.sensor_id == sensor_id)
+
+    cells = {}
+    for row in query.yield_per(5000):
+        key = (row.sensor_id, hour_of_week(row.bucket_start))
+        cell = cells.get(key)
+        if cell is None:
+            cell = cells[key] = {'sensor_id': key[0], 'hour_of_week': key[1], 'count': 0}
+            for metric in METRICS:
+                cell[f'{metric}_sum'] = 0.0
+                cell[f'{metric}_max'] = None
+        cell['count'] += row.count
+        for metric in METRICS:
+            cell[f'{metric}_sum'] += getattr(row, f'{metric}_sum')
+            value = getattr(row, f'{metric}_max')
+            if cell[f'{metric}_max'] is None or value > cell[f'{metric}_max']:
+                cell[f'{metric}_max'] = value
+
+    stale.delete(synchronize_session=False)
+    if cells:
+        db.session.execute(SensorHeatmapCell.__table__.insert(), list(cells.values()))
+    db.session.commit()
+    logger.info(f"Heatmap cells rebuilt: {len(cells)}")
+    return len(cells)
+
+
+def _simulated_cells(sensor, now):
+    """Cells of a simulated sensor from its readings over SIMULATED_DAYS"""
+    counts, sums, maxes = _empty_cells()
+    recorded_at, values = SIMULATED.arrays(sensor, now - timedelta(days=SIMULATED_DAYS), now)
+    if len(recorded_at):
+        week_hour = hour_of_week(recorded_at)
+        np.add.at(counts, week_hour, 1)
+        np.add.at(sums, week_hour, values)
+        np.maximum.at(maxes, week_hour, values)
+    return counts, sums, maxes
+
+
+def load_cells(sensors):
+    """
+    Heatmap cells of several sensors, stored ones in a single query.
+
+    Args:
+        sensors: Objects with id and sensor_type
+
+    Returns:
+        Dictionary of sensor id -> (counts, shape (168,), sums and maxes,
+        shape (168, 3) with columns co2, temperature, humidity)
+    """
+    cells = {sensor.id: _empty_cells() for sensor in sensors}
+    stored = [sensor.id for sensor in sensors if sensor.sensor_type != 'simulation']
+    if stored:
+        columns = [SensorHeatmapCell.sensor_id, SensorHeatmapCell.hour_of_week, SensorHeatmapCell.count]
+        for metric in METRICS:
+            columns += [getattr(SensorHeatmapCell, f'{metric}_sum'), getattr(SensorHeatmapCell, f'{metric}_max')]
+        for row in db.session.query(*columns).filter(SensorHeatmapCell.sensor_id.in_(stored)):
+            counts, sums, maxes = cells[row[0]]
+            counts[row[1]] = row[2]
+            sums[row[1]] = row[3::2]
+            maxes[row[1]] = row[4::2]
+
+    now = datetime.utcnow()
+    for sensor in sensors:
+        if sensor.sensor_type == 'simulation':
+            cells[sensor.id] = _simulated_cells(sensor, now)
+    return cells
+
+
+def combine_cells(cells, metric):
+    """
+    Heatmap of one metric over several sensors' cells, as grids indexed
+    [hour][day] (24 x 7, Monday first). Empty cells are 0.
+
+    Returns:
+        Dictionary with the mean, max and count grids
+    """
+    column = METRICS.index(metric)
+    counts = np.zeros(HOURS_PER_WEEK)
+    sums = np.zeros(HOURS_PER_WEEK)
+    maxes = np.full(HOURS_PER_WEEK, -np.inf)
+    for sensor_counts, sensor_sums, sensor_maxes in cells:
+        counts += sensor_counts
+        sums += sensor_sums[:, column]
+        maxes = np.maximum(maxes, sensor_maxes[:, column])
+
+    filled = counts > 0
+    mean = np.where(filled, sums / np.maximum(counts, 1), 0.0)
+    maxes = np.where(filled, maxes, 0.0)
+
+    def grid(values):
+        return values.reshape(7, 24).T.tolist()
+
+    return {
+        'heatmap': grid(np.round(mean, 1)),
+        'max': grid(np.round(maxes, 1)),
+        'counts': grid(counts.astype(int))
+    }
+
+
+if __name__ == '__main__':
+    from app import app
+
+    with app.app_context():
+        print(f"Heatmap cells rebuilt: {rebuild_heatmaps()}")
@@ -0,0 +1,43 @@
+"""
+Ingest hooks shared by every path that stores sensor readings.
+
+Routes insert raw `SensorReading` rows and then call `on_readings_stored`
+inside the same transaction so derived tables stay consistent with the
+raw data once the route commits.
+"""
+from database import upsert_sensor_latest
+import rollups
+import heatmaps
+import correlations
+import realtime
+
+
+def reading_row(reading):
+    """Plain dict view of a SensorReading, as passed to ingest hooks"""
+    return {
+        'id': reading.id,
+        'sensor_id': reading.sensor_id,
+        'co2': reading.co2,
+        'temperature': reading.temperature,
+        'humidity': reading.humidity,
+        'recorded_at': reading.recorded_at
+    }
+
+
+def on_readings_stored(rows):
+    """
+    Update structures derived from raw readings. Runs in the caller's
+    transaction; the caller commits.
+    
+    Args:
+        rows: List of reading dicts (see reading_row)
+    """
+    rows = list(rows)
+    if not rows:
+        return
+    
+    upsert_sensor_latest(rows)
+    rollups.apply_readings(rows)
+    heatmaps.apply_readings(rows)
+    correlations.apply_readings(rows)
+    realtime.stage_readings(rows)
@@ -0,0 +1,290 @@
+"""
+Request and database instrumentation.
+
+`init_metrics` hooks into Flask and SQLAlchemy to record, in memory:
+
+    - per blueprint, route and method: a latency histogram, the count of
+      every status code, and the SQL queries (count and time) they ran
+    - the number of requests in flight
+    - per engine (primary, read-only pool): SQL query count and time,
+      including queries run outside requests (scheduler jobs, writers)
+
+Latency is measured until the view returns its response; the body of a
+streamed response is not included. SQL time is taken from SQLAlchemy's
+`before_cursor_execute`/`after_cursor_execute` events.
+
+Recording costs one lock per request and a thread-local increment per query.
+`snapshot` copies the counters under the lock and both renderers work on the
+copy, so a scrape never blocks requests for long: `/api/system/performance`
+returns JSON, `/metrics` the Prometheus text format.
+"""
+from flask import request, g
+from sqlalchemy import event
+from bisect import bisect_left
+import threading
+import time
+
+# Upper bounds (seconds) of the latency histogram buckets; +Inf is implied
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_lock = threading.Lock()
+_routes = {}
+_engines = {}
+_in_flight = 0
+_started_at = time.time()
+_current = threading.local()
+
+
+class RouteStats:
+    """Counters of one (blueprint, route, method)"""
+
+    __slots__ = ('buckets', 'count', 'seconds', 'statuses', 'sql_queries', 'sql_seconds')
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.seconds = 0.0
+        self.statuses = {}
+        self.sql_queries = 0
+        self.sql_seconds = 0.0
+
+    def copy(self):
+        other = RouteStats()
+        other.buckets = list(self.buckets)
+        other.count = self.count
+        other.seconds = self.seconds
+        other.statuses = dict(self.statuses)
+        other.sql_queries = self.sql_queries
+        other.sql_seconds = self.sql_seconds
+        return other
+
+
+def _before_request():
+    global _in_flight
+    g.metrics_started = time.perf_counter()
+    _current.sql = [0, 0.0]
+    with _lock:
+        _in_flight += 1
+
+
+def _after_request(response):
+    _record(response.status_code)
+    return response
+
+
+def _teardown_request(error=None):
+    # Requests that failed before a response was built
+    if 'metrics_started' in g:
+        _record(500)
+
+
+def _record(status_code):
+    global _in_flight
+    started = g.pop('metrics_started', None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    queries, sql_seconds = getattr(_current, 'sql', None) or (0, 0.0)
+    _current.sql = None
+
+    rule = request.url_rule
+    key = (request.blueprint or 'app', rule.rule if rule else '<unmatched>', request.method)
+    with _lock:
+        _in_flight -= 1
+        stats = _routes.get(key)
+        if stats is None:
+            stats = _routes[key] = RouteStats()
+        stats.buckets[bisect_left(LATENCY_BUCKETS, elapsed)] += 1
+        stats.count += 1
+        stats.seconds += elapsed
+        stats.statuses[status_code] = stats.statuses.get(status_code, 0) + 1
+        stats.sql_queries += queries
+        stats.sql_seconds += sql_seconds
+
+
+def instrument_engine(engine, name):
+    """Count the queries of an engine and their time, per engine and per request"""
+    with _lock:
+        _engines.setdefault(name, [0, 0.0])
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info['metrics_started'] = time.perf_counter()
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.pop('metrics_started', None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        current = getattr(_current, 'sql', None)
+        if current is not None:
+            current[0] += 1
+            current[1] += elapsed
+        with _lock:
+            totals = _engines[name]
+            totals[0] += 1
+            totals[1] += elapsed
+
+
+def init_metrics(app, db):
+    """Instrument the app's requests and its engines (METRICS_ENABLED)"""
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+    with app.app_context():
+        instrument_engine(db.engine, 'primary')
+    read_engine = app.extensions.get('db_read_engine')
+    if read_engine is not None:
+        instrument_engine(read_engine, 'read')
+
+
+def snapshot():
+    """Consistent copy of every counter"""
+    with _lock:
+        return {
+            'routes': {key: stats.copy() for key, stats in _routes.items()},
+            'engines': {name: tuple(totals) for name, totals in _engines.items()},
+            'in_flight': _in_flight,
+            'uptime_seconds': time.time() - _started_at
+        }
+
+
+def _quantile(stats, q):
+    """Latency quantile (ms) estimated from the histogram, linear within a bucket"""
+    if not stats.count:
+        return None
+    target = q * stats.count
+    seen = 0
+    for index, count in enumerate(stats.buckets):
+        if seen + count >= target and count:
+            lower = LATENCY_BUCKETS[index - 1] if index else 0.0
+            if index == len(LATENCY_BUCKETS):
+                return round(lower * 1000, 2)
+            upper = LATENCY_BUCKETS[index]
+            return round((lower + (upper - lower) * (target - seen) / count) * 1000, 2)
+        seen += count
+    return None
+
+
+def performance_summary(data=None):
+    """JSON view of a snapshot (for /api/system/performance)"""
+    data = data or snapshot()
+    routes = []
+    total = RouteStats()
+    for (blueprint, rule, method), stats in sorted(data['routes'].items()):
+        total.count += stats.count
+        total.seconds += stats.seconds
+        total.sql_queries += stats.sql_queries
+        total.buckets = [a + b for a, b in zip(total.buckets, stats.buckets)]
+        for status, count in stats.statuses.items():
+            total.statuses[status] = total.statuses.get(status, 0) + count
+        routes.append({
+            'blueprint': blueprint,
+            'route': rule,
+            'method': method,
+            'requests': stats.count,
+            'avg_ms': round(stats.seconds / stats.count * 1000, 2),
+            'p50_ms': _quantile(stats, 0.5),
+            'p95_ms': _quantile(stats, 0.95),
+            'p99_ms': _quantile(stats, 0.99),
+            'status_codes': {str(status): count for status, count in sorted(stats.statuses.items())},
+            'sql_queries_per_request': round(stats.sql_queries / stats.count, 2),
+            'sql_ms_per_request': round(stats.sql_seconds / stats.count * 1000, 2)
+        })
+
+    errors = sum(count for status, count in total.statuses.items() if status >= 500)
+    error_rate = errors / total.count if total.count else 0.0
+    return {
+        'status': 'degraded' if error_rate > 0.05 else 'healthy',
+        'uptime_seconds': round(data['uptime_seconds']),
+        'in_flight': data['in_flight'],
+        'total_requests': total.count,
+        'response_time_ms': round(total.seconds / total.count * 1000, 2) if total.count else None,
+        'p95_ms': _quantile(total, 0.95),
+        'error_rate': round(error_rate, 4),
+        'sql': {
+            name: {
+                'queries': queries,
+                'total_ms': round(seconds * 1000, 2),
+                'avg_ms': round(seconds / queries * 1000, 3) if queries else None
+            }
+            for name, (queries, seconds) in sorted(data['engines'].items())
+        },
+        'routes': routes
+    }
+
+
+def _escape(value):
+    """Escape a Prometheus label value"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+def render_prometheus(gauges=None, data=None):
+    """
+    Prometheus text exposition (version 0.0.4) of a snapshot.
+
+    Args:
+        gauges: Optional extra {metric name: (help, value)} to expose
+    """
+    data = data or snapshot()
+    lines = []
+
+    def header(name, kind, help_text):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+
+    routes = sorted(data['routes'].items())
+
+    header('aerium_http_request_duration_seconds', 'histogram', 'Time until the view returned its response')
+    for (blueprint, rule, method), stats in routes:
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS + ('+Inf',), stats.buckets):
+            cumulative += count
+            labels = _labels(blueprint=blueprint, route=rule, method=method, le=bound)
+            lines.append(f'aerium_http_request_duration_seconds_bucket{labels} {cumulative}')
+        labels = _labels(blueprint=blueprint, route=rule, method=method)
+        lines.append(f'aerium_http_request_duration_seconds_sum{labels} {stats.seconds:.6f}')
+        lines.append(f'aerium_http_request_duration_seconds_count{labels} {stats.count}')
+
+    header('aerium_http_requests_total', 'counter', 'Requests by status code')
+    for (blueprint, rule, method), stats in routes:
+        for status, count in sorted(stats.statuses.items()):
+            labels = _labels(blueprint=blueprint, route=rule, method=method, status=status)
+            lines.append(f'aerium_http_requests_total{labels} {count}')
+
+    header('aerium_http_request_sql_queries_total', 'counter', 'SQL queries run by requests')
+    for (blueprint, rule, method), stats in routes:
+        labels = _labels(blueprint=blueprint, route=rule, method=method)
+        lines.append(f'aerium_http_request_sql_queries_total{labels} {stats.sql_queries}')
+
+    header('aerium_http_request_sql_seconds_total', 'counter', 'Time spent in SQL by requests')
+    for (blueprint, rule, method), stats in routes:
+        labels = _labels(blueprint=blueprint, route=rule, method=method)
+        lines.append(f'aerium_http_request_sql_seconds_total{labels} {stats.sql_seconds:.6f}')
+
+    header('aerium_http_requests_in_flight', 'gauge', 'Requests being served')
+    lines.append(f'aerium_http_requests_in_flight {data["in_flight"]}')
+
+    header('aerium_db_queries_total', 'counter', 'SQL queries per engine, requests and background jobs')
+    for name, (queries, _) in sorted(data['engines'].items()):
+        lines.append(f'aerium_db_queries_total{_labels(engine=name)} {queries}')
+
+    header('aerium_db_query_seconds_total', 'counter', 'Time spent in SQL per engine')
+    for name, (_, seconds) in sorted(data['engines'].items()):
+        lines.append(f'aerium_db_query_seconds_total{_labels(engine=name)} {seconds:.6f}')
+
+    header('aerium_uptime_seconds', 'gauge', 'Seconds since the metrics started')
+    lines.append(f'aerium_uptime_seconds {data["uptime_seconds"]:.0f}')
+
+    for name, (help_text, value) in sorted((gauges or {}).items()):
+        header(name, 'gauge', help_text)
+        lines.append(f'{name} {value}')
+
+    return '\n'.join(lines) + '\n'
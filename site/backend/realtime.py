@@ -0,0 +1,340 @@
+"""
+Real-time push of new readings over Socket.IO.
+
+Clients authenticate by passing their access token when connecting
+(`auth={'token': ...}` or `?token=...`) and are placed in the room of their
+user (`user:<id>`, or `admins`). They may also subscribe to single sensors
+(`sensor:<id>`) with the `subscribe` event.
+
+Readings are published once the transaction that stored them commits. Each
+client declares how many updates per second it wants (`set_rate`, capped at
+SOCKET_MAX_RATE); readings arriving faster are coalesced so a client only
+receives the newest reading of each sensor per interval. `request_data`
+answers immediately from an in-memory cache of the latest reading per sensor.
+
+Events sent to clients:
+    sensor_update  {'sensor_id', 'reading'}               (web dashboard)
+    co2_update     {'sensor_id', 'ppm', 'temperature',
+                    'humidity', 'timestamp', 'analysis_running'}  (Kivy clients)
+"""
+from flask import request, current_app
+from flask_socketio import join_room, leave_room
+from flask_jwt_extended import decode_token
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from database import db, Sensor, SensorLatest
+from auth_context import sensor_ref
+from sensor_providers import SIMULATED
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_socketio = None
+_lock = threading.Lock()
+_clients = {}   # sid -> _Client
+_rooms = {}     # room name -> set of sids
+_latest = {}    # sensor_id -> reading payload
+
+
+class _Client:
+    """Subscription and coalescing state of one connection"""
+
+    __slots__ = ('user_id', 'is_admin', 'interval', 'next_at', 'pending')
+
+    def __init__(self, user_id, is_admin, rate):
+        self.user_id = user_id
+        self.is_admin = is_admin
+        self.interval = 1.0 / rate
+        self.next_at = 0.0
+        self.pending = {}  # sensor_id -> newest payload not yet sent
+
+
+def _reading_payload(row):
+    recorded_at = row['recorded_at']
+    return {
+        'id': row.get('id'),
+        'sensor_id': row['sensor_id'],
+        'co2': row['co2'],
+        'temperature': row['temperature'],
+        'humidity': row['humidity'],
+        'recorded_at': recorded_at.isoformat() if hasattr(recorded_at, 'isoformat') else recorded_at
+    }
+
+
+def _emit_reading(sid, payload):
+    _socketio.emit('sensor_update', {'sensor_id': payload['sensor_id'], 'reading': payload}, to=sid)
+    _socketio.emit('co2_update', {
+        'sensor_id': payload['sensor_id'],
+        'ppm': payload['co2'],
+        'temperature': payload['temperature'],
+        'humidity': payload['humidity'],
+        'timestamp': payload['recorded_at'],
+        'analysis_running': True
+    }, to=sid)
+
+
+def _clamp_rate(rate):
+    max_rate = current_app.config.get('SOCKET_MAX_RATE', 5)
+    try:
+        rate = float(rate)
+    except (TypeError, ValueError):
+        rate = current_app.config.get('SOCKET_DEFAULT_RATE', 1)
+    return min(max(rate, 0.1), max_rate)
+
+
+def _join(sid, room):
+    join_room(room)
+    _rooms.setdefault(room, set()).add(sid)
+
+
+def _leave(sid, room):
+    leave_room(room)
+    members = _rooms.get(room)
+    if members:
+        members.discard(sid)
+        if not members:
+            del _rooms[room]
+
+
+def _identity_from_token(auth):
+    """Return (user_id, is_admin) from the connection's access token, or None"""
+    token = (auth or {}).get('token') if isinstance(auth, dict) else None
+    token = token or request.args.get('token')
+    if not token:
+        return None
+    try:
+        claims = decode_token(token)
+    except Exception:
+        return None
+    if claims.get('type') != 'access':
+        return None
+    return int(claims['sub']), claims.get('role') == 'admin'
+
+
+def _sensor_ids(data):
+    data = data or {}
+    ids = data.get('sensor_ids') or ([data['sensor_id']] if data.get('sensor_id') is not None else [])
+    try:
+        return [int(sensor_id) for sensor_id in ids]
+    except (TypeError, ValueError):
+        return []
+
+
+def register_handlers(socketio):
+    """Register the Socket.IO event handlers"""
+
+    @socketio.on('connect')
+    def handle_connect(auth=None):
+        identity = _identity_from_token(auth)
+        if identity is None:
+            # Anonymous connections stay open but receive no readings
+            socketio.emit('status', {'authenticated': False}, to=request.sid)
+            return
+        user_id, is_admin = identity
+        rate = _clamp_rate(request.args.get('rate', current_app.config.get('SOCKET_DEFAULT_RATE', 1)))
+        with _lock:
+            _clients[request.sid] = _Client(user_id, is_admin, rate)
+            _join(request.sid, 'admins' if is_admin else f'user:{user_id}')
+        socketio.emit('status', {'authenticated': True, 'rate': rate}, to=request.sid)
+
+    @socketio.on('disconnect')
+    def handle_disconnect(*args):
+        with _lock:
+            _clients.pop(request.sid, None)
+            for room in [room for room, members in _rooms.items() if request.sid in members]:
+                _leave(request.sid, room)
+
+    @socketio.on('set_rate')
+    def handle_set_rate(data=None):
+        rate = _clamp_rate((data or {}).get('rate'))
+        with _lock:
+            client = _clients.get(request.sid)
+            if client is None:
+                return {'error': 'Not authenticated'}
+            client.interval = 1.0 / rate
+        return {'rate': rate}
+
+    @socketio.on('subscribe')
+    def handle_subscribe(data=None):
+        with _lock:
+            client = _clients.get(request.sid)
+        if client is None:
+            return {'error': 'Not authenticated'}
+
+        subscribed = []
+        for sensor_id in _sensor_ids(data):
+            ref = sensor_ref(sensor_id)
+            if ref and (client.is_admin or ref.user_id == client.user_id):
+                subscribed.append(sensor_id)
+        with _lock:
+            for sensor_id in subscribed:
+                _join(request.sid, f'sensor:{sensor_id}')
+        if data and 'rate' in data:
+            handle_set_rate(data)
+        return {'subscribed': subscribed}
+
+    @socketio.on('unsubscribe')
+    def handle_unsubscribe(data=None):
+        with _lock:
+            for sensor_id in _sensor_ids(data):
+                _leave(request.sid, f'sensor:{sensor_id}')
+        return {'ok': True}
+
+    @socketio.on('request_data')
+    def handle_request_data(data=None):
+        """Send the latest reading of the requested (or all accessible) sensors"""
+        with _lock:
+            client = _clients.get(request.sid)
+        if client is None:
+            return {'error': 'Not authenticated'}
+
+        sensor_ids = _sensor_ids(data)
+        if not sensor_ids:
+            with _lock:
+                sensor_ids = [
+                    int(room.split(':', 1)[1]) for room, members in _rooms.items()
+                    if room.startswith('sensor:') and request.sid in members
+                ]
+            if not sensor_ids:
+                query = db.session.query(Sensor.id)
+                if not client.is_admin:
+                    query = query.filter(Sensor.user_id == client.user_id)
+                sensor_ids = [row.id for row in query]
+
+        for sensor_id in sensor_ids:
+            ref = sensor_ref(sensor_id)
+            if not ref or not (client.is_admin or ref.user_id == client.user_id):
+                continue
+            payload = latest_reading(sensor_id)
+            if payload:
+                _emit_reading(request.sid, payload)
+        return {'sensors': len(sensor_ids)}
+
+
+def latest_reading(sensor_id):
+    """
+    Latest reading payload of a sensor, loaded from sensor_latest on a cache
+    miss. Simulated sensors are computed by their provider on every call.
+    """
+    ref = sensor_ref(sensor_id)
+    if ref and ref.sensor_type == 'simulation':
+        reading = SIMULATED.latest(ref)
+        return _reading_payload(reading) if reading else None
+    with _lock:
+        payload = _latest.get(sensor_id)
+    if payload is None:
+        latest = SensorLatest.query.get(sensor_id)
+        if latest is None:
+            return None
+        payload = _reading_payload({
+            'id': latest.reading_id,
+            'sensor_id': latest.sensor_id,
+            'co2': latest.co2,
+            'temperature': latest.temperature,
+            'humidity': latest.humidity,
+            'recorded_at': latest.recorded_at
+        })
+        with _lock:
+            _latest.setdefault(sensor_id, payload)
+    return payload
+
+
+def publish_readings(rows):
+    """
+    Queue committed readings for the clients watching their sensors. Only the
+    newest reading per sensor is kept; the flusher sends them at each
+    client's rate.
+
+    Args:
+        rows: List of (reading dict, owner user id) tuples
+    """
+    if _socketio is None:
+        return
+
+    newest = {}
+    for row, owner_id in rows:
+        current = newest.get(row['sensor_id'])
+        if current is None or row['recorded_at'] >= current[0]['recorded_at']:
+            newest[row['sensor_id']] = (row, owner_id)
+
+    with _lock:
+        for sensor_id, (row, owner_id) in newest.items():
+            payload = _reading_payload(row)
+            cached = _latest.get(sensor_id)
+            if cached is None or payload['recorded_at'] >= cached['recorded_at']:
+                _latest[sensor_id] = payload
+            sids = set(_rooms.get(f'sensor:{sensor_id}', ()))
+            sids |= _rooms.get('admins', set())
+            sids |= _rooms.get(f'user:{owner_id}', set())
+            for sid in sids:
+                client = _clients.get(sid)
+                if client:
+                    client.pending[sensor_id] = payload
+
+
+def drop_sensor(sensor_id):
+    """Drop the cached latest reading of a deleted sensor"""
+    with _lock:
+        _latest.pop(sensor_id, None)
+
+
+def _flush_loop(app):
+    tick = 1.0 / app.config.get('SOCKET_MAX_RATE', 5)
+    while True:
+        _socketio.sleep(tick)
+        now = time.monotonic()
+        due = []
+        with _lock:
+            for sid, client in _clients.items():
+                if client.pending and client.next_at <= now:
+                    due.append((sid, list(client.pending.values())))
+                    client.pending = {}
+                    client.next_at = now + client.interval
+        for sid, payloads in due:
+            for payload in payloads:
+                try:
+                    _emit_reading(sid, payload)
+                except Exception as e:
+                    logger.error(f"Socket push to {sid} failed: {str(e)}")
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_unpublished(session):
+    session.info.pop('realtime_rows', None)
+
+
+@event.listens_for(Session, 'after_commit')
+def _publish_after_commit(session):
+    rows = session.info.pop('realtime_rows', None)
+    if rows:
+        try:
+            publish_readings(rows)
+        except Exception as e:
+            logger.error(f"Failed to publish readings: {str(e)}")
+
+
+def stage_readings(rows):
+    """
+    Publish rows once the current transaction commits (called on ingest).
+    Sensor owners are resolved now: no SQL can run from after_commit.
+    """
+    if _socketio is None:
+        return
+    staged = db.session.info.setdefault('realtime_rows', [])
+    owners = {}
+    for row in rows:
+        sensor_id = row['sensor_id']
+        if sensor_id not in owners:
+            ref = sensor_ref(sensor_id)
+            owners[sensor_id] = ref.user_id if ref else None
+        staged.append((row, owners[sensor_id]))
+
+
+def init_realtime(app, socketio):
+    """Register handlers and start the coalescing flusher"""
+    global _socketio
+    _socketio = socketio
+    register_handlers(socketio)
+    socketio.start_background_task(_flush_loop, app)
@@ -0,0 +1,290 @@
+"""
+Background report generation with artifacts cached on disk.
+
+A job renders a report in a worker thread and writes it to REPORTS_DIR under
+a name derived from (user, report type, parameters). Identical requests
+share the job in flight or reuse the cached file until REPORT_CACHE_TTL
+expires; `evict_expired_reports` removes stale files and finished jobs.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from database import db, AlertHistory, Sensor
+from alert_stats import summarize_alerts
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_app = None
+_jobs = {}
+_jobs_by_key = {}
+_lock = threading.Lock()
+
+
+class ReportJob:
+    """State of one report generation request"""
+
+    def __init__(self, user_id, report_type, params, key, path):
+        self.id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.report_type = report_type
+        self.params = params
+        self.key = key
+        self.path = path
+        self.status = 'queued'  # 'queued', 'running', 'done', 'failed'
+        self.error = None
+        self.created_at = datetime.utcnow()
+        self.finished_at = None
+        self.done_event = threading.Event()
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'type': self.report_type,
+            'params': self.params,
+            'status': self.status,
+            'error': self.error,
+            'createdAt': self.created_at.isoformat(),
+            'finishedAt': self.finished_at.isoformat() if self.finished_at else None,
+            'downloadUrl': f'/api/reports/jobs/{self.id}/download' if self.status == 'done' else None
+        }
+
+    def finish(self, error=None):
+        self.status = 'failed' if error else 'done'
+        self.error = error
+        self.finished_at = datetime.utcnow()
+        self.done_event.set()
+
+
+def render_alerts_pdf(user_id, params, output):
+    """
+    Render the alert report PDF of a user's sensors.
+
+    Args:
+        user_id: Owner of the sensors covered by the report
+        params: Dictionary with `days`
+        output: Path or file object receiving the PDF
+    """
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib.units import inch
+
+    # Calculate date range
+    end_date = datetime.utcnow()
+    start_date = end_date - timedelta(days=params['days'])
+
+    # Alerts for user's sensors
+    owned_sensors = db.session.query(Sensor.id).filter(Sensor.user_id == user_id)
+    alerts = AlertHistory.query.filter(
+        AlertHistory.sensor_id.in_(owned_sensors),
+        AlertHistory.created_at >= start_date,
+        AlertHistory.created_at <= end_date
+    )
+    summary = summarize_alerts(alerts)
+
+    doc = SimpleDocTemplate(output, pagesize=A4)
+    story = []
+
+    # Styles
+    styles = getSampleStyleSheet()
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=24,
+        textColor=colors.HexColor('#1e293b'),
+        spaceAfter=30
+    )
+    heading_style = ParagraphStyle(
+        'CustomHeading',
+        parent=styles['Heading2'],
+        fontSize=14,
+        textColor=colors.HexColor('#475569'),
+        spaceAfter=12
+    )
+
+    # Title
+    story.append(Paragraph('Rapport d\'Alertes', title_style))
+    story.append(Paragraph(
+        f'Période: {start_date.strftime("%d/%m/%Y")} - {end_date.strftime("%d/%m/%Y")}',
+        styles['Normal']
+    ))
+    story.append(Spacer(1, 0.3 * inch))
+
+    # Summary
+    story.append(Paragraph('Résumé', heading_style))
+    summary_data = [
+        ['Nombre total d\'alertes', str(summary['totalAlerts'])],
+        ['Alertes déclenchées', str(summary['triggered'])],
+        ['Alertes accusées', str(summary['acknowledged'])],
+        ['Alertes résolues', str(summary['resolved'])],
+    ]
+    summary_table = Table(summary_data, colWidths=[3 * inch, 2 * inch])
+    summary_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#f1f5f9')),
+        ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
+        ('GRID', (0, 0), (-1, -1), 1, colors.grey),
+    ]))
+    story.append(summary_table)
+    story.append(Spacer(1, 0.3 * inch))
+
+    # Detailed alerts table (limit to recent 50 for PDF readability)
+    story.append(Paragraph('Alertes Détaillées', heading_style))
+
+    table_data = [
+        ['Date/Heure', 'Capteur', 'Type', 'Métrique', 'Valeur', 'Statut']
+    ]
+
+    for alert in alerts.order_by(AlertHistory.created_at.desc()).limit(50):
+        sensor = alert.sensor
+        table_data.append([
+            alert.created_at.strftime('%d/%m %H:%M'),
+            sensor.name if sensor else 'N/A',
+            alert.alert_type,
+            alert.metric,
+            f"{alert.metric_value:.1f}",
+            alert.status
+        ])
+
+    table = Table(table_data, colWidths=[1.2 * inch, 1.5 * inch, 0.8 * inch, 0.8 * inch, 0.7 * inch, 0.8 * inch])
+    table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#0f172a')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 9),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ('FONTSIZE', (0, 1), (-1, -1), 8),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f8f9fa')]),
+    ]))
+    story.append(table)
+
+    # Build PDF
+    doc.build(story)
+
+
+# Report types: renderer, file extension and MIME type
+REPORT_TYPES = {
+    'alerts_pdf': (render_alerts_pdf, 'pdf', 'application/pdf'),
+}
+
+
+def init_report_jobs(app):
+    """Create the worker pool and the artifact directory"""
+    global _executor, _app
+    _app = app
+    app.config.setdefault('REPORTS_DIR', os.path.join(app.instance_path, 'reports'))
+    os.makedirs(app.config['REPORTS_DIR'], exist_ok=True)
+    _executor = ThreadPoolExecutor(
+        max_workers=app.config.get('REPORT_WORKERS', 2),
+        thread_name_prefix='report-worker'
+    )
+
+
+def _cache_key(user_id, report_type, params):
+    payload = json.dumps([user_id, report_type, params], sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _is_fresh(path):
+    ttl = _app.config.get('REPORT_CACHE_TTL', 600)
+    try:
+        return time.time() - os.path.getmtime(path) < ttl
+    except OSError:
+        return False
+
+
+def _run(job):
+    """Worker body: render into a temporary file, then move it into place"""
+    job.status = 'running'
+    tmp_path = f'{job.path}.{job.id}.tmp'
+    try:
+        with _app.app_context():
+            renderer = REPORT_TYPES[job.report_type][0]
+            renderer(job.user_id, job.params, tmp_path)
+        os.replace(tmp_path, job.path)
+        job.finish()
+        logger.info(f"Report {job.report_type} rendered for user {job.user_id}")
+    except ImportError:
+        job.finish('reportlab library not installed. Please run: pip install reportlab')
+    except Exception as e:
+        logger.error(f"Report job {job.id} failed: {str(e)}")
+        job.finish(str(e))
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def submit_report(user_id, report_type, params):
+    """
+    Return a job for the report, reusing a job in flight or a fresh cached
+    artifact for the same (user, type, parameters) when there is one.
+    """
+    _, extension, _ = REPORT_TYPES[report_type]
+    key = _cache_key(user_id, report_type, params)
+    path = os.path.join(_app.config['REPORTS_DIR'], f'{key}.{extension}')
+
+    with _lock:
+        existing = _jobs_by_key.get(key)
+        if existing and existing.status in ('queued', 'running'):
+            return existing
+        if existing and existing.status == 'done' and _is_fresh(path):
+            return existing
+
+        job = ReportJob(user_id, report_type, params, key, path)
+        _jobs[job.id] = job
+        _jobs_by_key[key] = job
+
+        if _is_fresh(path):
+            job.finish()
+            return job
+
+    _executor.submit(_run, job)
+    return job
+
+
+def get_job(job_id):
+    with _lock:
+        return _jobs.get(job_id)
+
+
+def report_mimetype(job):
+    return REPORT_TYPES[job.report_type][2]
+
+
+def evict_expired_reports():
+    """Delete expired artifacts and forget finished jobs that point to them"""
+    reports_dir = _app.config['REPORTS_DIR']
+    removed = 0
+    for name in os.listdir(reports_dir):
+        path = os.path.join(reports_dir, name)
+        if not name.endswith('.tmp') and not _is_fresh(path):
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                pass
+
+    with _lock:
+        for job_id, job in list(_jobs.items()):
+            if job.status in ('done', 'failed') and not _is_fresh(job.path):
+                del _jobs[job_id]
+                if _jobs_by_key.get(job.key) is job:
+                    del _jobs_by_key[job.key]
+
+    if removed:
+        logger.info(f"Evicted {removed} expired report artifacts")
+    return removed
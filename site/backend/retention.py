@@ -0,0 +1,206 @@
+"""
+Retention policies: purge old rows in short chunks and give the space back.
+
+    sensor_readings     raw rows older than READINGS_RETENTION_DAYS, one day
+                        at a time; the day's hourly and daily rollups are
+                        completed from the raw rows first, so history stays
+                        available at 1h/1d resolution, and the rows are
+                        archived to Parquet when ARCHIVE_ENABLED (archive.py)
+    sensor_readings_1m  minute buckets older than ROLLUP_MINUTE_RETENTION_DAYS
+    alert_history       resolved alerts older than ALERT_HISTORY_RETENTION_DAYS
+    alerts              resolved alerts older than ALERT_HISTORY_RETENTION_DAYS
+    audit_log           entries older than AUDIT_RETENTION_DAYS
+
+A retention of 0 days keeps a table forever. Deletes run RETENTION_CHUNK_SIZE
+rows per transaction with a short pause in between, so the write lock is
+never held for long and ingest keeps flowing while a purge runs.
+
+Freed pages are returned to the filesystem with `PRAGMA incremental_vacuum`,
+which needs `auto_vacuum=INCREMENTAL`. New databases are created that way
+(see db_engine.py); an existing file is converted once with
+`python retention.py --convert`, which runs a full VACUUM.
+"""
+from database import db, SensorReading, SensorReadingMinute, Alert, AlertHistory
+from audit_logger import AuditLog
+from alert_stats import invalidate_alert_stats
+from rollups import fill_missing_rollups
+from archive import archive_available, archive_readings
+from sqlalchemy import text
+from datetime import datetime, timedelta
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+AUTO_VACUUM_INCREMENTAL = 2
+
+
+def _cutoff(config, key, now, align_days=False):
+    """Start of the retention window of a policy, or None when it is disabled"""
+    days = config.get(key, 0)
+    if not days:
+        return None
+    cutoff = now - timedelta(days=days)
+    if align_days:
+        cutoff = cutoff.replace(hour=0, minute=0, second=0, microsecond=0)
+    return cutoff
+
+
+def purge_in_chunks(model, *criteria, config=None):
+    """
+    Delete the rows of `model` matching `criteria`, RETENTION_CHUNK_SIZE rows
+    per committed transaction.
+
+    Returns:
+        Number of rows deleted
+    """
+    chunk_size = config.get('RETENTION_CHUNK_SIZE', 5000)
+    pause = config.get('RETENTION_CHUNK_PAUSE', 0.05)
+    table = model.__table__
+    key = list(table.primary_key.columns)
+    deleted = 0
+
+    while True:
+        chunk = db.session.query(*key).filter(*criteria).limit(chunk_size).subquery()
+        if len(key) == 1:
+            condition = key[0].in_(db.session.query(chunk.c[key[0].name]))
+        else:
+            condition = db.tuple_(*key).in_(db.session.query(*[chunk.c[c.name] for c in key]))
+        count = db.session.execute(table.delete().where(condition)).rowcount
+        db.session.commit()
+        deleted += count
+        if count < chunk_size:
+            return deleted
+        time.sleep(pause)
+
+
+def purge_readings(cutoff, config):
+    """
+    Purge raw readings recorded before `cutoff` (a day boundary), oldest day
+    first. Each day's hourly and daily rollups are completed, and its rows
+    copied to the Parquet archive when ARCHIVE_ENABLED, before they are
+    deleted.
+
+    Returns:
+        Number of raw readings deleted
+    """
+    archiving = archive_available()
+    if config.get('ARCHIVE_ENABLED') and not archiving:
+        logger.error("ARCHIVE_ENABLED but pyarrow/duckdb are not installed; raw readings are kept")
+        return 0
+
+    oldest = db.session.query(db.func.min(SensorReading.recorded_at)).scalar()
+    if oldest is None or oldest >= cutoff:
+        return 0
+
+    deleted = 0
+    day = oldest.replace(hour=0, minute=0, second=0, microsecond=0)
+    while day < cutoff:
+        next_day = day + timedelta(days=1)
+        fill_missing_rollups(day, next_day)
+        db.session.commit()
+        if archiving:
+            archive_readings(day, next_day)
+        deleted += purge_in_chunks(
+            SensorReading,
+            SensorReading.recorded_at >= day,
+            SensorReading.recorded_at < next_day,
+            config=config
+        )
+        day = next_day
+    return deleted
+
+
+def incremental_vacuum(config):
+    """
+    Release free pages to the filesystem, RETENTION_VACUUM_PAGES at a time.
+
+    Returns:
+        Number of pages released, or None when auto_vacuum is not INCREMENTAL
+    """
+    if db.engine.dialect.name != 'sqlite':
+        return None
+    if db.session.execute(text('PRAGMA auto_vacuum')).scalar() != AUTO_VACUUM_INCREMENTAL:
+        logger.warning("auto_vacuum is not INCREMENTAL; run `python retention.py --convert` once to enable it")
+        return None
+
+    pages = config.get('RETENTION_VACUUM_PAGES', 2000)
+    released = 0
+    with db.engine.connect() as conn:
+        # executescript steps the pragma to completion (execute frees one page)
+        sqlite_connection = conn.connection.dbapi_connection
+        while True:
+            free = conn.exec_driver_sql('PRAGMA freelist_count').scalar()
+            if not free:
+                break
+            step = min(free, pages)
+            sqlite_connection.executescript(f'PRAGMA incremental_vacuum({step})')
+            released += step
+            time.sleep(config.get('RETENTION_CHUNK_PAUSE', 0.05))
+    return released
+
+
+def run_retention(app):
+    """Apply every retention policy, then vacuum (scheduler job)"""
+    with app.app_context():
+        config = app.config
+        now = datetime.utcnow()
+        summary = {}
+        try:
+            cutoff = _cutoff(config, 'READINGS_RETENTION_DAYS', now, align_days=True)
+            if cutoff:
+                summary['sensor_readings'] = purge_readings(cutoff, config)
+
+            cutoff = _cutoff(config, 'ROLLUP_MINUTE_RETENTION_DAYS', now)
+            if cutoff:
+                summary['sensor_readings_1m'] = purge_in_chunks(
+                    SensorReadingMinute, SensorReadingMinute.bucket_start < cutoff, config=config
+                )
+
+            cutoff = _cutoff(config, 'ALERT_HISTORY_RETENTION_DAYS', now)
+            if cutoff:
+                summary['alert_history'] = purge_in_chunks(
+                    AlertHistory,
+                    AlertHistory.status == 'resolved',
+                    AlertHistory.created_at < cutoff,
+                    config=config
+                )
+                summary['alerts'] = purge_in_chunks(
+                    Alert, Alert.status == 'résolue', Alert.created_at < cutoff, config=config
+                )
+                # Bulk deletes bypass the session tracking of alert_stats
+                if summary['alert_history']:
+                    invalidate_alert_stats()
+
+            cutoff = _cutoff(config, 'AUDIT_RETENTION_DAYS', now)
+            if cutoff:
+                summary['audit_log'] = purge_in_chunks(
+                    AuditLog, AuditLog.timestamp < cutoff, config=config
+                )
+
+            if any(summary.values()):
+                summary['vacuumed_pages'] = incremental_vacuum(config)
+            logger.info(f"Retention run: {summary}")
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Retention run failed: {str(e)}")
+        return summary
+
+
+def convert_to_incremental_vacuum():
+    """Switch an existing SQLite file to auto_vacuum=INCREMENTAL (full VACUUM)"""
+    with db.engine.connect() as conn:
+        conn.exec_driver_sql('PRAGMA auto_vacuum = INCREMENTAL')
+        conn.exec_driver_sql('VACUUM')
+        return conn.exec_driver_sql('PRAGMA auto_vacuum').scalar()
+
+
+if __name__ == '__main__':
+    import sys
+    from app import app
+
+    if '--convert' in sys.argv:
+        with app.app_context():
+            print(f"auto_vacuum = {convert_to_incremental_vacuum()}")
+    else:
+        print(f"Retention run: {run_retention(app)}")
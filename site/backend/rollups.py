@@ -0,0 +1,221 @@
+"""
+Multi-resolution rollups (1 minute, 1 hour, 1 day) of sensor readings.
+
+Rollups are updated incrementally on ingest with an upsert per bucket and can
+be rebuilt from the raw `sensor_readings` rows with `backfill_rollups`.
+Run this module directly to rebuild every rollup table.
+"""
+from database import db, SensorReading, ROLLUP_MODELS, dialect_insert
+from sqlalchemy import func, cast, Integer
+from datetime import datetime
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+METRICS = ('co2', 'temperature', 'humidity')
+HOURS_PER_WEEK = 168
+# 1970-01-01 was a Thursday: shifts epoch days so that Monday is day 0
+EPOCH_WEEKDAY = 3
+
+
+def truncate_timestamp(timestamp, seconds):
+    """Floor a naive UTC datetime to the start of its bucket"""
+    epoch = int((timestamp - datetime(1970, 1, 1)).total_seconds())
+    return datetime.utcfromtimestamp(epoch - epoch % seconds)
+
+
+def hour_of_week(timestamps):
+    """
+    Hour of the week (UTC, Monday 00h = 0) of a naive UTC datetime, or of
+    each value of a datetime64 array
+    """
+    if isinstance(timestamps, datetime):
+        return timestamps.weekday() * 24 + timestamps.hour
+    epoch_hours = timestamps.astype('datetime64[h]').astype(np.int64)
+    return ((epoch_hours // 24 + EPOCH_WEEKDAY) % 7) * 24 + epoch_hours % 24
+
+
+def bucket_epoch(column, seconds):
+    """
+    SQL expression flooring a DateTime column to a bucket, as epoch seconds.
+
+    Args:
+        column: DateTime column or expression holding naive UTC timestamps
+        seconds: Bucket width in seconds
+    """
+    if db.engine.dialect.name == 'postgresql':
+        return func.floor(func.extract('epoch', column) / seconds) * seconds
+    epoch = cast(func.strftime('%s', column), Integer)
+    return (epoch // seconds) * seconds
+
+
+def _partials(rows, seconds):
+    """Aggregate raw rows into per (sensor, bucket) partial rollups"""
+    partials = {}
+    for row in rows:
+        key = (row['sensor_id'], truncate_timestamp(row['recorded_at'], seconds))
+        partial = partials.get(key)
+        if partial is None:
+            partial = {'sensor_id': key[0], 'bucket_start': key[1], 'count': 0}
+            for metric in METRICS:
+                partial[f'{metric}_min'] = row[metric]
+                partial[f'{metric}_max'] = row[metric]
+                partial[f'{metric}_sum'] = 0.0
+            partials[key] = partial
+        partial['count'] += 1
+        for metric in METRICS:
+            value = row[metric]
+            partial[f'{metric}_sum'] += value
+            if value < partial[f'{metric}_min']:
+                partial[f'{metric}_min'] = value
+            if value > partial[f'{metric}_max']:
+                partial[f'{metric}_max'] = value
+    return list(partials.values())
+
+
+def apply_readings(rows):
+    """
+    Fold newly stored readings into every rollup table.
+
+    Runs in the caller's transaction; the caller commits.
+
+    Args:
+        rows: Iterable of dicts with sensor_id, co2, temperature, humidity
+            and recorded_at (naive UTC datetime)
+    """
+    rows = list(rows)
+    if not rows:
+        return
+
+    for model in ROLLUP_MODELS.values():
+        partials = _partials(rows, model.bucket_seconds)
+        stmt, least, greatest = dialect_insert(model)
+        excluded = stmt.excluded
+        table = model.__table__.c
+        update = {'count': table.count + excluded.count}
+        for metric in METRICS:
+            update[f'{metric}_min'] = least(table[f'{metric}_min'], excluded[f'{metric}_min'])
+            update[f'{metric}_max'] = greatest(table[f'{metric}_max'], excluded[f'{metric}_max'])
+            update[f'{metric}_sum'] = table[f'{metric}_sum'] + excluded[f'{metric}_sum']
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['sensor_id', 'bucket_start'],
+            set_=update
+        )
+        db.session.execute(stmt, partials)
+
+
+def delete_rollups(sensor_id):
+    """Remove every rollup row of a sensor (used when the sensor is deleted)"""
+    for model in ROLLUP_MODELS.values():
+        model.query.filter_by(sensor_id=sensor_id).delete(synchronize_session=False)
+
+
+def _aggregate_raw(seconds, sensor_id=None, start=None, end=None):
+    """Rollup rows of `seconds` buckets computed from raw readings in [start, end)"""
+    bucket = bucket_epoch(SensorReading.recorded_at, seconds).label('bucket')
+    columns = [SensorReading.sensor_id, bucket, func.count().label('count')]
+    for metric in METRICS:
+        column = getattr(SensorReading, metric)
+        columns += [
+            func.min(column).label(f'{metric}_min'),
+            func.max(column).label(f'{metric}_max'),
+            func.sum(column).label(f'{metric}_sum'),
+        ]
+    query = db.session.query(*columns)
+    if sensor_id is not None:
+        query = query.filter(SensorReading.sensor_id == sensor_id)
+    if start is not None:
+        query = query.filter(SensorReading.recorded_at >= start)
+    if end is not None:
+        query = query.filter(SensorReading.recorded_at < end)
+    query = query.group_by(SensorReading.sensor_id, bucket)
+
+    rows = []
+    for result in query:
+        row = result._asdict()
+        row['bucket_start'] = datetime.utcfromtimestamp(int(row.pop('bucket')))
+        rows.append(row)
+    return rows
+
+
+def fill_missing_rollups(start, end, resolutions=('1h', '1d')):
+    """
+    Insert the buckets of [start, end) that a rollup table is missing, computed
+    from raw readings. Existing buckets (kept up to date on ingest) are left
+    untouched. Used before raw readings are purged, so data stored before the
+    rollups existed is not lost. Runs in the caller's transaction.
+    """
+    for resolution in resolutions:
+        model = ROLLUP_MODELS[resolution]
+        rows = _aggregate_raw(model.bucket_seconds, start=start, end=end)
+        if rows:
+            stmt = dialect_insert(model)[0].on_conflict_do_nothing(
+                index_elements=['sensor_id', 'bucket_start']
+            )
+            db.session.execute(stmt, rows)
+
+
+def backfill_rollups(sensor_id=None, since=None):
+    """
+    Rebuild rollups from raw readings with one GROUP BY per resolution.
+
+    Args:
+        sensor_id: Only rebuild this sensor (default: all sensors)
+        since: Only rebuild buckets starting at or after this datetime
+
+    Returns:
+        Dictionary of rebuilt bucket counts per resolution
+    """
+    rebuilt = {}
+
+    for resolution, model in ROLLUP_MODELS.items():
+        seconds = model.bucket_seconds
+        start = truncate_timestamp(since, seconds) if since else None
+
+        stale = model.query
+        if sensor_id is not None:
+            stale = stale.filter(model.sensor_id == sensor_id)
+        if start is not None:
+            stale = stale.filter(model.bucket_start >= start)
+        stale.delete(synchronize_session=False)
+
+        rows = _aggregate_raw(seconds, sensor_id=sensor_id, start=start)
+        if rows:
+            db.session.execute(model.__table__.insert(), rows)
+        rebuilt[resolution] = len(rows)
+
+    db.session.commit()
+    logger.info(f"Rollups rebuilt: {rebuilt}")
+    return rebuilt
+
+
+def pick_resolution(hours, limit):
+    """
+    Pick the finest resolution whose buckets over a window of `hours` fit in
+    `limit` points, so the whole window is covered. Raw rows have no fixed
+    cadence and are only used when asked for; 1-day buckets are the fallback
+    when nothing fits.
+    """
+    window_seconds = hours * 3600
+    for resolution, model in ROLLUP_MODELS.items():
+        if window_seconds / model.bucket_seconds <= limit:
+            return resolution
+    return '1d'
+
+
+def get_rollup_readings(sensor_id, resolution, start_time, limit):
+    """Return rollup buckets of a sensor since start_time, most recent first"""
+    model = ROLLUP_MODELS[resolution]
+    start = truncate_timestamp(start_time, model.bucket_seconds)
+    return model.query.filter(
+        model.sensor_id == sensor_id,
+        model.bucket_start >= start
+    ).order_by(model.bucket_start.desc()).limit(limit).all()
+
+
+if __name__ == '__main__':
+    from app import app
+
+    with app.app_context():
+        print(f"Rollups rebuilt: {backfill_rollups()}")
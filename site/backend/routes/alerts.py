@@ -1,6 +1,8 @@
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from database import db, Alert, AlertHistory, Sensor, User
+from flask import Blueprint, request, jsonify, current_app
+from flask_jwt_extended import jwt_required
+from auth_context import current_identity
+from database import db, Alert, AlertHistory, Sensor
+from alert_stats import summarize_alerts, cached_stats
 from datetime import datetime, timedelta
 
 alerts_bp = Blueprint('alerts', __name__)
@@ -10,16 +12,8 @@ alerts_bp = Blueprint('alerts', __name__)
 def get_alerts():
     """Get alerts for the current user"""
     try:
-        current_user_id = get_jwt_identity()
-        
-        # Convert to int if string
-        if isinstance(current_user_id, str):
-            current_user_id = int(current_user_id)
-            
-        user = User.query.get(current_user_id)
-        
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
+        identity = current_identity()
+        current_user_id = identity.user_id
         
         # Get query parameters
         status = request.args.get('status')  # 'nouvelle', 'reconnue', 'résolue'
@@ -28,7 +22,7 @@ def get_alerts():
         # Check if alerts table exists
         try:
             # Build query
-            if user.role == 'admin':
+            if identity.is_admin:
                 query = Alert.query
             else:
                 query = Alert.query.filter_by(user_id=current_user_id)
@@ -58,8 +52,7 @@ def get_alerts():
 def update_alert_status(alert_id):
     """Update alert status"""
     try:
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
+        identity = current_identity()
         
         alert = Alert.query.get(alert_id)
         
@@ -67,7 +60,7 @@ def update_alert_status(alert_id):
             return jsonify({'error': 'Alert not found'}), 404
         
         # Check ownership unless admin
-        if user.role != 'admin' and alert.user_id != current_user_id:
+        if not identity.can_access(alert.user_id):
             return jsonify({'error': 'Unauthorized access to this alert'}), 403
         
         data = request.get_json()
@@ -94,8 +87,7 @@ def update_alert_status(alert_id):
 def delete_alert(alert_id):
     """Delete an alert"""
     try:
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
+        identity = current_identity()
         
         alert = Alert.query.get(alert_id)
         
@@ -103,7 +95,7 @@ def delete_alert(alert_id):
             return jsonify({'error': 'Alert not found'}), 404
         
         # Check ownership unless admin
-        if user.role != 'admin' and alert.user_id != current_user_id:
+        if not identity.can_access(alert.user_id):
             return jsonify({'error': 'Unauthorized access to this alert'}), 403
         
         db.session.delete(alert)
@@ -123,11 +115,8 @@ def delete_alert(alert_id):
 def get_alert_history():
     """Get alert history for the current user"""
     try:
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
-        
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
+        identity = current_identity()
+        current_user_id = identity.user_id
         
         # Get query parameters
         days = request.args.get('days', 30, type=int)
@@ -137,7 +126,7 @@ def get_alert_history():
         limit = request.args.get('limit', 100, type=int)
         
         # Build query
-        if user.role == 'admin':
+        if identity.is_admin:
             query = AlertHistory.query
         else:
             query = AlertHistory.query.filter_by(user_id=current_user_id)
@@ -175,16 +164,13 @@ def get_alert_history():
 def acknowledge_alert(alert_id):
     """Acknowledge an alert from history"""
     try:
-        current_user_id = get_jwt_identity()
-        if isinstance(current_user_id, str):
-            current_user_id = int(current_user_id)
+        identity = current_identity()
         alert = AlertHistory.query.get(alert_id)
         
         if not alert:
             return jsonify({'error': 'Alert not found'}), 404
         
-        user = User.query.get(current_user_id)
-        if user.role != 'admin' and alert.user_id != current_user_id:
+        if not identity.can_access(alert.user_id):
             return jsonify({'error': 'Unauthorized'}), 403
         
         alert.status = 'acknowledged'
@@ -206,16 +192,13 @@ def acknowledge_alert(alert_id):
 def resolve_alert(alert_id):
     """Resolve an alert from history"""
     try:
-        current_user_id = get_jwt_identity()
-        if isinstance(current_user_id, str):
-            current_user_id = int(current_user_id)
+        identity = current_identity()
         alert = AlertHistory.query.get(alert_id)
         
         if not alert:
             return jsonify({'error': 'Alert not found'}), 404
         
-        user = User.query.get(current_user_id)
-        if user.role != 'admin' and alert.user_id != current_user_id:
+        if not identity.can_access(alert.user_id):
             return jsonify({'error': 'Unauthorized'}), 403
         
         alert.status = 'resolved'
@@ -235,46 +218,47 @@ def resolve_alert(alert_id):
 @alerts_bp.route('/history/stats', methods=['GET'])
 @jwt_required()
 def get_alert_stats():
-    """Get alert statistics"""
+    """Get alert statistics (one grouped query, cached per user)"""
     try:
-        current_user_id = get_jwt_identity()
-        if isinstance(current_user_id, str):
-            current_user_id = int(current_user_id)
-        user = User.query.get(current_user_id)
+        identity = current_identity()
+        current_user_id = identity.user_id
         days = request.args.get('days', 30, type=int)
         
         start_date = datetime.utcnow() - timedelta(days=days)
         
-        if user.role == 'admin':
-            query = AlertHistory.query
-        else:
-            query = AlertHistory.query.filter_by(user_id=current_user_id)
-        
-        query = query.filter(AlertHistory.created_at >= start_date)
-        
-        total_alerts = query.count()
-        triggered = query.filter_by(status='triggered').count()
-        acknowledged = query.filter_by(status='acknowledged').count()
-        resolved = query.filter_by(status='resolved').count()
-        
-        # Count by type
-        by_type = {}
-        for alert_type in ['info', 'avertissement', 'critique']:
-            by_type[alert_type] = query.filter_by(alert_type=alert_type).count()
-        
-        # Count by metric
-        by_metric = {}
-        for metric in ['co2', 'temperature', 'humidity']:
-            by_metric[metric] = query.filter_by(metric=metric).count()
+        def compute():
+            if identity.is_admin:
+                query = AlertHistory.query
+            else:
+                query = AlertHistory.query.filter_by(user_id=current_user_id)
+            
+            query = query.filter(AlertHistory.created_at >= start_date)
+            return summarize_alerts(query)
+        
+        stats = cached_stats(
+            ('history', current_user_id, days),
+            compute,
+            ttl=current_app.config.get('ALERT_STATS_CACHE_TTL', 30)
+        )
+        
+        # Always report the known types and metrics, even with no alerts
+        by_type = {
+            alert_type: stats['byType'].get(alert_type, 0)
+            for alert_type in ['info', 'avertissement', 'critique']
+        }
+        by_metric = {
+            metric: stats['byMetric'].get(metric, 0)
+            for metric in ['co2', 'temperature', 'humidity']
+        }
         
         return jsonify({
-            'totalAlerts': total_alerts,
-            'triggered': triggered,
-            'acknowledged': acknowledged,
-            'resolved': resolved,
+            'totalAlerts': stats['totalAlerts'],
+            'triggered': stats['triggered'],
+            'acknowledged': stats['acknowledged'],
+            'resolved': stats['resolved'],
             'byType': by_type,
             'byMetric': by_metric
         }), 200
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'error': str(e)}), 500
@@ -0,0 +1,144 @@
+"""
+Analytics endpoints: anomaly detection and forecasts over sensor readings
+"""
+from flask import Blueprint, request, jsonify, current_app
+from flask_jwt_extended import jwt_required
+from auth_context import current_identity, sensor_ref, SensorRef
+from database import db, Sensor
+from anomaly_detection import detect_anomalies
+from forecasting import forecast
+from datetime import datetime
+import numpy as np
+
+analytics_bp = Blueprint('analytics', __name__)
+
+
+def _accessible_sensors(identity, sensor_id=None):
+    """
+    SensorRefs the caller may analyse: one sensor when `sensor_id` is given,
+    otherwise all of theirs (every sensor for admins).
+
+    Returns:
+        Tuple of (list of SensorRef, error response or None)
+    """
+    if sensor_id is not None:
+        sensor = sensor_ref(sensor_id)
+        if not sensor:
+            return [], (jsonify({'error': 'Sensor not found'}), 404)
+        if not identity.can_access(sensor.user_id):
+            return [], (jsonify({'error': 'Unauthorized access to this sensor'}), 403)
+        return [sensor], None
+
+    query = db.session.query(Sensor.id, Sensor.user_id, Sensor.sensor_type, Sensor.name)
+    if not identity.is_admin:
+        query = query.filter(Sensor.user_id == identity.user_id)
+    return [SensorRef(*row) for row in query.order_by(Sensor.id)], None
+
+
+@analytics_bp.route('/anomalies', methods=['GET'])
+@jwt_required()
+def get_anomalies():
+    """
+    Anomalous readings of the caller's sensors over the last `hours`.
+
+    A reading is flagged when its rolling z-score exceeds ANOMALY_Z_THRESHOLD
+    on any metric, or when the sensor's IsolationForest isolates it. Models
+    and baselines are cached per sensor and only new readings are scored on
+    later calls (see anomaly_detection.py).
+
+    Query params:
+        hours: Window length (default 24)
+        sensor_id: Restrict to one sensor
+        limit: Max anomalies returned, most recent first (default 100)
+    """
+    try:
+        identity = current_identity()
+        hours = request.args.get('hours', 24, type=int)
+        limit = request.args.get('limit', 100, type=int)
+
+        if hours <= 0 or limit <= 0:
+            return jsonify({'error': 'hours and limit must be positive'}), 400
+
+        sensors, error = _accessible_sensors(identity, request.args.get('sensor_id', type=int))
+        if error:
+            return error
+
+        anomalies = []
+        models = {}
+        for sensor in sensors:
+            found, summary = detect_anomalies(sensor, hours)
+            anomalies.extend({**anomaly, 'sensor_name': sensor.name} for anomaly in found)
+            models[str(sensor.id)] = {
+                'name': sensor.name,
+                **summary,
+                'anomalies': len(found)
+            }
+
+        anomalies.sort(key=lambda anomaly: anomaly['epoch'], reverse=True)
+        for anomaly in anomalies:
+            anomaly.pop('epoch')
+
+        return jsonify({
+            'success': True,
+            'data': anomalies[:limit],
+            'count': len(anomalies),
+            'hours': hours,
+            'sensors': models
+        }), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@analytics_bp.route('/predict/<int:hours>', methods=['GET'])
+@jwt_required()
+def predict(hours):
+    """
+    Hourly forecasts for the next `hours` hours.
+
+    Models (hour-of-week baseline plus an AR(1) term) are refitted by a
+    scheduler job; a request only evaluates them from the latest reading
+    (see forecasting.py). `predictions` holds the co2 forecast, averaged
+    over the sensors when no `sensor_id` is given; each sensor lists its
+    forecasts with intervals and the age of its model.
+
+    Query params:
+        sensor_id: Restrict to one sensor
+    """
+    try:
+        identity = current_identity()
+        max_hours = current_app.config.get('FORECAST_MAX_HOURS', 168)
+        if not 1 <= hours <= max_hours:
+            return jsonify({'error': f'hours must be between 1 and {max_hours}'}), 400
+
+        sensors, error = _accessible_sensors(identity, request.args.get('sensor_id', type=int))
+        if error:
+            return error
+
+        now = datetime.utcnow()
+        co2 = []
+        timestamps = []
+        models = {}
+        for sensor in sensors:
+            forecasts, forecaster = forecast(sensor, hours, now)
+            if forecasts:
+                co2.append([entry['co2'] for entry in forecasts])
+                timestamps = [entry['timestamp'] for entry in forecasts]
+            models[str(sensor.id)] = {
+                'name': sensor.name,
+                'forecast': forecasts,
+                'model_fitted_at': forecaster.fitted_at.isoformat(),
+                'model_age_seconds': max(round((now - forecaster.fitted_at).total_seconds()), 0),
+                'training_hours': forecaster.training_hours
+            }
+
+        return jsonify({
+            'success': True,
+            'hours': hours,
+            'predictions': [round(float(value), 2) for value in np.mean(co2, axis=0)] if co2 else [],
+            'timestamps': timestamps,
+            'sensors': models
+        }), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
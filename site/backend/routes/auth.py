@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import create_access_token, create_refresh_token, jwt_required, get_jwt_identity
 from database import db, User
+from auth_context import current_identity, identity_claims
 import bcrypt
 
 auth_bp = Blueprint('auth', __name__)
@@ -68,8 +69,8 @@ def login():
         if not bcrypt.checkpw(password.encode('utf-8'), user.password_hash.encode('utf-8')):
             return jsonify({'error': 'Invalid login credentials'}), 401
         
-        # Create tokens with explicit identity
-        access_token = create_access_token(identity=str(user.id))
+        # Create tokens with explicit identity; the role travels as a claim
+        access_token = create_access_token(identity=str(user.id), additional_claims=identity_claims(user))
         refresh_token = create_refresh_token(identity=str(user.id))
         
         print(f"Login successful for user {user.id}: {user.email}")
@@ -95,8 +96,13 @@ def refresh():
         current_user_id = get_jwt_identity()
         print(f"Refreshing token for user ID: {current_user_id}")
         
+        # Reload the user so role changes reach the new token
+        user = User.query.get(int(current_user_id))
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
+        
         # Convert to string for consistency
-        access_token = create_access_token(identity=str(current_user_id))
+        access_token = create_access_token(identity=str(user.id), additional_claims=identity_claims(user))
         
         print(f"New access token created: {access_token[:50]}...")
         return jsonify({'access_token': access_token}), 200
@@ -111,14 +117,11 @@ def refresh():
 def get_current_user():
     """Get current user information"""
     try:
-        current_user_id = get_jwt_identity()
-        print(f"Getting user for ID: {current_user_id} (type: {type(current_user_id)})")
-        
-        # Convert to int if it's a string
-        if isinstance(current_user_id, str):
-            current_user_id = int(current_user_id)
+        identity = current_identity()
+        current_user_id = identity.user_id
+        print(f"Getting user for ID: {current_user_id}")
         
-        user = User.query.get(current_user_id)
+        user = identity.user
         
         if not user:
             print(f"User not found for ID: {current_user_id}")
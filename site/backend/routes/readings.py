@@ -1,10 +1,19 @@
 from flask import Blueprint, request, jsonify, current_app
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from database import db, SensorReading, Sensor, User, Alert, AlertHistory
-from datetime import datetime, timedelta
-from email_service import send_alert_email
+from flask_jwt_extended import jwt_required
+from auth_context import current_identity, sensor_ref
+from database import db, SensorReading, Sensor, SensorLatest, Alert
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import insert
+from marshmallow import ValidationError
+from alert_state import evaluation
 from audit_logger import log_action
-from sensor_simulator import generate_historical_simulated_readings, generate_current_simulated_reading
+from sensor_providers import readings_provider
+from validators import batch_reading_schema
+from ingest import on_readings_stored, reading_row
+from archive import archived_until, iter_archived_readings
+import rollups
+import json
+import time
 import logging
 
 readings_bp = Blueprint('readings', __name__)
@@ -13,62 +22,43 @@ logger = logging.getLogger(__name__)
 @readings_bp.route('/sensor/<int:sensor_id>', methods=['GET'])
 @jwt_required()
 def get_sensor_readings(sensor_id):
-    """Get readings for a specific sensor (generates on-demand for simulated sensors)"""
+    """
+    Get readings for a specific sensor (computed on demand for simulated sensors).
+    
+    Real sensors accept `resolution` (raw, 1m, 1h, 1d or auto). With auto, the
+    finest rollup whose buckets over the window fit in `limit` points is used,
+    so the whole window is returned and long windows never scan raw rows.
+    """
     try:
-        current_user_id = get_jwt_identity()
+        identity = current_identity()
         
-        # Convert to int if string
-        if isinstance(current_user_id, str):
-            current_user_id = int(current_user_id)
-            
-        user = User.query.get(current_user_id)
-        
-        sensor = Sensor.query.get(sensor_id)
+        # Owner, type and name are all this endpoint needs from the sensor
+        sensor = sensor_ref(sensor_id)
         
         if not sensor:
             return jsonify({'error': 'Sensor not found'}), 404
         
         # Check ownership unless admin
-        if user.role != 'admin' and sensor.user_id != current_user_id:
+        if not identity.can_access(sensor.user_id):
             return jsonify({'error': 'Unauthorized access to this sensor'}), 403
         
         # Get query parameters
         limit = request.args.get('limit', 100, type=int)
         hours = request.args.get('hours', 24, type=int)
         
-        # For simulated sensors, generate historical data on-demand
-        if sensor.sensor_type == 'simulation':
-            simulated_readings = generate_historical_simulated_readings(sensor.name, hours)
-            
-            # Return limited number of readings
-            readings_data = [
-                {
-                    'id': idx,
-                    'sensor_id': sensor_id,
-                    'co2': r['co2'],
-                    'temperature': r['temperature'],
-                    'humidity': r['humidity'],
-                    'recorded_at': r['recorded_at']
-                }
-                for idx, r in enumerate(simulated_readings[-limit:])
-            ]
-            
-            return jsonify({
-                'readings': readings_data
-            }), 200
-        
-        # For real sensors, get actual readings from database
-        # Calculate time range
-        end_time = datetime.utcnow()
-        start_time = end_time - timedelta(hours=hours)
-        
-        readings = SensorReading.query.filter(
-            SensorReading.sensor_id == sensor_id,
-            SensorReading.recorded_at >= start_time
-        ).order_by(SensorReading.recorded_at.desc()).limit(limit).all()
+        # Simulated sensors are computed on demand, real ones read from the
+        # database (long windows from the rollup tables)
+        provider = readings_provider(sensor)
+        try:
+            readings, resolution = provider.history(
+                sensor, hours, limit, request.args.get('resolution', 'auto')
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         return jsonify({
-            'readings': [reading.to_dict() for reading in readings]
+            'readings': readings,
+            'resolution': resolution
         }), 200
         
     except Exception as e:
@@ -80,13 +70,8 @@ def get_sensor_readings(sensor_id):
 def add_reading():
     """Add a new sensor reading"""
     try:
-        current_user_id = get_jwt_identity()
-        
-        # Convert to int if string
-        if isinstance(current_user_id, str):
-            current_user_id = int(current_user_id)
-            
-        user = User.query.get(current_user_id)
+        identity = current_identity()
+        current_user_id = identity.user_id
         
         data = request.get_json()
         
@@ -104,20 +89,22 @@ def add_reading():
             return jsonify({'error': 'Sensor not found'}), 404
         
         # Check ownership unless admin
-        if user.role != 'admin' and sensor.user_id != current_user_id:
+        if not identity.can_access(sensor.user_id):
             return jsonify({'error': 'Unauthorized access to this sensor'}), 403
-        
+
+        # The web client posts the id as the string the API returned
         new_reading = SensorReading(
-            sensor_id=sensor_id,
+            sensor_id=sensor.id,
             co2=float(co2),
             temperature=float(temperature),
-            humidity=float(humidity)
+            humidity=float(humidity),
+            recorded_at=datetime.utcnow()
         )
         
         db.session.add(new_reading)
-        
-        # Check thresholds and trigger alerts
-        check_thresholds(sensor, current_user_id, co2, temperature, humidity)
+        db.session.flush()
+        row = reading_row(new_reading)
+        on_readings_stored([row])
         
         # Update sensor status based on CO2 levels
         if co2 > 1200:
@@ -127,8 +114,13 @@ def add_reading():
         
         sensor.updated_at = datetime.utcnow()
         
+        # The reading is committed before alerting, so a failing alert
+        # evaluation cannot take it down with it
         db.session.commit()
         
+        # Check thresholds and trigger alerts
+        check_thresholds({sensor.id: sensor}, current_user_id, [row])
+        
         # Log the action
         log_action(current_user_id, 'CREATE', 'READING', resource_id=new_reading.id)
         
@@ -143,130 +135,268 @@ def add_reading():
         return jsonify({'error': str(e)}), 500
 
 
-def check_thresholds(sensor, user_id, co2, temperature, humidity):
-    """Check if readings exceed configured thresholds and trigger alerts"""
+def check_thresholds(sensors, user_id, rows):
+    """
+    Feed stored readings to the alert state machines (see alert_state) in
+    recorded_at order, timed by their recorded_at, and commit the alert rows
+    in one transaction. An alert row and email are produced once per
+    episode, not per reading. Failures are logged; the stored readings are
+    not affected.
+    
+    Args:
+        sensors: Dictionary of sensor id -> Sensor
+        user_id: User the alerts are recorded for
+        rows: Reading dicts with sensor_id, co2, temperature, humidity and recorded_at
+    """
     try:
-        # Get configured thresholds
-        co2_threshold = current_app.config.get('ALERT_CO2_THRESHOLD', 1200)
-        temp_min = current_app.config.get('ALERT_TEMP_MIN', 15)
-        temp_max = current_app.config.get('ALERT_TEMP_MAX', 28)
-        humidity_threshold = current_app.config.get('ALERT_HUMIDITY_THRESHOLD', 80)
-        
-        user = User.query.get(user_id)
-        
-        # Check CO2 levels
-        if co2 > co2_threshold:
-            send_threshold_alert(
-                sensor, user, 'High CO2', f'CO2 level {co2} ppm exceeds threshold {co2_threshold} ppm',
-                co2, co2_threshold
-            )
-        
-        # Check temperature
-        if temperature < temp_min or temperature > temp_max:
-            threshold = temp_min if temperature < temp_min else temp_max
-            send_threshold_alert(
-                sensor, user, f'Temperature Alert', f'Temperature {temperature}°C outside range',
-                temperature, threshold
-            )
-        
-        # Check humidity
-        if humidity > humidity_threshold:
-            send_threshold_alert(
-                sensor, user, 'High Humidity', f'Humidity level {humidity}% exceeds threshold {humidity_threshold}%',
-                humidity, humidity_threshold
-            )
+        with evaluation(sensors) as evaluate:
+            for row in sorted(rows, key=lambda row: row['recorded_at']):
+                evaluate(sensors[row['sensor_id']], user_id, {
+                    'co2': row['co2'],
+                    'temperature': row['temperature'],
+                    'humidity': row['humidity']
+                }, now=row['recorded_at'])
     
     except Exception as e:
         logger.error(f"Error checking thresholds: {str(e)}")
 
 
-def send_threshold_alert(sensor, user, alert_type, message, value, threshold):
-    """Send alert when threshold is exceeded"""
-    try:
-        # Create alert history record
-        alert_history = AlertHistory(
-            user_id=user.id,
-            sensor_id=sensor.id,
-            alert_type=alert_type.lower().replace(' ', '_'),
-            message=message,
-            status='triggered'
-        )
-        db.session.add(alert_history)
-        db.session.commit()
-        
-        # Send email notification if enabled
-        if current_app.config.get('ENABLE_EMAIL_NOTIFICATIONS') and user.email:
-            send_alert_email(
-                to_email=user.email,
-                sensor_name=sensor.name,
-                alert_type=alert_type,
-                alert_value=value,
-                threshold=threshold
-            )
-        
-        logger.info(f"Alert triggered for sensor {sensor.id}: {alert_type}")
+DURATION_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def _parse_duration(value):
+    """Parse a duration such as '90s', '15m', '1h' or '1d' (bare numbers are seconds)"""
+    value = value.strip().lower()
+    if value and value[-1] in DURATION_UNITS:
+        return int(float(value[:-1]) * DURATION_UNITS[value[-1]])
+    return int(float(value))
+
+
+def _parse_window():
+    """
+    Resolve the aggregation window from `start`/`end` (ISO 8601) or `hours`.
     
-    except Exception as e:
-        logger.error(f"Error sending threshold alert: {str(e)}")
+    Returns:
+        Tuple of naive UTC (start_time, end_time)
+    """
+    end = request.args.get('end')
+    start = request.args.get('start')
+    end_time = datetime.utcnow()
+    if end:
+        end_time = datetime.fromisoformat(end)
+    if start:
+        start_time = datetime.fromisoformat(start)
+    else:
+        start_time = end_time - timedelta(hours=request.args.get('hours', 24, type=float))
+    
+    if start_time.tzinfo is not None:
+        start_time = start_time.astimezone(timezone.utc).replace(tzinfo=None)
+    if end_time.tzinfo is not None:
+        end_time = end_time.astimezone(timezone.utc).replace(tzinfo=None)
+    if start_time >= end_time:
+        raise ValueError('start must be before end')
+    return start_time, end_time
+
+
+def _aggregate_columns():
+    """AVG/MIN/MAX/COUNT columns over the three metrics"""
+    return [
+        db.func.count(SensorReading.id).label('count'),
+        db.func.avg(SensorReading.co2).label('avg_co2'),
+        db.func.min(SensorReading.co2).label('min_co2'),
+        db.func.max(SensorReading.co2).label('max_co2'),
+        db.func.avg(SensorReading.temperature).label('avg_temperature'),
+        db.func.min(SensorReading.temperature).label('min_temperature'),
+        db.func.max(SensorReading.temperature).label('max_temperature'),
+        db.func.avg(SensorReading.humidity).label('avg_humidity'),
+        db.func.min(SensorReading.humidity).label('min_humidity'),
+        db.func.max(SensorReading.humidity).label('max_humidity'),
+    ]
+
+
+def _aggregate_state(row):
+    """Mergeable count/sum/min/max of one row of _aggregate_columns"""
+    state = {'count': row.count}
+    for metric in rollups.METRICS:
+        average = getattr(row, f'avg_{metric}')
+        state[f'sum_{metric}'] = average * row.count if average is not None else 0
+        state[f'min_{metric}'] = getattr(row, f'min_{metric}')
+        state[f'max_{metric}'] = getattr(row, f'max_{metric}')
+    return state
+
+
+def _add_to_state(state, values):
+    """Fold one reading's (co2, temperature, humidity) into a state (None starts one)"""
+    if state is None:
+        state = {'count': 0}
+        for metric in rollups.METRICS:
+            state[f'sum_{metric}'] = 0
+            state[f'min_{metric}'] = None
+            state[f'max_{metric}'] = None
+    state['count'] += 1
+    for metric, value in zip(rollups.METRICS, values):
+        state[f'sum_{metric}'] += value
+        low, high = state[f'min_{metric}'], state[f'max_{metric}']
+        state[f'min_{metric}'] = value if low is None else min(low, value)
+        state[f'max_{metric}'] = value if high is None else max(high, value)
+    return state
+
+
+def _aggregate_summary(state):
+    """Serialize an aggregate state"""
+    def rounded(value):
+        return round(value, 2) if value is not None else 0
+    
+    count = state['count']
+    summary = {}
+    for metric, label in (('co2', 'Co2'), ('temperature', 'Temperature'), ('humidity', 'Humidity')):
+        summary[f'avg{label}'] = rounded(state[f'sum_{metric}'] / count if count else None)
+        summary[f'min{label}'] = rounded(state[f'min_{metric}'])
+        summary[f'max{label}'] = rounded(state[f'max_{metric}'])
+    summary['totalReadings'] = count
+    return summary
 
 
 @readings_bp.route('/aggregate', methods=['GET'])
 @jwt_required()
 def get_aggregate_data():
-    """Get aggregate sensor data for the current user"""
+    """
+    Get aggregate sensor data for the current user, computed in SQL.
+    Readings moved to the archive by retention are folded in from Parquet.
+    
+    Query params:
+        hours: Window length ending now (default 24), or
+        start, end: ISO 8601 window bounds
+        group_by: 'sensor' or 'location' for a per-group breakdown
+        bucket: Time bucket width ('15m', '1h', '1d', ...) for a time series
+    """
     try:
-        current_user_id = get_jwt_identity()
+        identity = current_identity()
+        current_user_id = identity.user_id
         
-        # Convert to int if string
-        if isinstance(current_user_id, str):
-            current_user_id = int(current_user_id)
-            
-        user = User.query.get(current_user_id)
+        group_by = request.args.get('group_by')
+        bucket = request.args.get('bucket')
+        
+        if group_by not in (None, 'sensor', 'location'):
+            return jsonify({'error': 'group_by must be sensor or location'}), 400
         
-        # Get all user's sensors
-        if user.role == 'admin':
-            sensors = Sensor.query.all()
+        try:
+            start_time, end_time = _parse_window()
+            bucket_seconds = _parse_duration(bucket) if bucket else None
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        if bucket_seconds is not None:
+            if bucket_seconds < 60:
+                return jsonify({'error': 'bucket must be at least 1 minute'}), 400
+            if (end_time - start_time).total_seconds() / bucket_seconds > 10000:
+                return jsonify({'error': 'Too many buckets for this window'}), 400
+        
+        # Readings before the archive boundary are read from Parquet
+        boundary = archived_until()
+        hot_start = max(start_time, boundary) if boundary else start_time
+        
+        def scoped(query):
+            query = query.filter(
+                SensorReading.recorded_at >= hot_start,
+                SensorReading.recorded_at <= end_time
+            )
+            # Admins aggregate over all sensors, users over their own
+            if not identity.is_admin:
+                query = query.filter(SensorReading.sensor_id.in_(
+                    db.session.query(Sensor.id).filter(Sensor.user_id == current_user_id)
+                ))
+            return query
+        
+        if group_by == 'sensor':
+            group_columns = [Sensor.id.label('group_id'), Sensor.name.label('group_name')]
+        elif group_by == 'location':
+            group_columns = [Sensor.location.label('group_id')]
         else:
-            sensors = Sensor.query.filter_by(user_id=current_user_id).all()
-        
-        sensor_ids = [s.id for s in sensors]
-        
-        if not sensor_ids:
-            return jsonify({
-                'avgCo2': 0,
-                'avgTemperature': 0,
-                'avgHumidity': 0,
-                'totalReadings': 0
-            }), 200
-        
-        # Get recent readings (last 24 hours)
-        end_time = datetime.utcnow()
-        start_time = end_time - timedelta(hours=24)
-        
-        readings = SensorReading.query.filter(
-            SensorReading.sensor_id.in_(sensor_ids),
-            SensorReading.recorded_at >= start_time
-        ).all()
-        
-        if not readings:
-            return jsonify({
-                'avgCo2': 0,
-                'avgTemperature': 0,
-                'avgHumidity': 0,
-                'totalReadings': 0
-            }), 200
-        
-        # Calculate averages
-        avg_co2 = sum(r.co2 for r in readings) / len(readings)
-        avg_temp = sum(r.temperature for r in readings) / len(readings)
-        avg_humidity = sum(r.humidity for r in readings) / len(readings)
+            group_columns = []
         
-        return jsonify({
-            'avgCo2': round(avg_co2, 2),
-            'avgTemperature': round(avg_temp, 2),
-            'avgHumidity': round(avg_humidity, 2),
-            'totalReadings': len(readings)
-        }), 200
+        total = _aggregate_state(scoped(db.session.query(*_aggregate_columns())).one())
+        
+        group_states = {}
+        group_names = {}
+        if group_columns:
+            query = db.session.query(*group_columns, *_aggregate_columns()).join(
+                Sensor, Sensor.id == SensorReading.sensor_id
+            )
+            for row in scoped(query).group_by(*group_columns):
+                key = str(row.group_id)
+                group_states[key] = _aggregate_state(row)
+                if group_by == 'sensor':
+                    group_names[key] = row.group_name
+        
+        bucket_states = {}
+        if bucket_seconds is not None:
+            bucket_column = rollups.bucket_epoch(SensorReading.recorded_at, bucket_seconds).label('bucket')
+            query = db.session.query(*group_columns, bucket_column, *_aggregate_columns())
+            if group_columns:
+                query = query.join(Sensor, Sensor.id == SensorReading.sensor_id)
+            for row in scoped(query).group_by(*group_columns, bucket_column):
+                key = str(row.group_id) if group_columns else None
+                bucket_start = datetime.utcfromtimestamp(int(row.bucket))
+                bucket_states[(key, bucket_start)] = _aggregate_state(row)
+        
+        if boundary and start_time < boundary:
+            sensors = db.session.query(Sensor.id, Sensor.name, Sensor.location)
+            if not identity.is_admin:
+                sensors = sensors.filter(Sensor.user_id == current_user_id)
+            sensors = {sensor.id: sensor for sensor in sensors}
+            
+            archived = iter_archived_readings(
+                list(sensors), start_time, min(boundary, end_time + timedelta(microseconds=1))
+            )
+            for _, sensor_id, co2, temperature, humidity, recorded_at in archived:
+                sensor = sensors[sensor_id]
+                values = (co2, temperature, humidity)
+                _add_to_state(total, values)
+                
+                key = None
+                if group_by == 'sensor':
+                    key = str(sensor_id)
+                    group_names[key] = sensor.name
+                elif group_by == 'location':
+                    key = str(sensor.location)
+                if key is not None:
+                    group_states[key] = _add_to_state(group_states.get(key), values)
+                
+                if bucket_seconds is not None:
+                    bucket_key = (key, rollups.truncate_timestamp(recorded_at, bucket_seconds))
+                    bucket_states[bucket_key] = _add_to_state(bucket_states.get(bucket_key), values)
+        
+        result = _aggregate_summary(total)
+        result['start'] = start_time.isoformat()
+        result['end'] = end_time.isoformat()
+        
+        groups = {}
+        if group_columns:
+            for key, state in group_states.items():
+                group = _aggregate_summary(state)
+                group['key'] = key
+                if group_by == 'sensor':
+                    group['name'] = group_names[key]
+                groups[key] = group
+            result['groups'] = list(groups.values())
+        
+        if bucket_seconds is not None:
+            series = []
+            for (key, bucket_start), state in sorted(bucket_states.items(), key=lambda item: item[0][1]):
+                point = _aggregate_summary(state)
+                point['bucket_start'] = bucket_start.isoformat()
+                if group_columns:
+                    group = groups.get(key)
+                    if group is not None:
+                        group.setdefault('buckets', []).append(point)
+                else:
+                    series.append(point)
+            if not group_columns:
+                result['buckets'] = series
+            result['bucket_seconds'] = bucket_seconds
+        
+        return jsonify(result), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -308,10 +438,14 @@ def add_external_reading(sensor_api_key):
             sensor_id=sensor_id,
             co2=float(co2),
             temperature=float(temperature),
-            humidity=float(humidity)
+            humidity=float(humidity),
+            recorded_at=datetime.utcnow()
         )
         
         db.session.add(new_reading)
+        db.session.flush()
+        row = reading_row(new_reading)
+        on_readings_stored([row])
         
         # Update sensor status based on CO2 levels
         if co2 > 1200:
@@ -335,18 +469,195 @@ def add_external_reading(sensor_api_key):
         return jsonify({'error': str(e)}), 500
 
 
+def _parse_batch_body():
+    """
+    Parse a batch upload body into a list of items.
+
+    Accepts a JSON array, a JSON object with a `readings` array, or NDJSON
+    (one JSON object per line). NDJSON lines that fail to parse are kept as
+    `ValueError` placeholders so they get their own per-item result.
+
+    Returns:
+        List of items, or None if the body cannot be interpreted
+    """
+    content_type = (request.mimetype or '').lower()
+    
+    if content_type in ('application/x-ndjson', 'application/ndjson', 'application/jsonlines'):
+        items = []
+        for line in request.get_data(as_text=True).splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                items.append(json.loads(line))
+            except ValueError as e:
+                items.append(ValueError(f'Invalid JSON line: {e}'))
+        return items
+    
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        data = data.get('readings')
+    if not isinstance(data, list):
+        return None
+    return data
+
+
+@readings_bp.route('/batch', methods=['POST'])
+@jwt_required()
+def add_readings_batch():
+    """
+    Add many readings in a single request (JSON array or NDJSON body).
+    
+    All items are validated in one pass, sensors are resolved with a single
+    query, valid items are bulk inserted and the transaction is committed once.
+    Every stored reading is then evaluated for alerts, in recorded_at order,
+    in a second transaction.
+    Each item gets a result code: 201 stored, 400 invalid, 403 not owned,
+    404 unknown sensor.
+    """
+    started = time.perf_counter()
+    try:
+        identity = current_identity()
+        current_user_id = identity.user_id
+        
+        items = _parse_batch_body()
+        
+        if items is None:
+            return jsonify({'error': 'Body must be a JSON array of readings or NDJSON'}), 400
+        
+        if not items:
+            return jsonify({'error': 'No readings provided'}), 400
+        
+        max_items = current_app.config.get('READINGS_BATCH_MAX', 10000)
+        if len(items) > max_items:
+            return jsonify({'error': f'Batch too large ({len(items)} items, max {max_items})'}), 413
+        
+        # Validation pass
+        results = [None] * len(items)
+        valid = []
+        for index, item in enumerate(items):
+            if isinstance(item, ValueError):
+                results[index] = {'index': index, 'status': 400, 'error': str(item)}
+                continue
+            if not isinstance(item, dict):
+                results[index] = {'index': index, 'status': 400, 'error': 'Reading must be a JSON object'}
+                continue
+            try:
+                reading = batch_reading_schema.load(item)
+            except ValidationError as e:
+                results[index] = {'index': index, 'status': 400, 'error': e.messages}
+                continue
+            valid.append((index, reading))
+        
+        # Resolve every referenced sensor with one query
+        sensor_ids = {reading['sensor_id'] for _, reading in valid}
+        sensors = {
+            sensor.id: sensor
+            for sensor in Sensor.query.filter(Sensor.id.in_(sensor_ids)).all()
+        } if sensor_ids else {}
+        
+        now = datetime.utcnow()
+        rows = []
+        latest_by_sensor = {}
+        for index, reading in valid:
+            sensor = sensors.get(reading['sensor_id'])
+            if not sensor:
+                results[index] = {'index': index, 'status': 404, 'error': 'Sensor not found'}
+                continue
+            if not identity.can_access(sensor.user_id):
+                results[index] = {'index': index, 'status': 403, 'error': 'Unauthorized access to this sensor'}
+                continue
+            
+            recorded_at = reading.get('recorded_at') or now
+            if recorded_at.tzinfo is not None:
+                recorded_at = recorded_at.astimezone(timezone.utc).replace(tzinfo=None)
+            
+            row = {
+                'sensor_id': sensor.id,
+                'co2': reading['co2'],
+                'temperature': reading['temperature'],
+                'humidity': reading['humidity'],
+                'recorded_at': recorded_at
+            }
+            rows.append(row)
+            results[index] = {'index': index, 'status': 201}
+            
+            latest = latest_by_sensor.get(sensor.id)
+            if latest is None or recorded_at >= latest['recorded_at']:
+                latest_by_sensor[sensor.id] = row
+        
+        if rows:
+            # Read before on_readings_stored upserts sensor_latest
+            stored_latest = dict(db.session.query(
+                SensorLatest.sensor_id, SensorLatest.recorded_at
+            ).filter(SensorLatest.sensor_id.in_(list(latest_by_sensor))).all())
+            
+            db.session.execute(insert(SensorReading), rows)
+            on_readings_stored(rows)
+            
+            # Update sensor status from the most recent reading of each sensor,
+            # unless a back-filled batch is older than what is already stored
+            for sensor_id, row in latest_by_sensor.items():
+                sensor = sensors[sensor_id]
+                stored_at = stored_latest.get(sensor_id)
+                if stored_at is None or row['recorded_at'] >= stored_at:
+                    if row['co2'] > 1200:
+                        sensor.status = 'avertissement'
+                    elif row['co2'] < 1000:
+                        sensor.status = 'en ligne'
+                sensor.updated_at = now
+            
+            db.session.commit()
+            
+            # Alerting runs after the single commit, over every stored row so
+            # a breach in the middle of a batch is not missed
+            check_thresholds(
+                {sensor_id: sensors[sensor_id] for sensor_id in latest_by_sensor},
+                current_user_id,
+                rows
+            )
+            
+            log_action(current_user_id, 'CREATE', 'READING_BATCH', details={
+                'count': len(rows),
+                'sensors': sorted(latest_by_sensor)
+            })
+        
+        elapsed = time.perf_counter() - started
+        accepted = len(rows)
+        rejected = len(items) - accepted
+        
+        if rejected == 0:
+            status_code = 201
+        elif accepted:
+            status_code = 207
+        else:
+            status_code = 400
+        
+        return jsonify({
+            'message': f'{accepted} readings added, {rejected} rejected',
+            'results': results,
+            'stats': {
+                'received': len(items),
+                'accepted': accepted,
+                'rejected': rejected,
+                'sensors': len(latest_by_sensor),
+                'elapsed_ms': round(elapsed * 1000, 2),
+                'readings_per_second': round(accepted / elapsed, 1) if elapsed > 0 else None
+            }
+        }), status_code
+        
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error adding reading batch: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+
 @readings_bp.route('/latest/<int:sensor_id>', methods=['GET'])
 @jwt_required()
 def get_latest_reading(sensor_id):
-    """Get the latest reading for a specific sensor. For simulated sensors, generate and store if stale."""
+    """Get the latest reading for a specific sensor (computed for simulated sensors)."""
     try:
-        current_user_id = get_jwt_identity()
-        
-        # Convert to int if string
-        if isinstance(current_user_id, str):
-            current_user_id = int(current_user_id)
-            
-        user = User.query.get(current_user_id)
+        identity = current_identity()
         
         sensor = Sensor.query.get(sensor_id)
         
@@ -354,36 +665,17 @@ def get_latest_reading(sensor_id):
             return jsonify({'error': 'Sensor not found'}), 404
         
         # Check ownership unless admin
-        if user.role != 'admin' and sensor.user_id != current_user_id:
+        if not identity.can_access(sensor.user_id):
             return jsonify({'error': 'Unauthorized access to this sensor'}), 403
         
-        # Get latest reading
-        latest_reading = SensorReading.query.filter_by(
-            sensor_id=sensor_id
-        ).order_by(SensorReading.recorded_at.desc()).first()
-        
-        # For simulated sensors, generate fresh reading if none exists or if reading is older than 5 seconds
-        if sensor.sensor_type == 'simulation':
-            if not latest_reading or (datetime.utcnow() - latest_reading.recorded_at).total_seconds() > 5:
-                # Generate new simulated reading
-                simulated_data = generate_current_simulated_reading(sensor.name)
-                
-                # Store it in the database so it's consistent across requests
-                new_reading = SensorReading(
-                    sensor_id=sensor_id,
-                    co2=simulated_data['co2'],
-                    temperature=simulated_data['temperature'],
-                    humidity=simulated_data['humidity']
-                )
-                db.session.add(new_reading)
-                db.session.commit()
-                latest_reading = new_reading
+        # Simulated readings are computed, never stored (read-only)
+        latest_reading = readings_provider(sensor).latest(sensor)
         
         if not latest_reading:
             return jsonify({'error': 'No readings found for this sensor'}), 404
         
         return jsonify({
-            'reading': latest_reading.to_dict(),
+            'reading': latest_reading,
             'sensor': sensor.to_dict()
         }), 200
         
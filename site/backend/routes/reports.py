@@ -1,10 +1,14 @@
 """
 Reports endpoints for generating analytics and exports
 """
-from flask import Blueprint, jsonify, request, send_file
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from datetime import datetime, timedelta
-from database import db, AlertHistory, Sensor, User
+from flask import Blueprint, jsonify, request, send_file, current_app, Response, stream_with_context
+from flask_jwt_extended import jwt_required
+from auth_context import current_identity
+from datetime import datetime, timedelta, timezone
+from database import db, AlertHistory, Sensor, SensorReading
+from alert_stats import summarize_alerts, cached_stats
+from archive import archived_until, iter_archived_readings
+import report_jobs
 import csv
 import io
 from functools import wraps
@@ -17,13 +21,7 @@ def admin_or_owner(f):
     @wraps(f)
     @jwt_required()
     def decorated(*args, **kwargs):
-        current_user_id = get_jwt_identity()
-        # Handle string user_id from JWT
-        if isinstance(current_user_id, str):
-            current_user_id = int(current_user_id)
-        user = User.query.get(current_user_id)
-        
-        if not user:
+        if current_identity().user is None:
             return jsonify({'error': 'User not found'}), 404
         
         return f(*args, **kwargs)
@@ -31,282 +29,341 @@ def admin_or_owner(f):
     return decorated
 
 
+# Rows fetched per round-trip and written per response chunk when streaming
+STREAM_CHUNK_ROWS = 2000
+
+
+def _stream_csv(header, rows):
+    """
+    Generate a CSV document chunk by chunk (UTF-8 with BOM for Excel).
+    
+    Args:
+        header: List of column titles
+        rows: Iterable of row lists, consumed lazily
+    """
+    output = io.StringIO()
+    writer = csv.writer(output)
+    output.write('\ufeff')
+    writer.writerow(header)
+    
+    pending = 0
+    for row in rows:
+        writer.writerow(row)
+        pending += 1
+        if pending >= STREAM_CHUNK_ROWS:
+            yield output.getvalue().encode('utf-8')
+            output.seek(0)
+            output.truncate()
+            pending = 0
+    
+    yield output.getvalue().encode('utf-8')
+
+
+def _csv_response(generator, filename):
+    """Chunked CSV download response around a _stream_csv generator"""
+    return Response(
+        stream_with_context(generator),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
+
+def _format_timestamp(value):
+    return value.strftime('%Y-%m-%d %H:%M:%S') if value else ''
+
+
 @reports_bp.route('/export/csv', methods=['GET'])
 @admin_or_owner
 def export_alerts_csv():
-    """Export alerts as CSV file"""
+    """Export alerts as CSV file, streamed from a server-side cursor"""
     try:
         days = request.args.get('days', 30, type=int)
-        current_user_id = get_jwt_identity()
-        # Handle string user_id from JWT
-        if isinstance(current_user_id, str):
-            current_user_id = int(current_user_id)
-        user = User.query.get(current_user_id)
+        identity = current_identity()
+        current_user_id = identity.user_id
         
         # Calculate date range
         end_date = datetime.utcnow()
         start_date = end_date - timedelta(days=days)
         
         # Query alerts for user's sensors
-        sensors = Sensor.query.filter_by(user_id=current_user_id).all()
-        sensor_ids = [s.id for s in sensors]
+        owned_sensors = db.session.query(Sensor.id).filter(Sensor.user_id == current_user_id)
         
-        if not sensor_ids:
+        if not db.session.query(owned_sensors.exists()).scalar():
             return jsonify({'error': 'No sensors found'}), 404
         
         alerts = AlertHistory.query.filter(
-            AlertHistory.sensor_id.in_(sensor_ids),
+            AlertHistory.sensor_id.in_(owned_sensors),
             AlertHistory.created_at >= start_date,
             AlertHistory.created_at <= end_date
-        ).order_by(AlertHistory.created_at.desc()).all()
-        
-        # Create CSV
-        output = io.StringIO()
-        writer = csv.writer(output)
-        
-        # Write header
-        writer.writerow([
+        ).order_by(AlertHistory.created_at.desc()).yield_per(STREAM_CHUNK_ROWS)
+        
+        def rows():
+            for alert in alerts:
+                sensor = alert.sensor
+                yield [
+                    _format_timestamp(alert.created_at),
+                    sensor.name if sensor else 'N/A',
+                    sensor.location if sensor else 'N/A',
+                    alert.alert_type,
+                    alert.metric,
+                    f"{alert.metric_value:.2f}",
+                    f"{alert.threshold_value:.2f}" if alert.threshold_value else 'N/A',
+                    alert.message,
+                    alert.status,
+                    _format_timestamp(alert.created_at),
+                    _format_timestamp(alert.acknowledged_at),
+                    _format_timestamp(alert.resolved_at)
+                ]
+        
+        header = [
             'Date/Heure', 'Capteur', 'Localisation', 'Type d\'alerte',
             'Métrique', 'Valeur', 'Seuil', 'Message', 'Statut',
             'Créée le', 'Accusée le', 'Résolue le'
-        ])
-        
-        # Write data
-        for alert in alerts:
-            sensor = Sensor.query.get(alert.sensor_id)
-            writer.writerow([
-                alert.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-                sensor.name if sensor else 'N/A',
-                sensor.location if sensor else 'N/A',
-                alert.alert_type,
-                alert.metric,
-                f"{alert.metric_value:.2f}",
-                f"{alert.threshold_value:.2f}" if alert.threshold_value else 'N/A',
-                alert.message,
-                alert.status,
-                alert.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-                alert.acknowledged_at.strftime('%Y-%m-%d %H:%M:%S') if alert.acknowledged_at else '',
-                alert.resolved_at.strftime('%Y-%m-%d %H:%M:%S') if alert.resolved_at else ''
-            ])
-        
-        # Prepare response
-        output.seek(0)
-        mem = io.BytesIO()
-        mem.write(output.getvalue().encode('utf-8-sig'))
-        mem.seek(0)
-        
-        return send_file(
-            mem,
-            mimetype='text/csv',
-            as_attachment=True,
-            download_name=f'alertes-{datetime.utcnow().strftime("%Y-%m-%d")}.csv'
+        ]
+        return _csv_response(
+            _stream_csv(header, rows()),
+            f'alertes-{datetime.utcnow().strftime("%Y-%m-%d")}.csv'
         )
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+@reports_bp.route('/export/readings.csv', methods=['GET'])
+@admin_or_owner
+def export_readings_csv():
+    """
+    Export raw sensor readings as CSV, streamed from a server-side cursor.
+    Ranges reaching past the archive boundary include archived readings.
+    
+    Query params:
+        start, end: ISO 8601 range (default: the last `days` days)
+        days: Range length when `start` is not given (default 30)
+        sensor_id: Restrict to one or more sensors (repeatable)
+    """
+    try:
+        identity = current_identity()
+        current_user_id = identity.user_id
+        
+        try:
+            end_date = datetime.fromisoformat(request.args['end']) if 'end' in request.args else datetime.utcnow()
+            if 'start' in request.args:
+                start_date = datetime.fromisoformat(request.args['start'])
+            else:
+                start_date = end_date - timedelta(days=request.args.get('days', 30, type=int))
+        except ValueError:
+            return jsonify({'error': 'start and end must be ISO 8601 dates'}), 400
+        
+        # Stored timestamps are naive UTC
+        if start_date.tzinfo is not None:
+            start_date = start_date.astimezone(timezone.utc).replace(tzinfo=None)
+        if end_date.tzinfo is not None:
+            end_date = end_date.astimezone(timezone.utc).replace(tzinfo=None)
+        if start_date > end_date:
+            return jsonify({'error': 'start must not be after end'}), 400
+        
+        sensors = db.session.query(Sensor.id, Sensor.name, Sensor.location)
+        
+        # Admins can export any sensor, users only their own
+        if not identity.is_admin:
+            sensors = sensors.filter(Sensor.user_id == current_user_id)
+        
+        sensor_ids = request.args.getlist('sensor_id', type=int)
+        if sensor_ids:
+            sensors = sensors.filter(Sensor.id.in_(sensor_ids))
+        sensors = {sensor.id: sensor for sensor in sensors}
+        
+        # Readings before the archive boundary are read from Parquet
+        boundary = archived_until()
+        hot_start = max(start_date, boundary) if boundary else start_date
+        
+        query = db.session.query(
+            SensorReading.recorded_at,
+            SensorReading.sensor_id,
+            SensorReading.co2,
+            SensorReading.temperature,
+            SensorReading.humidity
+        ).filter(
+            SensorReading.sensor_id.in_(list(sensors)),
+            SensorReading.recorded_at >= hot_start,
+            SensorReading.recorded_at <= end_date
+        ).order_by(SensorReading.recorded_at).yield_per(STREAM_CHUNK_ROWS)
+        
+        def rows():
+            if boundary and start_date < boundary:
+                archived = iter_archived_readings(
+                    list(sensors), start_date, min(boundary, end_date + timedelta(microseconds=1))
+                )
+                for _, sensor_id, co2, temperature, humidity, recorded_at in archived:
+                    sensor = sensors[sensor_id]
+                    yield [recorded_at.isoformat(), sensor_id, sensor.name, sensor.location, co2, temperature, humidity]
+            for recorded_at, sensor_id, co2, temperature, humidity in query:
+                sensor = sensors[sensor_id]
+                yield [
+                    recorded_at.isoformat(),
+                    sensor_id,
+                    sensor.name,
+                    sensor.location,
+                    co2,
+                    temperature,
+                    humidity
+                ]
+        
+        header = ['Date/Heure', 'ID Capteur', 'Capteur', 'Localisation', 'CO2 (ppm)', 'Température (°C)', 'Humidité (%)']
+        return _csv_response(
+            _stream_csv(header, rows()),
+            f'lectures-{start_date.strftime("%Y-%m-%d")}-{end_date.strftime("%Y-%m-%d")}.csv'
+        )
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+def _report_params(days):
+    """
+    Job parameters for a report. The UTC date is part of the parameters so a
+    cached report never outlives the day it was generated for.
+    """
+    return {'days': days, 'as_of': datetime.utcnow().strftime('%Y-%m-%d')}
+
+
 @reports_bp.route('/export/pdf', methods=['GET'])
 @admin_or_owner
 def export_alerts_pdf():
-    """Export alerts as PDF file"""
+    """
+    Export alerts as PDF file.
+    
+    Rendering goes through the report job queue, so concurrent identical
+    requests share one rendering and repeated ones hit the cached artifact.
+    A report not ready within REPORT_WAIT_TIMEOUT seconds is answered with
+    202 and its job, to be polled at /jobs/<id> instead of holding a worker.
+    """
     try:
-        from reportlab.lib import colors
-        from reportlab.lib.pagesizes import letter, A4
-        from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
-        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-        from reportlab.lib.units import inch
-        
         days = request.args.get('days', 30, type=int)
-        current_user_id = get_jwt_identity()
-        # Handle string user_id from JWT
-        if isinstance(current_user_id, str):
-            current_user_id = int(current_user_id)
-        user = User.query.get(current_user_id)
+        identity = current_identity()
+        current_user_id = identity.user_id
         
-        # Calculate date range
-        end_date = datetime.utcnow()
-        start_date = end_date - timedelta(days=days)
-        
-        # Query alerts for user's sensors
-        sensors = Sensor.query.filter_by(user_id=current_user_id).all()
-        sensor_ids = [s.id for s in sensors]
-        
-        if not sensor_ids:
+        if not Sensor.query.filter_by(user_id=current_user_id).first():
             return jsonify({'error': 'No sensors found'}), 404
         
-        alerts = AlertHistory.query.filter(
-            AlertHistory.sensor_id.in_(sensor_ids),
-            AlertHistory.created_at >= start_date,
-            AlertHistory.created_at <= end_date
-        ).order_by(AlertHistory.created_at.desc()).all()
+        job = report_jobs.submit_report(current_user_id, 'alerts_pdf', _report_params(days))
         
-        # Create PDF
-        mem = io.BytesIO()
-        doc = SimpleDocTemplate(mem, pagesize=A4)
-        story = []
+        if not job.done_event.wait(current_app.config.get('REPORT_WAIT_TIMEOUT', 2)):
+            # Still rendering: hand the job over to the client to poll
+            return jsonify({'job': job.to_dict()}), 202
         
-        # Styles
-        styles = getSampleStyleSheet()
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=24,
-            textColor=colors.HexColor('#1e293b'),
-            spaceAfter=30
-        )
-        heading_style = ParagraphStyle(
-            'CustomHeading',
-            parent=styles['Heading2'],
-            fontSize=14,
-            textColor=colors.HexColor('#475569'),
-            spaceAfter=12
-        )
-        
-        # Title
-        story.append(Paragraph('Rapport d\'Alertes', title_style))
-        story.append(Paragraph(
-            f'Période: {start_date.strftime("%d/%m/%Y")} - {end_date.strftime("%d/%m/%Y")}',
-            styles['Normal']
-        ))
-        story.append(Spacer(1, 0.3 * inch))
-        
-        # Summary
-        story.append(Paragraph('Résumé', heading_style))
-        summary_data = [
-            ['Nombre total d\'alertes', str(len(alerts))],
-            ['Alertes déclenchées', str(sum(1 for a in alerts if a.status == 'triggered'))],
-            ['Alertes accusées', str(sum(1 for a in alerts if a.status == 'acknowledged'))],
-            ['Alertes résolues', str(sum(1 for a in alerts if a.status == 'resolved'))],
-        ]
-        summary_table = Table(summary_data, colWidths=[3 * inch, 2 * inch])
-        summary_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#f1f5f9')),
-            ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-            ('GRID', (0, 0), (-1, -1), 1, colors.grey),
-        ]))
-        story.append(summary_table)
-        story.append(Spacer(1, 0.3 * inch))
-        
-        # Detailed alerts table (limit to recent 50 for PDF readability)
-        story.append(Paragraph('Alertes Détaillées', heading_style))
-        
-        table_data = [
-            ['Date/Heure', 'Capteur', 'Type', 'Métrique', 'Valeur', 'Statut']
-        ]
-        
-        for alert in alerts[:50]:
-            sensor = Sensor.query.get(alert.sensor_id)
-            table_data.append([
-                alert.created_at.strftime('%d/%m %H:%M'),
-                sensor.name if sensor else 'N/A',
-                alert.alert_type,
-                alert.metric,
-                f"{alert.metric_value:.1f}",
-                alert.status
-            ])
-        
-        table = Table(table_data, colWidths=[1.2 * inch, 1.5 * inch, 0.8 * inch, 0.8 * inch, 0.7 * inch, 0.8 * inch])
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#0f172a')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 9),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('FONTSIZE', (0, 1), (-1, -1), 8),
-            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f8f9fa')]),
-        ]))
-        story.append(table)
-        
-        # Build PDF
-        doc.build(story)
-        mem.seek(0)
+        if job.status == 'failed':
+            return jsonify({'error': job.error}), 500
         
         return send_file(
-            mem,
+            job.path,
             mimetype='application/pdf',
             as_attachment=True,
             download_name=f'rapport-alertes-{datetime.utcnow().strftime("%Y-%m-%d")}.pdf'
         )
     
-    except ImportError:
-        return jsonify({'error': 'reportlab library not installed. Please run: pip install reportlab'}), 500
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
-@reports_bp.route('/stats', methods=['GET'])
+@reports_bp.route('/jobs', methods=['POST'])
 @admin_or_owner
-def get_report_stats():
-    """Get alert statistics for a period"""
+def create_report_job():
+    """Queue a report for background rendering (body: type, days)"""
     try:
-        days = request.args.get('days', 30, type=int)
-        current_user_id = get_jwt_identity()
-        # Handle string user_id from JWT
-        if isinstance(current_user_id, str):
-            current_user_id = int(current_user_id)
+        identity = current_identity()
+        current_user_id = identity.user_id
         
-        # Calculate date range
-        end_date = datetime.utcnow()
-        start_date = end_date - timedelta(days=days)
-        
-        # Query alerts for user's sensors
-        sensors = Sensor.query.filter_by(user_id=current_user_id).all()
-        sensor_ids = [s.id for s in sensors]
+        data = request.get_json(silent=True) or {}
+        report_type = data.get('type', 'alerts_pdf')
+        days = data.get('days', 30)
         
-        if not sensor_ids:
-            return jsonify({
-                'totalAlerts': 0,
-                'triggered': 0,
-                'acknowledged': 0,
-                'resolved': 0,
-                'byType': {},
-                'byMetric': {}
-            }), 200
+        if report_type not in report_jobs.REPORT_TYPES:
+            return jsonify({'error': f'Unknown report type: {report_type}'}), 400
+        if not isinstance(days, int) or days <= 0:
+            return jsonify({'error': 'days must be a positive integer'}), 400
         
-        alerts = AlertHistory.query.filter(
-            AlertHistory.sensor_id.in_(sensor_ids),
-            AlertHistory.created_at >= start_date,
-            AlertHistory.created_at <= end_date
-        ).all()
+        job = report_jobs.submit_report(current_user_id, report_type, _report_params(days))
         
-        # Calculate stats
-        by_type = {}
-        by_metric = {}
-        status_counts = {
-            'triggered': 0,
-            'acknowledged': 0,
-            'resolved': 0
-        }
+        return jsonify({'job': job.to_dict()}), 202
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+def _owned_job(job_id):
+    """Return (job, None) or (None, error response) for the current user"""
+    identity = current_identity()
+    current_user_id = identity.user_id
+    
+    job = report_jobs.get_job(job_id)
+    if not job or job.user_id != current_user_id:
+        return None, (jsonify({'error': 'Report job not found'}), 404)
+    return job, None
+
+
+@reports_bp.route('/jobs/<job_id>', methods=['GET'])
+@admin_or_owner
+def get_report_job(job_id):
+    """Poll the status of a report job"""
+    job, error = _owned_job(job_id)
+    if error:
+        return error
+    return jsonify({'job': job.to_dict()}), 200
+
+
+@reports_bp.route('/jobs/<job_id>/download', methods=['GET'])
+@admin_or_owner
+def download_report_job(job_id):
+    """Download the artifact of a finished report job"""
+    job, error = _owned_job(job_id)
+    if error:
+        return error
+    
+    if job.status != 'done':
+        return jsonify({'error': f'Report is {job.status}', 'job': job.to_dict()}), 409
+    
+    try:
+        return send_file(
+            job.path,
+            mimetype=report_jobs.report_mimetype(job),
+            as_attachment=True,
+            download_name=f'rapport-{job.report_type}-{job.created_at.strftime("%Y-%m-%d")}.{job.path.rsplit(".", 1)[-1]}'
+        )
+    except FileNotFoundError:
+        return jsonify({'error': 'Report expired, please generate it again'}), 410
+
+
+@reports_bp.route('/stats', methods=['GET'])
+@admin_or_owner
+def get_report_stats():
+    """Get alert statistics for a period"""
+    try:
+        days = request.args.get('days', 30, type=int)
+        identity = current_identity()
+        current_user_id = identity.user_id
         
-        for alert in alerts:
-            # By type
-            alert_type = alert.alert_type
-            by_type[alert_type] = by_type.get(alert_type, 0) + 1
+        def compute():
+            # Calculate date range
+            end_date = datetime.utcnow()
+            start_date = end_date - timedelta(days=days)
             
-            # By metric
-            metric = alert.metric
-            by_metric[metric] = by_metric.get(metric, 0) + 1
-            
-            # By status
-            if alert.status in status_counts:
-                status_counts[alert.status] += 1
+            # Alerts for user's sensors
+            owned_sensors = db.session.query(Sensor.id).filter(Sensor.user_id == current_user_id)
+            query = AlertHistory.query.filter(
+                AlertHistory.sensor_id.in_(owned_sensors),
+                AlertHistory.created_at >= start_date,
+                AlertHistory.created_at <= end_date
+            )
+            return summarize_alerts(query)
+        
+        stats = cached_stats(
+            ('report', current_user_id, days),
+            compute,
+            ttl=current_app.config.get('ALERT_STATS_CACHE_TTL', 30)
+        )
         
-        return jsonify({
-            'totalAlerts': len(alerts),
-            'triggered': status_counts['triggered'],
-            'acknowledged': status_counts['acknowledged'],
-            'resolved': status_counts['resolved'],
-            'byType': by_type,
-            'byMetric': by_metric
-        }), 200
+        return jsonify(stats), 200
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
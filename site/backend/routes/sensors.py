@@ -1,115 +1,180 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from database import db, Sensor, SensorReading, User
+from flask_jwt_extended import jwt_required
+from auth_context import current_identity, invalidate_sensor
+from sqlalchemy.orm import contains_eager
+from database import db, Sensor, SensorLatest
 from datetime import datetime
 from audit_logger import log_action
-from sensor_simulator import generate_current_simulated_reading
+from sensor_providers import SIMULATED, apply_latest
+from rollups import delete_rollups
+from heatmaps import delete_heatmap
+from correlations import delete_correlations
+from alert_state import forget_sensor
+from archive import delete_sensor_archive
+from anomaly_detection import forget_detector
+from forecasting import forget_forecaster
+import realtime
+import base64
+import json
 import logging
 
 sensors_bp = Blueprint('sensors', __name__)
 logger = logging.getLogger(__name__)
 
+# Sort key and direction for each `sort` value of the listing; the sensor id
+# breaks ties so keyset pagination is stable. Simulated sensors have no stored
+# reading, so with `co2` they are ranked on their computed value in Python
+# and merged with the SQL page (see get_sensors).
+LISTING_SORTS = {
+    'name': (Sensor.name, 'asc'),
+    'updated_at': (Sensor.updated_at, 'desc'),
+    'status': (Sensor.status, 'asc'),
+    'co2': (db.func.coalesce(SensorLatest.co2, -1.0), 'desc'),
+}
+
+
+def _encode_cursor(value, sensor_id):
+    """Opaque keyset cursor for the row (value, sensor_id)"""
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    payload = json.dumps([value, sensor_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('ascii')
+
+
+def _decode_cursor(cursor, sort_by):
+    """Inverse of _encode_cursor; raises ValueError on malformed cursors"""
+    try:
+        value, sensor_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except Exception:
+        raise ValueError('Invalid cursor')
+    if sort_by == 'updated_at' and value is not None:
+        value = datetime.fromisoformat(value)
+    return value, int(sensor_id)
+
+
 @sensors_bp.route('', methods=['GET'])
 @jwt_required()
 def get_sensors():
-    """Get all sensors for the current user with optional filtering and search"""
+    """
+    Get all sensors for the current user with optional filtering and search.
+    
+    Sensors and their latest readings come from one joined query. Supports
+    `sort=name|updated_at|status|co2` and keyset pagination: pass the
+    `next_cursor` of a page back as `cursor` to get the following page.
+    With `sort=co2`, simulated sensors are ranked on their current computed
+    value, which moves between requests.
+    """
     try:
-        current_user_id = get_jwt_identity()
-        
-        # Convert to int if string
-        if isinstance(current_user_id, str):
-            current_user_id = int(current_user_id)
-            
-        user = User.query.get(current_user_id)
-        
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
+        identity = current_identity()
+        current_user_id = identity.user_id
         
         # Get query parameters for filtering and search
         search = request.args.get('search', '').strip()
         status = request.args.get('status')  # 'en ligne', 'avertissement', 'offline'
         sensor_type = request.args.get('type')
         is_active = request.args.get('active')
-        sort_by = request.args.get('sort', 'name')  # 'name', 'updated_at', 'status'
+        sort_by = request.args.get('sort', 'name')  # 'name', 'updated_at', 'status', 'co2'
         limit = request.args.get('limit', 100, type=int)
+        cursor = request.args.get('cursor')
+        
+        if sort_by not in LISTING_SORTS:
+            sort_by = 'name'
+        sort_key, direction = LISTING_SORTS[sort_by]
+        
+        # One query: sensors joined with their latest reading
+        query = Sensor.query.outerjoin(Sensor.latest).options(contains_eager(Sensor.latest))
         
         # Admin can see all sensors, regular users only their own
-        if user.role == 'admin':
-            query = Sensor.query
-        else:
-            query = Sensor.query.filter_by(user_id=current_user_id)
+        if not identity.is_admin:
+            query = query.filter(Sensor.user_id == current_user_id)
         
         # Apply search filter
         if search:
             query = query.filter(
                 db.or_(
                     Sensor.name.ilike(f'%{search}%'),
-                    Sensor.location.ilike(f'%{search}%'),
-                    Sensor.external_id.ilike(f'%{search}%')
+                    Sensor.location.ilike(f'%{search}%')
                 )
             )
         
         # Apply status filter
         if status:
-            query = query.filter_by(status=status)
+            query = query.filter(Sensor.status == status)
         
         # Apply sensor type filter
         if sensor_type:
-            query = query.filter_by(sensor_type=sensor_type)
+            query = query.filter(Sensor.sensor_type == sensor_type)
         
         # Apply active status filter
         if is_active is not None:
             is_active_bool = is_active.lower() == 'true'
-            query = query.filter_by(is_active=is_active_bool)
+            query = query.filter(Sensor.is_live == is_active_bool)
+        
+        # Simulated sensors are virtual: their current reading is computed
+        # (in one vectorized call), never stored, so SQL cannot sort them on it
+        simulated_rows = []
+        if sort_by == 'co2':
+            simulated = query.filter(Sensor.sensor_type == 'simulation').all()
+            query = query.filter(Sensor.sensor_type != 'simulation')
+            computed = SIMULATED.latest_many(simulated)
+            simulated_rows = [
+                (sensor, computed[sensor.id]['co2'] if computed.get(sensor.id) else -1.0)
+                for sensor in simulated
+            ]
+        
+        # Resume after the last row of the previous page
+        if cursor:
+            try:
+                last_value, last_id = _decode_cursor(cursor, sort_by)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            row = db.tuple_(sort_key, Sensor.id)
+            bound = db.tuple_(db.literal(last_value), db.literal(last_id))
+            query = query.filter(row > bound if direction == 'asc' else row < bound)
+            simulated_rows = [
+                (sensor, value) for sensor, value in simulated_rows
+                if ((value, sensor.id) > (last_value, last_id) if direction == 'asc'
+                    else (value, sensor.id) < (last_value, last_id))
+            ]
         
         # Apply sorting
-        if sort_by == 'updated_at':
-            query = query.order_by(Sensor.updated_at.desc())
-        elif sort_by == 'status':
-            query = query.order_by(Sensor.status)
-        else:  # default: name
-            query = query.order_by(Sensor.name)
+        if direction == 'asc':
+            query = query.order_by(sort_key.asc(), Sensor.id.asc())
+        else:
+            query = query.order_by(sort_key.desc(), Sensor.id.desc())
+        
+        rows = query.add_columns(sort_key).limit(limit + 1).all()
+        if simulated_rows:
+            rows = sorted(
+                rows + simulated_rows,
+                key=lambda row: (row[1], row[0].id),
+                reverse=direction == 'desc'
+            )
+        has_more = len(rows) > limit
+        rows = rows[:limit]
         
-        sensors = query.limit(limit).all()
+        if sort_by == 'co2':
+            simulated_latest = computed
+        else:
+            simulated = [sensor for sensor, _ in rows if sensor.sensor_type == 'simulation']
+            simulated_latest = SIMULATED.latest_many(simulated)
         
-        # Include latest readings for each sensor (use stored readings for consistency)
         sensors_data = []
-        for sensor in sensors:
+        for sensor, _ in rows:
             sensor_dict = sensor.to_dict(include_latest_reading=True)
-            
-            # For simulated sensors, ensure we have a recent stored reading
-            if sensor.sensor_type == 'simulation':
-                latest_reading = SensorReading.query.filter_by(sensor_id=sensor.id).order_by(
-                    SensorReading.recorded_at.desc()
-                ).first()
-                
-                # If no reading exists or reading is stale (>5 seconds), generate and store fresh data
-                if not latest_reading or (datetime.utcnow() - latest_reading.recorded_at).total_seconds() > 5:
-                    simulated_data = generate_current_simulated_reading(sensor.name)
-                    
-                    # Store it in the database so all endpoints see the same data
-                    new_reading = SensorReading(
-                        sensor_id=sensor.id,
-                        co2=simulated_data['co2'],
-                        temperature=simulated_data['temperature'],
-                        humidity=simulated_data['humidity']
-                    )
-                    db.session.add(new_reading)
-                    db.session.commit()
-                    latest_reading = new_reading
-                
-                # Use the stored reading data
-                if latest_reading:
-                    sensor_dict['co2'] = latest_reading.co2
-                    sensor_dict['temperature'] = latest_reading.temperature
-                    sensor_dict['humidity'] = latest_reading.humidity
-                    sensor_dict['lastReading'] = latest_reading.recorded_at.isoformat()
-            
+            if sensor.id in simulated_latest:
+                apply_latest(sensor_dict, simulated_latest[sensor.id])
             sensors_data.append(sensor_dict)
         
+        next_cursor = None
+        if has_more:
+            last_sensor, last_value = rows[-1]
+            next_cursor = _encode_cursor(last_value, last_sensor.id)
+        
         return jsonify({
             'sensors': sensors_data,
             'count': len(sensors_data),
+            'next_cursor': next_cursor,
             'filters': {
                 'search': search,
                 'status': status,
@@ -120,6 +185,7 @@ def get_sensors():
         }), 200
         
     except Exception as e:
+        db.session.rollback()
         logger.error(f"Error fetching sensors: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
@@ -129,13 +195,7 @@ def get_sensors():
 def get_sensor(sensor_id):
     """Get a specific sensor by ID"""
     try:
-        current_user_id = get_jwt_identity()
-        
-        # Convert to int if string
-        if isinstance(current_user_id, str):
-            current_user_id = int(current_user_id)
-            
-        user = User.query.get(current_user_id)
+        identity = current_identity()
         
         sensor = Sensor.query.get(sensor_id)
         
@@ -143,24 +203,14 @@ def get_sensor(sensor_id):
             return jsonify({'error': 'Sensor not found'}), 404
         
         # Check ownership unless admin
-        if user.role != 'admin' and sensor.user_id != current_user_id:
+        if not identity.can_access(sensor.user_id):
             return jsonify({'error': 'Unauthorized access to this sensor'}), 403
         
         sensor_dict = sensor.to_dict(include_latest_reading=True)
         
-        # For simulated sensors, generate fresh data on-demand
+        # Simulated sensors report their computed current reading
         if sensor.sensor_type == 'simulation':
-            latest_reading = SensorReading.query.filter_by(sensor_id=sensor.id).order_by(
-                SensorReading.recorded_at.desc()
-            ).first()
-            
-            # If no reading exists or reading is stale (>1 minute old), generate fresh data
-            if not latest_reading or (datetime.utcnow() - latest_reading.recorded_at).total_seconds() > 60:
-                simulated_data = generate_current_simulated_reading(sensor.name)
-                sensor_dict['co2'] = simulated_data['co2']
-                sensor_dict['temperature'] = simulated_data['temperature']
-                sensor_dict['humidity'] = simulated_data['humidity']
-                sensor_dict['lastReading'] = datetime.utcnow().isoformat()
+            apply_latest(sensor_dict, SIMULATED.latest(sensor))
         
         return jsonify({'sensor': sensor_dict}), 200
         
@@ -173,11 +223,8 @@ def get_sensor(sensor_id):
 def create_sensor():
     """Create a new sensor"""
     try:
-        current_user_id = get_jwt_identity()
-        
-        # Convert to int if string
-        if isinstance(current_user_id, str):
-            current_user_id = int(current_user_id)
+        identity = current_identity()
+        current_user_id = identity.user_id
             
         data = request.get_json()
         
@@ -224,13 +271,8 @@ def create_sensor():
 def update_sensor(sensor_id):
     """Update a sensor"""
     try:
-        current_user_id = get_jwt_identity()
-        
-        # Convert to int if string
-        if isinstance(current_user_id, str):
-            current_user_id = int(current_user_id)
-            
-        user = User.query.get(current_user_id)
+        identity = current_identity()
+        current_user_id = identity.user_id
         
         sensor = Sensor.query.get(sensor_id)
         
@@ -238,7 +280,7 @@ def update_sensor(sensor_id):
             return jsonify({'error': 'Sensor not found'}), 404
         
         # Check ownership unless admin
-        if user.role != 'admin' and sensor.user_id != current_user_id:
+        if not identity.can_access(sensor.user_id):
             return jsonify({'error': 'Unauthorized access to this sensor'}), 403
         
         data = request.get_json()
@@ -262,6 +304,7 @@ def update_sensor(sensor_id):
         log_action(current_user_id, 'UPDATE', 'SENSOR', resource_id=sensor_id, details=data)
         
         db.session.commit()
+        invalidate_sensor(sensor_id)
         
         return jsonify({
             'message': 'Sensor updated successfully',
@@ -279,13 +322,8 @@ def update_sensor(sensor_id):
 def delete_sensor(sensor_id):
     """Delete a sensor"""
     try:
-        current_user_id = get_jwt_identity()
-        
-        # Convert to int if string
-        if isinstance(current_user_id, str):
-            current_user_id = int(current_user_id)
-            
-        user = User.query.get(current_user_id)
+        identity = current_identity()
+        current_user_id = identity.user_id
         
         sensor = Sensor.query.get(sensor_id)
         
@@ -293,7 +331,7 @@ def delete_sensor(sensor_id):
             return jsonify({'error': 'Sensor not found'}), 404
         
         # Check ownership unless admin
-        if user.role != 'admin' and sensor.user_id != current_user_id:
+        if not identity.can_access(sensor.user_id):
             return jsonify({'error': 'Unauthorized access to this sensor'}), 403
         
         # Log the action before deletion
@@ -302,8 +340,17 @@ def delete_sensor(sensor_id):
             'location': sensor.location
         })
         
+        delete_rollups(sensor_id)
+        delete_heatmap(sensor_id)
+        delete_correlations(sensor_id)
         db.session.delete(sensor)
         db.session.commit()
+        forget_sensor(sensor_id)
+        invalidate_sensor(sensor_id)
+        realtime.drop_sensor(sensor_id)
+        delete_sensor_archive(sensor_id)
+        forget_detector(sensor_id)
+        forget_forecaster(sensor_id)
         
         return jsonify({'message': 'Sensor deleted successfully'}), 200
         
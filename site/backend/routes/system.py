@@ -0,0 +1,77 @@
+"""
+System endpoints: request latency, SQL and cache statistics
+"""
+from flask import Blueprint, jsonify, current_app
+from flask_jwt_extended import jwt_required
+from auth_context import current_identity
+from metrics import performance_summary
+from db_engine import engine_stats
+from audit_logger import audit_queue_stats
+from sensor_simulator import simulation_cache_stats
+from anomaly_detection import anomaly_cache_stats
+from forecasting import forecast_cache_stats
+from archive import archive_stats
+
+system_bp = Blueprint('system', __name__)
+
+
+def cache_stats():
+    """Statistics of the in-process caches and queues"""
+    return {
+        'audit_queue': audit_queue_stats(),
+        'simulation_cache': simulation_cache_stats(),
+        'anomaly_detection': anomaly_cache_stats(),
+        'forecasting': forecast_cache_stats(),
+        'archive': archive_stats(),
+        'database': engine_stats()
+    }
+
+
+def _checked_out(engine):
+    """Connections checked out of an engine's pool (0 for pools without a count)"""
+    checkedout = getattr(engine.pool, 'checkedout', None)
+    return checkedout() if checkedout else 0
+
+
+def metric_gauges():
+    """Cache and pool gauges exposed on /metrics next to the request metrics"""
+    audit = audit_queue_stats()
+    simulation = simulation_cache_stats()
+    gauges = {
+        'aerium_audit_queue_depth': ('Audit entries waiting to be written', audit['depth']),
+        'aerium_simulation_cache_buckets': ('Simulated days held in cache', simulation['size']),
+        'aerium_anomaly_detectors': ('Sensors with a cached anomaly detector', anomaly_cache_stats()['detectors']),
+        'aerium_forecast_models': ('Sensors with a cached forecast model', forecast_cache_stats()['models']),
+        'aerium_db_pool_checked_out': (
+            'Connections checked out of the primary pool',
+            _checked_out(current_app.extensions['sqlalchemy'].engine)
+        )
+    }
+    read_engine = current_app.extensions.get('db_read_engine')
+    if read_engine is not None:
+        gauges['aerium_db_read_pool_checked_out'] = (
+            'Connections checked out of the read-only pool', _checked_out(read_engine)
+        )
+    return gauges
+
+
+@system_bp.route('/performance', methods=['GET'])
+@jwt_required()
+def get_performance():
+    """
+    Latency, status codes and SQL usage per route since startup, with the
+    state of the caches (admin only). The same counters are exposed in
+    Prometheus format at /metrics (see metrics.py).
+    """
+    try:
+        if not current_identity().is_admin:
+            return jsonify({'error': 'Unauthorized - Admin access required'}), 403
+
+        return jsonify({
+            'success': True,
+            'performance': performance_summary(),
+            'caches': cache_stats()
+        }), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -1,5 +1,6 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required
+from auth_context import current_identity
 from database import db, User
 import bcrypt
 
@@ -10,13 +11,7 @@ users_bp = Blueprint('users', __name__)
 def get_profile():
     """Get current user profile"""
     try:
-        current_user_id = get_jwt_identity()
-        
-        # Convert to int if string
-        if isinstance(current_user_id, str):
-            current_user_id = int(current_user_id)
-            
-        user = User.query.get(current_user_id)
+        user = current_identity().user
         
         if not user:
             return jsonify({'error': 'User not found'}), 404
@@ -32,13 +27,7 @@ def get_profile():
 def update_profile():
     """Update current user profile"""
     try:
-        current_user_id = get_jwt_identity()
-        
-        # Convert to int if string
-        if isinstance(current_user_id, str):
-            current_user_id = int(current_user_id)
-            
-        user = User.query.get(current_user_id)
+        user = current_identity().user
         
         if not user:
             return jsonify({'error': 'User not found'}), 404
@@ -67,13 +56,7 @@ def update_profile():
 def change_password():
     """Change user password"""
     try:
-        current_user_id = get_jwt_identity()
-        
-        # Convert to int if string
-        if isinstance(current_user_id, str):
-            current_user_id = int(current_user_id)
-            
-        user = User.query.get(current_user_id)
+        user = current_identity().user
         
         if not user:
             return jsonify({'error': 'User not found'}), 404
@@ -107,15 +90,7 @@ def change_password():
 def get_all_users():
     """Get all users (admin only)"""
     try:
-        current_user_id = get_jwt_identity()
-        
-        # Convert to int if string
-        if isinstance(current_user_id, str):
-            current_user_id = int(current_user_id)
-            
-        user = User.query.get(current_user_id)
-        
-        if not user or user.role != 'admin':
+        if not current_identity().is_admin:
             return jsonify({'error': 'Unauthorized - Admin access required'}), 403
         
         users = User.query.all()
@@ -0,0 +1,142 @@
+"""
+Visualization endpoints: data shaped for dashboard charts
+"""
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required
+from auth_context import current_identity, sensor_ref
+from database import db, Sensor
+from sensor_providers import METRICS
+from heatmaps import load_cells, combine_cells
+from correlations import load_statistics, empty_statistics, correlation_matrix, correlation_pairs
+
+visualization_bp = Blueprint('visualization', __name__)
+
+
+def _visible_sensors(identity, sensor_id=None):
+    """
+    Sensors (id, sensor_type, name, location) the caller may chart: one
+    sensor when `sensor_id` is given, otherwise all of theirs (every sensor
+    for admins).
+
+    Returns:
+        Tuple of (list of rows, error response or None)
+    """
+    query = db.session.query(Sensor.id, Sensor.sensor_type, Sensor.name, Sensor.location)
+    if sensor_id is not None:
+        sensor = sensor_ref(sensor_id)
+        if not sensor:
+            return [], (jsonify({'error': 'Sensor not found'}), 404)
+        if not identity.can_access(sensor.user_id):
+            return [], (jsonify({'error': 'Unauthorized access to this sensor'}), 403)
+        query = query.filter(Sensor.id == sensor_id)
+    elif not identity.is_admin:
+        query = query.filter(Sensor.user_id == identity.user_id)
+    return query.order_by(Sensor.id).all(), None
+
+
+@visualization_bp.route('/heatmap', methods=['GET'])
+@jwt_required()
+def get_heatmap():
+    """
+    Average of a metric per hour of the week (UTC), as `heatmap[hour][day]`
+    (24 x 7, Monday first), with the max and reading count of every cell.
+
+    Served from the per-sensor accumulators kept up to date on ingest
+    (see heatmaps.py): at most 168 rows per sensor, whatever the history.
+
+    Query params:
+        metric: co2 (default), temperature or humidity
+        sensor_id: Restrict to one sensor
+        group_by: 'location' adds one heatmap per location under `groups`
+    """
+    try:
+        identity = current_identity()
+        metric = request.args.get('metric', 'co2')
+        group_by = request.args.get('group_by')
+        sensor_id = request.args.get('sensor_id', type=int)
+
+        if metric not in METRICS:
+            return jsonify({'error': f'Invalid metric: {metric}'}), 400
+        if group_by not in (None, 'location'):
+            return jsonify({'error': f'Invalid group_by: {group_by}'}), 400
+
+        sensors, error = _visible_sensors(identity, sensor_id)
+        if error:
+            return error
+
+        cells = load_cells(sensors)
+        result = {
+            'success': True,
+            'metric': metric,
+            'sensors': len(sensors),
+            **combine_cells(cells.values(), metric)
+        }
+
+        if group_by == 'location':
+            locations = {}
+            for sensor in sensors:
+                locations.setdefault(sensor.location, []).append(sensor.id)
+            result['groups'] = [
+                {
+                    'location': location,
+                    'sensor_ids': [str(sensor_id) for sensor_id in sensor_ids],
+                    **combine_cells([cells[sensor_id] for sensor_id in sensor_ids], metric)
+                }
+                for location, sensor_ids in sorted(locations.items())
+            ]
+
+        return jsonify(result), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@visualization_bp.route('/correlation', methods=['GET'])
+@jwt_required()
+def get_correlation():
+    """
+    Pearson correlations between co2, temperature and humidity over the
+    last `days` UTC days (today included), pooled over the caller's sensors.
+
+    Assembled from the daily sufficient statistics kept up to date on
+    ingest (see correlations.py), without reading raw readings.
+
+    Query params:
+        days: Window length in days (default 30)
+        sensor_id: Restrict to one sensor
+    """
+    try:
+        identity = current_identity()
+        days = request.args.get('days', 30, type=int)
+        sensor_id = request.args.get('sensor_id', type=int)
+
+        if not 1 <= days <= 366:
+            return jsonify({'error': 'days must be between 1 and 366'}), 400
+
+        sensors, error = _visible_sensors(identity, sensor_id)
+        if error:
+            return error
+
+        statistics = load_statistics(sensors, days)
+        total = sum(statistics.values(), empty_statistics())
+        matrix = correlation_matrix(total)
+
+        return jsonify({
+            'success': True,
+            'days': days,
+            'variables': list(METRICS),
+            'matrix': matrix,
+            'correlations': correlation_pairs(matrix, total[0]),
+            'samples': int(total[0]),
+            'sensors': {
+                str(sensor.id): {
+                    'name': sensor.name,
+                    'matrix': correlation_matrix(statistics[sensor.id]),
+                    'samples': int(statistics[sensor.id][0])
+                }
+                for sensor in sensors
+            }
+        }), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
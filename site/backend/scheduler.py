@@ -1,5 +1,8 @@
 from apscheduler.schedulers.background import BackgroundScheduler
 from database import db, Sensor, SensorReading, Alert
+from report_jobs import evict_expired_reports
+from retention import run_retention
+from forecasting import refit_forecasts
 from datetime import datetime
 import random
 
@@ -113,5 +116,39 @@ def init_scheduler(app, socketio):
     # If you need real-time WebSocket updates for simulated sensors, 
     # implement a separate mechanism that generates data only when clients are connected
     
+    # Drop expired report artifacts
+    scheduler.add_job(
+        evict_expired_reports,
+        'interval',
+        minutes=10,
+        id='evict_expired_reports',
+        replace_existing=True
+    )
+    
+    # Purge rows past their retention and release the freed pages
+    if app.config.get('RETENTION_ENABLED', False):
+        scheduler.add_job(
+            run_retention,
+            'interval',
+            hours=app.config.get('RETENTION_INTERVAL_HOURS', 6),
+            args=[app],
+            id='run_retention',
+            max_instances=1,
+            coalesce=True,
+            replace_existing=True
+        )
+    
+    # Refit the forecast models (requests only evaluate cached parameters)
+    scheduler.add_job(
+        refit_forecasts,
+        'interval',
+        minutes=app.config.get('FORECAST_REFIT_MINUTES', 60),
+        args=[app],
+        id='refit_forecasts',
+        max_instances=1,
+        coalesce=True,
+        replace_existing=True
+    )
+    
     scheduler.start()
     print("Scheduler initialized - Simulated sensors now use on-demand generation from API endpoints")
@@ -0,0 +1,208 @@
+"""
+Reading providers: where the latest reading and the history of a sensor
+come from, depending on its type.
+
+Real sensors are answered from stored rows (`sensor_latest`, `sensor_readings`,
+the rollup tables and the Parquet archive). Simulated sensors are virtual:
+their readings are computed by `sensor_simulator` on request, served from its
+cache of generated days, and never written to the database.
+
+Providers accept anything with `id`, `name` and `sensor_type` (a Sensor or an
+auth_context.SensorRef).
+"""
+from database import db, SensorReading, SensorLatest, ROLLUP_MODELS
+from sensor_simulator import simulate_series, series_readings, SIMULATION_STEP_SECONDS
+from archive import archived_until, archived_reading_dicts
+from datetime import datetime, timedelta
+import numpy as np
+import rollups
+
+# Resolution of the "current" reading of simulated sensors
+LATEST_STEP_SECONDS = 60
+
+# Column order of the value arrays returned by `arrays`
+METRICS = ('co2', 'temperature', 'humidity')
+
+
+class StoredReadingsProvider:
+    """Readings of real sensors, from the database"""
+
+    def latest(self, sensor):
+        """Latest reading as a dict, or None"""
+        latest = SensorLatest.query.get(sensor.id)
+        return latest.to_dict() if latest else None
+
+    def latest_many(self, sensors):
+        return {sensor.id: self.latest(sensor) for sensor in sensors}
+
+    def history(self, sensor, hours, limit, resolution='auto'):
+        """
+        Readings of the past `hours`, most recent first, and the resolution
+        used. With `auto`, the finest rollup whose buckets over the window
+        fit in `limit` points is used, so the whole window is returned.
+
+        Raises:
+            ValueError: Unknown resolution
+        """
+        start_time = datetime.utcnow() - timedelta(hours=hours)
+
+        if resolution == 'auto':
+            resolution = rollups.pick_resolution(hours, limit)
+        elif resolution != 'raw' and resolution not in ROLLUP_MODELS:
+            raise ValueError(f'Invalid resolution: {resolution}')
+
+        if resolution != 'raw':
+            readings = [
+                reading.to_dict()
+                for reading in rollups.get_rollup_readings(sensor.id, resolution, start_time, limit)
+            ]
+            # Buckets have no row id; number them like simulated readings
+            for index, reading in enumerate(readings):
+                reading['id'] = index
+            return readings, resolution
+
+        # Raw readings older than the archive boundary come from Parquet
+        boundary = archived_until()
+        hot_start = max(start_time, boundary) if boundary else start_time
+        readings = SensorReading.query.filter(
+            SensorReading.sensor_id == sensor.id,
+            SensorReading.recorded_at >= hot_start
+        ).order_by(SensorReading.recorded_at.desc()).limit(limit).all()
+        readings = [reading.to_dict() for reading in readings]
+        if boundary and start_time < boundary and len(readings) < limit:
+            readings += archived_reading_dicts(sensor.id, start_time, limit - len(readings))
+        return readings, resolution
+
+    def arrays(self, sensor, start, end):
+        """
+        Raw readings recorded in (start, end] as NumPy arrays, in one query.
+
+        Returns:
+            Tuple of (recorded_at as datetime64[us], shape (n,), values,
+            shape (n, 3) with columns co2, temperature, humidity), oldest first
+        """
+        rows = db.session.query(
+            SensorReading.recorded_at,
+            SensorReading.co2,
+            SensorReading.temperature,
+            SensorReading.humidity
+        ).filter(
+            SensorReading.sensor_id == sensor.id,
+            SensorReading.recorded_at > start,
+            SensorReading.recorded_at <= end
+        ).order_by(SensorReading.recorded_at).all()
+        if not rows:
+            return np.empty(0, dtype='datetime64[us]'), np.empty((0, 3))
+        recorded_at = np.array([row[0] for row in rows], dtype='datetime64[us]')
+        values = np.array([row[1:] for row in rows], dtype=float)
+        return recorded_at, values
+
+    def hourly_arrays(self, sensor, start, end):
+        """
+        Hourly means of the buckets starting in [start, end), from the 1h
+        rollup table (kept after raw readings are purged).
+
+        Returns:
+            Tuple of (bucket starts as datetime64[h], shape (n,), means,
+            shape (n, 3) with columns co2, temperature, humidity), oldest first
+        """
+        model = ROLLUP_MODELS['1h']
+        rows = db.session.query(
+            model.bucket_start,
+            model.count,
+            model.co2_sum,
+            model.temperature_sum,
+            model.humidity_sum
+        ).filter(
+            model.sensor_id == sensor.id,
+            model.bucket_start >= start,
+            model.bucket_start < end,
+            model.count > 0
+        ).order_by(model.bucket_start).all()
+        if not rows:
+            return np.empty(0, dtype='datetime64[h]'), np.empty((0, 3))
+        hours = np.array([row[0] for row in rows], dtype='datetime64[h]')
+        sums = np.array([row[2:] for row in rows], dtype=float)
+        counts = np.array([row[1] for row in rows], dtype=float)
+        return hours, sums / counts[:, None]
+
+
+class SimulatedReadingsProvider:
+    """Readings of simulated sensors, computed on request (read-only)"""
+
+    def latest(self, sensor):
+        return self.latest_many([sensor])[sensor.id]
+
+    def latest_many(self, sensors):
+        """Current reading of several simulated sensors in one vectorized call"""
+        sensors = list(sensors)
+        if not sensors:
+            return {}
+        series = simulate_series(
+            [sensor.name for sensor in sensors],
+            hours=LATEST_STEP_SECONDS / 3600,
+            limit=1,
+            step_seconds=LATEST_STEP_SECONDS
+        )
+        recorded_at = np.datetime_as_string(series['recorded_at'][-1], unit='s')
+        return {
+            sensor.id: {
+                'id': None,
+                'sensor_id': sensor.id,
+                'co2': series['co2'][row, -1].item(),
+                'temperature': series['temperature'][row, -1].item(),
+                'humidity': series['humidity'][row, -1].item(),
+                'recorded_at': str(recorded_at)
+            }
+            for row, sensor in enumerate(sensors)
+        }
+
+    def history(self, sensor, hours, limit, resolution=None):
+        """
+        Simulated readings of the past `hours` (every 30 minutes), most recent
+        first like StoredReadingsProvider.history
+        """
+        readings = series_readings(simulate_series([sensor.name], hours=hours, limit=limit))[::-1]
+        for index, reading in enumerate(readings):
+            reading['id'] = index
+            reading['sensor_id'] = sensor.id
+        return readings, 'simulated'
+
+    def arrays(self, sensor, start, end):
+        """Simulated grid points in (start, end], same format as StoredReadingsProvider.arrays"""
+        # One extra step so short windows still hold a grid point
+        hours = ((end - start).total_seconds() + SIMULATION_STEP_SECONDS) / 3600
+        series = simulate_series([sensor.name], hours=hours, end=end)
+        recorded_at = series['recorded_at'].astype('datetime64[us]')
+        values = np.column_stack([series[metric][0] for metric in METRICS]).astype(float)
+        keep = recorded_at > np.datetime64(start, 'us')
+        return recorded_at[keep], values[keep]
+
+    def hourly_arrays(self, sensor, start, end):
+        """Hourly means of the simulated grid, same format as StoredReadingsProvider.hourly_arrays"""
+        recorded_at, values = self.arrays(sensor, start - timedelta(microseconds=1), end)
+        keep = recorded_at < np.datetime64(end, 'us')
+        recorded_at, values = recorded_at[keep], values[keep]
+        hours, index = np.unique(recorded_at.astype('datetime64[h]'), return_inverse=True)
+        sums = np.zeros((len(hours), values.shape[1]))
+        np.add.at(sums, index, values)
+        return hours, sums / np.bincount(index, minlength=len(hours))[:, None]
+
+
+STORED = StoredReadingsProvider()
+SIMULATED = SimulatedReadingsProvider()
+
+
+def readings_provider(sensor):
+    """Provider answering reading queries for this sensor"""
+    return SIMULATED if sensor.sensor_type == 'simulation' else STORED
+
+
+def apply_latest(sensor_dict, reading):
+    """Overlay a latest reading onto a Sensor.to_dict() result"""
+    if reading:
+        sensor_dict['co2'] = reading['co2']
+        sensor_dict['temperature'] = reading['temperature']
+        sensor_dict['humidity'] = reading['humidity']
+        sensor_dict['lastReading'] = reading['recorded_at']
+    return sensor_dict
@@ -1,10 +1,19 @@
 """
 On-demand sensor simulation module
 Generates realistic sensor data when requested, rather than continuously in background
+
+Simulated history is deterministic: points sit on a fixed time grid and the
+random draws of each (sensor, day bucket, resolution) come from a generator
+seeded with that key, so any past window is reproducible. Generated buckets
+are kept in a small LRU cache (see `simulation_cache_stats`).
 """
 
+from collections import OrderedDict
 from datetime import datetime, timedelta
+import numpy as np
 import random
+import threading
+import zlib
 
 # Sensor profiles with realistic base values
 SENSOR_PROFILES = {
@@ -120,35 +129,190 @@ def generate_current_simulated_reading(sensor_name):
     }
 
 
-def generate_historical_simulated_readings(sensor_name, hours=24):
-    """Generate historical simulated readings for the past N hours"""
+# Hourly offsets used by the vectorized generator (same values as the
+# per-reading functions above)
+OFFICE_CO2_OFFSETS = np.array([
+    -200, -220, -230, -240, -230, -200, -150, -50, 100, 200, 250, 280,
+    250, 280, 300, 280, 250, 150, 50, -50, -100, -150, -180, -190
+])
+MEETING_CO2_OFFSETS = np.zeros(24, dtype=int)
+MEETING_CO2_OFFSETS[[9, 10, 11, 14, 15, 16]] = [300, 400, 350, 400, 350, 300]
+CAFETERIA_CO2_OFFSETS = np.full(24, -100)
+CAFETERIA_CO2_OFFSETS[[8, 9, 12, 13, 17, 18]] = [150, 100, 350, 300, 200, 150]
+DAILY_TEMP_OFFSETS = np.array([
+    -0.5, -0.6, -0.7, -0.7, -0.6, -0.5, -0.3, 0.0, 0.3, 0.5, 0.7, 0.8,
+    0.8, 0.9, 1.0, 0.9, 0.7, 0.5, 0.3, 0.0, -0.2, -0.3, -0.4, -0.5
+])
+
+# Default spacing of simulated history points, in seconds
+SIMULATION_STEP_SECONDS = 1800
+
+# Points are generated (and cached) one day bucket at a time
+BUCKET_SECONDS = 86400
+CACHE_MAX_BUCKETS = 2048
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+_cache_stats = {'hits': 0, 'misses': 0}
+
+
+def _co2_offsets(sensor_name):
+    """Hourly CO2 offsets of a sensor, or None for the server room (random)"""
+    if 'Salle de Réunion' in sensor_name:
+        return MEETING_CO2_OFFSETS
+    if 'Cafétéria' in sensor_name:
+        return CAFETERIA_CO2_OFFSETS
+    if 'Serveur' in sensor_name:
+        return None
+    return OFFICE_CO2_OFFSETS
+
+
+def _bucket_rng(sensor_name, bucket, step_seconds):
+    """Generator seeded by (sensor, bucket, resolution), stable across processes"""
+    return np.random.default_rng([zlib.crc32(sensor_name.encode('utf-8')), bucket, step_seconds])
+
+
+def _generate_bucket(sensor_name, bucket, step_seconds):
+    """
+    Generate every point of one day bucket of a sensor.
+    
+    Returns:
+        Dictionary of read-only arrays: 'epoch' (seconds), 'co2',
+        'temperature' and 'humidity'
+    """
+    rng = _bucket_rng(sensor_name, bucket, step_seconds)
     profile = get_sensor_profile(sensor_name)
-    readings = []
-    
-    now = datetime.utcnow()
-    
-    # Generate readings for the last N hours (every 30 minutes = 2 readings per hour)
-    num_readings = hours * 2
-    
-    for i in range(num_readings):
-        time_offset = timedelta(minutes=30 * i)
-        reading_time = now - timedelta(hours=hours) + time_offset
-        hour = reading_time.hour
-        
-        co2 = generate_co2_pattern(
-            hour,
-            profile['base_co2'],
-            profile['occupancy_factor'],
-            sensor_name
+    epoch = bucket * BUCKET_SECONDS + step_seconds * np.arange(BUCKET_SECONDS // step_seconds)
+    hour = (epoch // 3600) % 24
+    count = len(epoch)
+    server = 'Serveur' in sensor_name
+    
+    # CO2: hourly pattern scaled by occupancy, plus ±50 ppm, clamped
+    pattern = _co2_offsets(sensor_name)
+    offsets = pattern[hour] if pattern is not None else rng.integers(-20, 21, count)
+    co2 = profile['base_co2'] + np.trunc(offsets * profile['occupancy_factor']) + rng.integers(-50, 51, count)
+    co2 = np.clip(co2, 400, 1500).astype(int)
+    
+    # Temperature: daily pattern (server room: stable), rounded to 0.1
+    noise = rng.random(count) - 0.5
+    if server:
+        temperature = profile['base_temp'] + noise * 0.3
+    else:
+        temperature = profile['base_temp'] + DAILY_TEMP_OFFSETS[hour] + noise * 0.4
+    temperature = np.round(temperature * 10) / 10
+    
+    # Humidity: ±5% (server room: ±1%), rounded and clamped
+    noise = rng.random(count) - 0.5
+    humidity = profile['base_humidity'] + noise * (2 if server else 10)
+    humidity = np.clip(np.round(humidity), 30, 70).astype(int)
+    
+    columns = {'epoch': epoch, 'co2': co2, 'temperature': temperature, 'humidity': humidity}
+    for column in columns.values():
+        column.setflags(write=False)
+    return columns
+
+
+def _bucket(sensor_name, bucket, step_seconds):
+    """Cached _generate_bucket, keyed by (sensor name, bucket, resolution)"""
+    key = (sensor_name, bucket, step_seconds)
+    with _cache_lock:
+        columns = _cache.get(key)
+        if columns is not None:
+            _cache.move_to_end(key)
+            _cache_stats['hits'] += 1
+            return columns
+        _cache_stats['misses'] += 1
+    
+    columns = _generate_bucket(sensor_name, bucket, step_seconds)
+    
+    with _cache_lock:
+        _cache[key] = columns
+        while len(_cache) > CACHE_MAX_BUCKETS:
+            _cache.popitem(last=False)
+    return columns
+
+
+def simulation_cache_stats():
+    """Hit/miss counters and size of the simulated bucket cache"""
+    with _cache_lock:
+        return {**_cache_stats, 'size': len(_cache), 'max_size': CACHE_MAX_BUCKETS}
+
+
+def simulate_series(sensor_names, hours=24, limit=None, end=None, step_seconds=SIMULATION_STEP_SECONDS):
+    """
+    Generate simulated readings for several sensors at once as columns.
+    
+    Points sit on a grid of `step_seconds` (in UTC epoch time); the window
+    holds the grid points of the past `hours` up to `end`. The same window
+    always yields the same values. When `limit` is given only the last
+    `limit` points are materialized.
+    
+    Args:
+        sensor_names: Names of the simulated sensors (select their profile)
+        hours: Length of the window
+        limit: Only return the most recent `limit` points
+        end: End of the window (default: now, UTC)
+        step_seconds: Resolution; must divide a day
+    
+    Returns:
+        Dictionary with 'recorded_at' (datetime64 array, one per point) and
+        'co2', 'temperature', 'humidity' arrays of shape (sensors, points)
+    """
+    end = end or datetime.utcnow()
+    end_epoch = int((end - datetime(1970, 1, 1)).total_seconds())
+    total = int(hours * 3600 // step_seconds)
+    count = total if limit is None else max(0, min(limit, total))
+    per_bucket = BUCKET_SECONDS // step_seconds
+    
+    if count <= 0:
+        series = {'recorded_at': np.empty(0, dtype='datetime64[s]')}
+        for metric in ('co2', 'temperature', 'humidity'):
+            series[metric] = np.empty((len(sensor_names), 0))
+        return series
+    
+    # Global grid indices of the requested points
+    last = end_epoch // step_seconds
+    first = last - count + 1
+    first_bucket, last_bucket = first // per_bucket, last // per_bucket
+    offset = first - first_bucket * per_bucket
+    
+    columns = {'co2': [], 'temperature': [], 'humidity': []}
+    epoch = None
+    for name in sensor_names:
+        buckets = [_bucket(name, bucket, step_seconds) for bucket in range(first_bucket, last_bucket + 1)]
+        for metric, rows in columns.items():
+            rows.append(np.concatenate([bucket[metric] for bucket in buckets])[offset:offset + count])
+        if epoch is None:
+            epoch = np.concatenate([bucket['epoch'] for bucket in buckets])[offset:offset + count]
+    
+    if epoch is None:
+        epoch = step_seconds * np.arange(first, last + 1)
+    
+    series = {'recorded_at': epoch.astype('datetime64[s]')}
+    for metric, rows in columns.items():
+        series[metric] = np.vstack(rows) if rows else np.empty((0, count))
+    return series
+
+
+def series_readings(series, row=0):
+    """Materialize one sensor of a simulate_series result as reading dicts"""
+    timestamps = np.datetime_as_string(series['recorded_at'], unit='s')
+    return [
+        {'co2': co2, 'temperature': temperature, 'humidity': humidity, 'recorded_at': recorded_at}
+        for co2, temperature, humidity, recorded_at in zip(
+            series['co2'][row].tolist(),
+            series['temperature'][row].tolist(),
+            series['humidity'][row].tolist(),
+            timestamps.tolist()
         )
-        temp = generate_temperature(profile['base_temp'], hour, sensor_name)
-        humidity = generate_humidity(profile['base_humidity'], hour, sensor_name)
-        
-        readings.append({
-            'co2': co2,
-            'temperature': temp,
-            'humidity': humidity,
-            'recorded_at': reading_time.isoformat()
-        })
-    
-    return readings
+    ]
+
+
+def generate_historical_simulated_readings(sensor_name, hours=24, limit=None):
+    """
+    Generate historical simulated readings for the past N hours (every 30
+    minutes), oldest first. The values are reproducible: the same sensor and
+    time always give the same reading. With `limit`, only the most recent
+    `limit` readings are materialized.
+    """
+    return series_readings(simulate_series([sensor_name], hours=hours, limit=limit))
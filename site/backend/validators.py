@@ -1,7 +1,7 @@
 """
 Data validation utilities for API requests
 """
-from marshmallow import Schema, fields, ValidationError, validate
+from marshmallow import Schema, fields, ValidationError, validate, pre_load, EXCLUDE
 import logging
 
 logger = logging.getLogger(__name__)
@@ -24,6 +24,26 @@ class ReadingSchema(Schema):
     timestamp = fields.DateTime()
 
 
+class BatchReadingSchema(Schema):
+    """Schema for one item of a batch reading upload"""
+    class Meta:
+        unknown = EXCLUDE
+
+    sensor_id = fields.Int(required=True)
+    co2 = fields.Float(required=True, validate=validate.Range(min=0, max=5000))
+    temperature = fields.Float(required=True, validate=validate.Range(min=-50, max=100))
+    humidity = fields.Float(required=True, validate=validate.Range(min=0, max=100))
+    recorded_at = fields.DateTime()
+
+    @pre_load
+    def accept_timestamp_alias(self, data, **kwargs):
+        """Accept ReadingSchema's `timestamp` key as an alias of `recorded_at`"""
+        if isinstance(data, dict) and 'recorded_at' not in data and 'timestamp' in data:
+            data = dict(data)
+            data['recorded_at'] = data.pop('timestamp')
+        return data
+
+
 class AlertSchema(Schema):
     """Schema for alert validation"""
     sensor_id = fields.Int(required=True)
@@ -91,5 +111,6 @@ def validate_query_params(params, allowed_params):
 
 sensor_schema = SensorSchema()
 reading_schema = ReadingSchema()
+batch_reading_schema = BatchReadingSchema()
 alert_schema = AlertSchema()
 user_schema = UserSchema()
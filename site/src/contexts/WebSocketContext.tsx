@@ -17,6 +17,8 @@ export const WebSocketProvider = ({ children }: { children: ReactNode }) => {
 
     const newSocket = io(SOCKET_URL, {
       transports: ['websocket', 'polling'],
+      // Read on every (re)connection so a login is picked up
+      auth: (cb) => cb({ token: localStorage.getItem('access_token') }),
       reconnection: true,
       reconnectionDelay: 500,
       reconnectionDelayMax: 3000,
@@ -87,7 +87,7 @@ const Dashboard = () => {
       try {
         await Promise.all(sensors.map(async (sensor) => {
           try {
-            const data = await apiClient.getSensorReadings(sensor.id.toString(), 1, 20);
+            const data = await apiClient.getSensorReadings(sensor.id.toString(), 1, 60);
             readings[sensor.id] = data.map((r: any) => r.co2).reverse();
           } catch (error) {
             console.error(`Error fetching readings for sensor ${sensor.id}:`, error);
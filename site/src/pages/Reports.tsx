@@ -46,10 +46,24 @@ const Reports = () => {
 
   const handleExportPDF = async () => {
     try {
-      const response = await apiClient.get('/reports/export/pdf', {
+      let response = await apiClient.get('/reports/export/pdf', {
         responseType: 'blob',
         params: { days: selectedDays }
       });
+
+      // Still rendering: poll the report job, then download its file
+      if (response.status === 202) {
+        let { job } = JSON.parse(await response.data.text());
+        while (job.status === 'queued' || job.status === 'running') {
+          await new Promise(resolve => setTimeout(resolve, 1000));
+          job = (await apiClient.get(`/reports/jobs/${job.id}`)).data.job;
+        }
+        if (job.status !== 'done') {
+          throw new Error(job.error || 'Report generation failed');
+        }
+        response = await apiClient.get(`/reports/jobs/${job.id}/download`, { responseType: 'blob' });
+      }
+
       const url = window.URL.createObjectURL(new Blob([response.data]));
       const link = document.createElement('a');
       link.href = url;
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Test anomaly detection via HTTP requests
+Tests: a CO2 spike is flagged by the rolling z-score, new readings are
+scored on later calls, per-sensor model summary, parameter validation
+
+Run against a server started with rate limiting off:
+    ENABLE_RATE_LIMITING=False RATELIMIT_DEFAULT=10000/minute python site/backend/app.py
+"""
+
+import requests
+import os
+import sys
+import uuid
+from datetime import datetime, timedelta
+
+# Configuration
+BASE_URL = os.getenv("AERIUM_URL", "http://localhost:5000")
+TEST_PASSWORD = "TestPassword123!"
+
+
+class TestRunner:
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.session = requests.Session()
+        self.results = {"passed": 0, "failed": 0, "errors": []}
+        self.sensor_id = None
+        # Two minutes apart over the last 4 hours
+        self.start = datetime.utcnow() - timedelta(hours=4)
+
+    def test(self, name, func):
+        """Run a test and track results"""
+        try:
+            print(f"\n🧪 Testing: {name}...", end=" ")
+            func()
+            print("✅ PASSED")
+            self.results["passed"] += 1
+            return True
+        except AssertionError as e:
+            print(f"❌ FAILED")
+            self.results["failed"] += 1
+            self.results["errors"].append(f"{name}: {str(e)}")
+            return False
+        except Exception as e:
+            print(f"⚠️  ERROR")
+            self.results["failed"] += 1
+            self.results["errors"].append(f"{name}: {str(e)}")
+            return False
+
+    def print_results(self):
+        """Print test results summary"""
+        total = self.results["passed"] + self.results["failed"]
+        print(f"\n{'='*60}")
+        print(f"📊 TEST RESULTS: {self.results['passed']}/{total} passed")
+        print(f"{'='*60}")
+
+        if self.results["errors"]:
+            print("\n❌ Failed Tests:")
+            for error in self.results["errors"]:
+                print(f"  - {error}")
+
+        return self.results["failed"] == 0
+
+    def reading(self, step, co2):
+        return {
+            "sensor_id": self.sensor_id,
+            "co2": co2,
+            "temperature": 21 + (step % 3) * 0.1,
+            "humidity": 45 + (step % 4) * 0.2,
+            "recorded_at": (self.start + timedelta(minutes=2 * step)).isoformat() + "Z"
+        }
+
+    def anomalies(self, **params):
+        response = self.session.get(f"{self.base_url}/api/analytics/anomalies",
+                                    params={"sensor_id": self.sensor_id, **params})
+        assert response.status_code == 200, f"Anomalies returned {response.status_code}"
+        return response.json()
+
+    # ============== SETUP ==============
+
+    def test_setup(self):
+        email = f"anomalies-{uuid.uuid4().hex[:8]}@test.com"
+        response = self.session.post(f"{self.base_url}/api/auth/register", json={
+            "email": email, "password": TEST_PASSWORD
+        })
+        assert response.status_code == 201, f"Register returned {response.status_code}"
+        response = self.session.post(f"{self.base_url}/api/auth/login", json={
+            "email": email, "password": TEST_PASSWORD
+        })
+        assert response.status_code == 200, f"Login returned {response.status_code}"
+        self.session.headers["Authorization"] = f"Bearer {response.json()['access_token']}"
+
+        response = self.session.post(f"{self.base_url}/api/sensors", json={
+            "name": "Anomaly test", "location": "Lab", "sensor_type": "real"
+        })
+        assert response.status_code == 201, f"Create sensor returned {response.status_code}"
+        self.sensor_id = int(response.json()["sensor"]["id"])
+
+        # Steady CO2 around 600 ppm with a single spike at step 80
+        readings = [self.reading(step, 3000 if step == 80 else 600 + (step % 5) * 4) for step in range(100)]
+        response = self.session.post(f"{self.base_url}/api/readings/batch", json=readings)
+        assert response.status_code == 201, f"Batch returned {response.status_code}"
+
+    # ============== DETECTION ==============
+
+    def test_spike_flagged(self):
+        data = self.anomalies(hours=6)
+        spike_at = self.reading(80, 0)["recorded_at"][:16]
+        flagged = [a for a in data["data"] if a["recorded_at"].startswith(spike_at)]
+        assert flagged, f"Spike at {spike_at} not flagged: {data['data'][:3]}"
+        assert "co2" in flagged[0]["metrics"], f"Spike not attributed to co2: {flagged[0]}"
+        assert "zscore" in flagged[0]["methods"], f"Spike not found by the z-score: {flagged[0]}"
+
+    def test_model_summary(self):
+        summary = self.anomalies(hours=6)["sensors"][str(self.sensor_id)]
+        assert summary["anomalies"] >= 1, "Summary does not count the anomaly"
+        assert "baseline" in summary and "isolation_forest" in summary, f"Incomplete summary {summary}"
+
+    def test_new_readings_scored(self):
+        before = self.anomalies(hours=6)["count"]
+        readings = [self.reading(step, 600 + (step % 5) * 4) for step in range(100, 110)]
+        readings.append(self.reading(110, 3500))
+        response = self.session.post(f"{self.base_url}/api/readings/batch", json=readings)
+        assert response.status_code == 201, f"Batch returned {response.status_code}"
+        after = self.anomalies(hours=6)["count"]
+        assert after > before, f"New spike not scored ({before} -> {after} anomalies)"
+
+    def test_validation(self):
+        response = self.session.get(f"{self.base_url}/api/analytics/anomalies", params={"hours": 0})
+        assert response.status_code == 400, f"hours=0 should be 400, got {response.status_code}"
+
+
+def main():
+    print(f"🔗 Connecting to: {BASE_URL}")
+
+    tester = TestRunner(BASE_URL)
+
+    print("\n🔐 SETUP")
+    if not tester.test("Register, create a sensor and readings", tester.test_setup):
+        tester.print_results()
+        return 1
+
+    print("\n🔎 ANOMALY TESTS")
+    tester.test("Spike flagged", tester.test_spike_flagged)
+    tester.test("Per-sensor model summary", tester.test_model_summary)
+    tester.test("New readings scored on the next call", tester.test_new_readings_scored)
+    tester.test("Parameter validation", tester.test_validation)
+
+    success = tester.print_results()
+    return 0 if success else 1
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Test interrupted by user")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\n\n💥 Fatal error: {str(e)}")
+        sys.exit(1)
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Test the correlation matrix via HTTP requests
+Tests: pooled and per-sensor Pearson correlations from the daily
+statistics, day window, sensors without readings, parameter validation
+
+Run against a server started with rate limiting off:
+    ENABLE_RATE_LIMITING=False RATELIMIT_DEFAULT=10000/minute python site/backend/app.py
+"""
+
+import requests
+import os
+import sys
+import uuid
+from datetime import datetime, timedelta
+
+# Configuration
+BASE_URL = os.getenv("AERIUM_URL", "http://localhost:5000")
+TEST_PASSWORD = "TestPassword123!"
+
+
+class TestRunner:
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.session = requests.Session()
+        self.results = {"passed": 0, "failed": 0, "errors": []}
+        self.sensor_ids = []
+        self.start = (datetime.utcnow() - timedelta(hours=3)).replace(second=0, microsecond=0)
+
+    def test(self, name, func):
+        """Run a test and track results"""
+        try:
+            print(f"\n🧪 Testing: {name}...", end=" ")
+            func()
+            print("✅ PASSED")
+            self.results["passed"] += 1
+            return True
+        except AssertionError as e:
+            print(f"❌ FAILED")
+            self.results["failed"] += 1
+            self.results["errors"].append(f"{name}: {str(e)}")
+            return False
+        except Exception as e:
+            print(f"⚠️  ERROR")
+            self.results["failed"] += 1
+            self.results["errors"].append(f"{name}: {str(e)}")
+            return False
+
+    def print_results(self):
+        """Print test results summary"""
+        total = self.results["passed"] + self.results["failed"]
+        print(f"\n{'='*60}")
+        print(f"📊 TEST RESULTS: {self.results['passed']}/{total} passed")
+        print(f"{'='*60}")
+
+        if self.results["errors"]:
+            print("\n❌ Failed Tests:")
+            for error in self.results["errors"]:
+                print(f"  - {error}")
+
+        return self.results["failed"] == 0
+
+    def correlation(self, **params):
+        response = self.session.get(f"{self.base_url}/api/visualization/correlation", params=params)
+        assert response.status_code == 200, f"Correlation returned {response.status_code}"
+        return response.json()
+
+    # ============== SETUP ==============
+
+    def test_setup(self):
+        email = f"correlation-{uuid.uuid4().hex[:8]}@test.com"
+        response = self.session.post(f"{self.base_url}/api/auth/register", json={
+            "email": email, "password": TEST_PASSWORD
+        })
+        assert response.status_code == 201, f"Register returned {response.status_code}"
+        response = self.session.post(f"{self.base_url}/api/auth/login", json={
+            "email": email, "password": TEST_PASSWORD
+        })
+        assert response.status_code == 200, f"Login returned {response.status_code}"
+        self.session.headers["Authorization"] = f"Bearer {response.json()['access_token']}"
+
+        for name in ("Linked", "Empty"):
+            response = self.session.post(f"{self.base_url}/api/sensors", json={
+                "name": name, "location": "Lab", "sensor_type": "real"
+            })
+            assert response.status_code == 201, f"Create sensor returned {response.status_code}"
+            self.sensor_ids.append(int(response.json()["sensor"]["id"]))
+
+        # Temperature rises and humidity falls with CO2; one reading 10 days ago
+        readings = [
+            {
+                "sensor_id": self.sensor_ids[0],
+                "co2": 500 + step * 20,
+                "temperature": 19 + step * 0.25,
+                "humidity": 60 - step * 0.5,
+                "recorded_at": (self.start + timedelta(minutes=5 * step)).isoformat() + "Z"
+            }
+            for step in range(30)
+        ]
+        readings.append({
+            "sensor_id": self.sensor_ids[0], "co2": 5000, "temperature": 0, "humidity": 99,
+            "recorded_at": (self.start - timedelta(days=10)).isoformat() + "Z"
+        })
+        response = self.session.post(f"{self.base_url}/api/readings/batch", json=readings)
+        assert response.status_code == 201, f"Batch returned {response.status_code}"
+
+    # ============== CORRELATIONS ==============
+
+    def test_matrix(self):
+        data = self.correlation(days=2)
+        assert data["variables"] == ["co2", "temperature", "humidity"], f"Unexpected variables {data['variables']}"
+        assert data["samples"] == 30, f"Expected 30 samples in 2 days, got {data['samples']}"
+        matrix = data["matrix"]
+        assert matrix[0][0] == 1, "Diagonal should be 1"
+        assert matrix[0][1] > 0.99 and matrix[1][0] == matrix[0][1], f"co2/temperature: {matrix}"
+        assert matrix[0][2] < -0.99, f"co2/humidity: {matrix}"
+        assert len(data["correlations"]) == 3, f"Expected 3 pairs, got {data['correlations']}"
+
+    def test_day_window(self):
+        data = self.correlation(days=30)
+        assert data["samples"] == 31, f"Expected the 10-day-old reading in a 30-day window, got {data['samples']}"
+
+    def test_per_sensor(self):
+        sensors = self.correlation(days=2)["sensors"]
+        assert sensors[str(self.sensor_ids[0])]["samples"] == 30, "Per-sensor samples wrong"
+        empty = sensors[str(self.sensor_ids[1])]
+        assert empty["samples"] == 0, f"Sensor without readings has {empty['samples']} samples"
+        assert empty["matrix"][0][1] is None, f"Undefined correlation should be null: {empty['matrix']}"
+
+    def test_validation(self):
+        for days in (0, 1000):
+            response = self.session.get(f"{self.base_url}/api/visualization/correlation", params={"days": days})
+            assert response.status_code == 400, f"days={days} should be 400, got {response.status_code}"
+
+
+def main():
+    print(f"🔗 Connecting to: {BASE_URL}")
+
+    tester = TestRunner(BASE_URL)
+
+    print("\n🔐 SETUP")
+    if not tester.test("Register, create sensors and readings", tester.test_setup):
+        tester.print_results()
+        return 1
+
+    print("\n🔗 CORRELATION TESTS")
+    tester.test("Pooled matrix", tester.test_matrix)
+    tester.test("Day window", tester.test_day_window)
+    tester.test("Per-sensor matrices", tester.test_per_sensor)
+    tester.test("Parameter validation", tester.test_validation)
+
+    success = tester.print_results()
+    return 0 if success else 1
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Test interrupted by user")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\n\n💥 Fatal error: {str(e)}")
+        sys.exit(1)
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Test alert email delivery from the outbox against a local SMTP stand-in
+Tests: delivery, digests, retry with backoff after SMTP failures
+
+Runs in-process against a temporary database; needs aiosmtpd
+(pip install aiosmtpd), no running server.
+"""
+
+import os
+import socket
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from aiosmtpd.controller import Controller
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "site" / "backend"
+DB_DIR = tempfile.mkdtemp(prefix="aerium-outbox-")
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("localhost", 0))
+        return sock.getsockname()[1]
+
+
+SMTP_PORT = free_port()
+
+# Configure the app before it is imported: temporary database, stand-in SMTP
+# server, no background senders (the test drives process_outbox itself)
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{DB_DIR}/outbox.db",
+    "MAIL_SERVER": "localhost",
+    "MAIL_PORT": str(SMTP_PORT),
+    "MAIL_USE_TLS": "False",
+    "ENABLE_EMAIL_NOTIFICATIONS": "True",
+    "EMAIL_SENDER_THREADS": "0",
+    "ALERT_SEND_INTERVAL": "300",
+    "EMAIL_RETRY_BASE": "30",
+    "EMAIL_MAX_ATTEMPTS": "3",
+})
+sys.path.insert(0, str(BACKEND_DIR))
+os.chdir(DB_DIR)  # the app writes logs/ under the working directory
+
+from app import app  # noqa: E402
+from database import db, EmailOutbox  # noqa: E402
+from email_service import queue_alert_email, process_outbox  # noqa: E402
+
+
+class Inbox:
+    """aiosmtpd handler keeping every received envelope"""
+
+    def __init__(self):
+        self.messages = []
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope)
+        return "250 Message accepted for delivery"
+
+
+class TestRunner:
+    def __init__(self):
+        self.inbox = Inbox()
+        self.smtp = None
+        self.results = {"passed": 0, "failed": 0, "errors": []}
+
+    def test(self, name, func):
+        """Run a test and track results"""
+        try:
+            print(f"\n🧪 Testing: {name}...", end=" ")
+            with app.app_context():
+                func()
+            print("✅ PASSED")
+            self.results["passed"] += 1
+            return True
+        except AssertionError as e:
+            print(f"❌ FAILED")
+            self.results["failed"] += 1
+            self.results["errors"].append(f"{name}: {str(e)}")
+            return False
+        except Exception as e:
+            print(f"⚠️  ERROR")
+            self.results["failed"] += 1
+            self.results["errors"].append(f"{name}: {str(e)}")
+            return False
+        finally:
+            with app.app_context():
+                db.session.remove()
+
+    def print_results(self):
+        """Print test results summary"""
+        total = self.results["passed"] + self.results["failed"]
+        print(f"\n{'='*60}")
+        print(f"📊 TEST RESULTS: {self.results['passed']}/{total} passed")
+        print(f"{'='*60}")
+
+        if self.results["errors"]:
+            print("\n❌ Failed Tests:")
+            for error in self.results["errors"]:
+                print(f"  - {error}")
+
+        return self.results["failed"] == 0
+
+    def start_smtp(self):
+        self.smtp = Controller(self.inbox, hostname="localhost", port=SMTP_PORT)
+        self.smtp.start()
+
+    def stop_smtp(self):
+        self.smtp.stop()
+        self.smtp = None
+
+    @staticmethod
+    def queue(to_email, sensor_name="Salle 1", value=1500):
+        queue_alert_email(
+            to_email=to_email,
+            sensor_name=sensor_name,
+            alert_type="High CO2",
+            alert_value=value,
+            threshold=1200
+        )
+        db.session.commit()
+
+    @staticmethod
+    def entries(to_email):
+        return EmailOutbox.query.filter_by(to_email=to_email).order_by(EmailOutbox.id).all()
+
+    # ============== DELIVERY ==============
+
+    def test_single_alert_delivered(self):
+        self.queue("alice@test.com")
+        sent = process_outbox()
+        assert sent == 1, f"Expected 1 email sent, got {sent}"
+        assert len(self.inbox.messages) == 1, f"SMTP server got {len(self.inbox.messages)} messages"
+        envelope = self.inbox.messages[-1]
+        assert envelope.rcpt_tos == ["alice@test.com"], f"Wrong recipient: {envelope.rcpt_tos}"
+        assert b"Salle 1" in envelope.content, "Sensor name missing from the email"
+        entry = self.entries("alice@test.com")[0]
+        assert entry.status == "sent" and entry.sent_at, f"Entry not marked sent: {entry.status}"
+
+    def test_alerts_merged_into_digest(self):
+        self.queue("bob@test.com", "Salle 1", 1500)
+        self.queue("bob@test.com", "Salle 2", 1700)
+        before = len(self.inbox.messages)
+        sent = process_outbox()
+        assert sent == 1, f"Expected 1 digest, got {sent} emails"
+        assert len(self.inbox.messages) == before + 1, "Digest not delivered"
+        content = self.inbox.messages[-1].content
+        assert b"Salle 1" in content and b"Salle 2" in content, "Digest misses an alert"
+        assert all(e.status == "sent" for e in self.entries("bob@test.com")), "Digest entries not marked sent"
+
+    def test_send_interval_respected(self):
+        self.queue("alice@test.com", "Salle 3")
+        sent = process_outbox()
+        assert sent == 0, "Recipient emailed again within ALERT_SEND_INTERVAL"
+        entry = self.entries("alice@test.com")[-1]
+        assert entry.status == "pending", f"Entry should stay queued, is {entry.status}"
+
+    # ============== RETRY AND BACKOFF ==============
+
+    def test_failure_schedules_retry(self):
+        self.stop_smtp()
+        self.queue("carol@test.com")
+        started = datetime.utcnow()
+        sent = process_outbox()
+        assert sent == 0, "Email reported sent with the SMTP server down"
+        entry = self.entries("carol@test.com")[0]
+        assert entry.status == "pending", f"Failed entry should be retried, is {entry.status}"
+        assert entry.attempts == 1, f"Expected 1 attempt, got {entry.attempts}"
+        assert entry.last_error, "Failure not recorded"
+        delay = (entry.next_attempt_at - started).total_seconds()
+        assert 29 <= delay <= 35, f"First retry should wait ~30s, waits {delay:.0f}s"
+
+        # Not due yet: nothing is attempted
+        process_outbox()
+        assert self.entries("carol@test.com")[0].attempts == 1, "Retried before its backoff elapsed"
+
+    def test_backoff_doubles(self):
+        entry = self.entries("carol@test.com")[0]
+        entry.next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+        db.session.commit()
+        started = datetime.utcnow()
+        process_outbox()
+        entry = self.entries("carol@test.com")[0]
+        assert entry.attempts == 2, f"Expected 2 attempts, got {entry.attempts}"
+        delay = (entry.next_attempt_at - started).total_seconds()
+        assert 59 <= delay <= 65, f"Second retry should wait ~60s, waits {delay:.0f}s"
+
+    def test_retry_delivers(self):
+        self.start_smtp()
+        entry = self.entries("carol@test.com")[0]
+        entry.next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+        db.session.commit()
+        sent = process_outbox()
+        assert sent == 1, f"Retry not delivered (sent={sent})"
+        assert self.inbox.messages[-1].rcpt_tos == ["carol@test.com"], "Retry went to the wrong recipient"
+        entry = self.entries("carol@test.com")[0]
+        assert entry.status == "sent" and entry.attempts == 2, f"Unexpected state {entry.status}/{entry.attempts}"
+
+    def test_gives_up_after_max_attempts(self):
+        self.stop_smtp()
+        self.queue("dave@test.com")
+        for _ in range(3):
+            entry = self.entries("dave@test.com")[0]
+            entry.next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+            db.session.commit()
+            process_outbox()
+        entry = self.entries("dave@test.com")[0]
+        assert entry.status == "failed", f"Entry should be failed after 3 attempts, is {entry.status}"
+        assert entry.attempts == 3, f"Expected 3 attempts, got {entry.attempts}"
+        self.start_smtp()
+
+
+def main():
+    print("\n📧 EMAIL OUTBOX TESTS")
+    print(f"🔗 SMTP stand-in on localhost:{SMTP_PORT}, database in {DB_DIR}")
+
+    tester = TestRunner()
+    tester.start_smtp()
+    try:
+        tester.test("Single alert delivered", tester.test_single_alert_delivered)
+        tester.test("Alerts for one recipient merged into a digest", tester.test_alerts_merged_into_digest)
+        tester.test("ALERT_SEND_INTERVAL respected", tester.test_send_interval_respected)
+        tester.test("SMTP failure schedules a retry", tester.test_failure_schedules_retry)
+        tester.test("Backoff doubles after each failure", tester.test_backoff_doubles)
+        tester.test("Retry delivers once SMTP is back", tester.test_retry_delivers)
+        tester.test("Gives up after EMAIL_MAX_ATTEMPTS", tester.test_gives_up_after_max_attempts)
+    finally:
+        if tester.smtp:
+            tester.stop_smtp()
+
+    success = tester.print_results()
+    return 0 if success else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
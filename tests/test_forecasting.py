@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Test forecasts via HTTP requests
+Tests: hourly forecasts with intervals, model age, sensors without
+history, horizon validation
+
+Run against a server started with rate limiting off:
+    ENABLE_RATE_LIMITING=False RATELIMIT_DEFAULT=10000/minute python site/backend/app.py
+"""
+
+import requests
+import os
+import sys
+import uuid
+from datetime import datetime, timedelta
+
+# Configuration
+BASE_URL = os.getenv("AERIUM_URL", "http://localhost:5000")
+TEST_PASSWORD = "TestPassword123!"
+
+
+class TestRunner:
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.session = requests.Session()
+        self.results = {"passed": 0, "failed": 0, "errors": []}
+        self.sensor_id = None
+        self.empty_sensor_id = None
+
+    def test(self, name, func):
+        """Run a test and track results"""
+        try:
+            print(f"\n🧪 Testing: {name}...", end=" ")
+            func()
+            print("✅ PASSED")
+            self.results["passed"] += 1
+            return True
+        except AssertionError as e:
+            print(f"❌ FAILED")
+            self.results["failed"] += 1
+            self.results["errors"].append(f"{name}: {str(e)}")
+            return False
+        except Exception as e:
+            print(f"⚠️  ERROR")
+            self.results["failed"] += 1
+            self.results["errors"].append(f"{name}: {str(e)}")
+            return False
+
+    def print_results(self):
+        """Print test results summary"""
+        total = self.results["passed"] + self.results["failed"]
+        print(f"\n{'='*60}")
+        print(f"📊 TEST RESULTS: {self.results['passed']}/{total} passed")
+        print(f"{'='*60}")
+
+        if self.results["errors"]:
+            print("\n❌ Failed Tests:")
+            for error in self.results["errors"]:
+                print(f"  - {error}")
+
+        return self.results["failed"] == 0
+
+    def create_sensor(self, name):
+        response = self.session.post(f"{self.base_url}/api/sensors", json={
+            "name": name, "location": "Lab", "sensor_type": "real"
+        })
+        assert response.status_code == 201, f"Create sensor returned {response.status_code}"
+        return int(response.json()["sensor"]["id"])
+
+    # ============== SETUP ==============
+
+    def test_setup(self):
+        email = f"forecast-{uuid.uuid4().hex[:8]}@test.com"
+        response = self.session.post(f"{self.base_url}/api/auth/register", json={
+            "email": email, "password": TEST_PASSWORD
+        })
+        assert response.status_code == 201, f"Register returned {response.status_code}"
+        response = self.session.post(f"{self.base_url}/api/auth/login", json={
+            "email": email, "password": TEST_PASSWORD
+        })
+        assert response.status_code == 200, f"Login returned {response.status_code}"
+        self.session.headers["Authorization"] = f"Bearer {response.json()['access_token']}"
+
+        self.sensor_id = self.create_sensor("Forecast test")
+        self.empty_sensor_id = self.create_sensor("No history")
+
+        # Two days of readings every 15 minutes, higher during the day
+        start = (datetime.utcnow() - timedelta(days=2)).replace(minute=0, second=0, microsecond=0)
+        readings = []
+        for step in range(4 * 48):
+            recorded_at = start + timedelta(minutes=15 * step)
+            daytime = 8 <= recorded_at.hour < 18
+            readings.append({
+                "sensor_id": self.sensor_id,
+                "co2": (900 if daytime else 500) + step % 7,
+                "temperature": 22 if daytime else 19,
+                "humidity": 45,
+                "recorded_at": recorded_at.isoformat() + "Z"
+            })
+        response = self.session.post(f"{self.base_url}/api/readings/batch", json=readings)
+        assert response.status_code == 201, f"Batch returned {response.status_code}"
+
+    # ============== FORECASTS ==============
+
+    def test_hourly_forecasts(self):
+        response = self.session.get(f"{self.base_url}/api/analytics/predict/6", params={"sensor_id": self.sensor_id})
+        assert response.status_code == 200, f"Predict returned {response.status_code}"
+        data = response.json()
+        assert len(data["predictions"]) == 6, f"Expected 6 predictions, got {len(data['predictions'])}"
+        assert len(data["timestamps"]) == 6, "Timestamps do not match the predictions"
+
+        now = datetime.utcnow()
+        first = datetime.fromisoformat(data["timestamps"][0])
+        assert now < first <= now + timedelta(hours=1), f"First forecast at {first}, now is {now}"
+
+        for entry in data["sensors"][str(self.sensor_id)]["forecast"]:
+            for metric in ("co2", "temperature", "humidity"):
+                assert entry[f"{metric}_lower"] <= entry[metric] <= entry[f"{metric}_upper"], \
+                    f"{metric} outside its interval: {entry}"
+            assert 400 <= entry["co2"] <= 1000, f"Forecast far from the history: {entry['co2']}"
+
+    def test_model_age(self):
+        response = self.session.get(f"{self.base_url}/api/analytics/predict/3", params={"sensor_id": self.sensor_id})
+        assert response.status_code == 200, f"Predict returned {response.status_code}"
+        model = response.json()["sensors"][str(self.sensor_id)]
+        assert model["model_fitted_at"] and model["model_age_seconds"] >= 0, f"Model age missing: {model}"
+        assert model["training_hours"] > 0, "Model trained on no hours"
+
+    def test_no_history(self):
+        response = self.session.get(f"{self.base_url}/api/analytics/predict/3", params={"sensor_id": self.empty_sensor_id})
+        assert response.status_code == 200, f"Predict returned {response.status_code}"
+        data = response.json()
+        assert data["predictions"] == [], f"Forecast without history: {data['predictions']}"
+        assert data["sensors"][str(self.empty_sensor_id)]["forecast"] == [], "Forecast without history"
+
+    def test_horizon_validation(self):
+        for hours in (0, 100000):
+            response = self.session.get(f"{self.base_url}/api/analytics/predict/{hours}")
+            assert response.status_code == 400, f"hours={hours} should be 400, got {response.status_code}"
+
+
+def main():
+    print(f"🔗 Connecting to: {BASE_URL}")
+
+    tester = TestRunner(BASE_URL)
+
+    print("\n🔐 SETUP")
+    if not tester.test("Register, create sensors and readings", tester.test_setup):
+        tester.print_results()
+        return 1
+
+    print("\n🔮 FORECAST TESTS")
+    tester.test("Hourly forecasts with intervals", tester.test_hourly_forecasts)
+    tester.test("Model age reported", tester.test_model_age)
+    tester.test("Sensor without history", tester.test_no_history)
+    tester.test("Horizon validation", tester.test_horizon_validation)
+
+    success = tester.print_results()
+    return 0 if success else 1
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Test interrupted by user")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\n\n💥 Fatal error: {str(e)}")
+        sys.exit(1)
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Test the hour-of-week heatmap via HTTP requests
+Tests: cell means, maxima and counts kept up to date on ingest, grouping
+by location, parameter validation
+
+Run against a server started with rate limiting off:
+    ENABLE_RATE_LIMITING=False RATELIMIT_DEFAULT=10000/minute python site/backend/app.py
+"""
+
+import requests
+import os
+import sys
+import uuid
+from datetime import datetime, timedelta
+
+# Configuration
+BASE_URL = os.getenv("AERIUM_URL", "http://localhost:5000")
+TEST_PASSWORD = "TestPassword123!"
+
+
+class TestRunner:
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.session = requests.Session()
+        self.results = {"passed": 0, "failed": 0, "errors": []}
+        self.sensor_ids = []
+        # One UTC hour three days ago
+        self.hour = (datetime.utcnow() - timedelta(days=3)).replace(minute=0, second=0, microsecond=0)
+
+    def test(self, name, func):
+        """Run a test and track results"""
+        try:
+            print(f"\n🧪 Testing: {name}...", end=" ")
+            func()
+            print("✅ PASSED")
+            self.results["passed"] += 1
+            return True
+        except AssertionError as e:
+            print(f"❌ FAILED")
+            self.results["failed"] += 1
+            self.results["errors"].append(f"{name}: {str(e)}")
+            return False
+        except Exception as e:
+            print(f"⚠️  ERROR")
+            self.results["failed"] += 1
+            self.results["errors"].append(f"{name}: {str(e)}")
+            return False
+
+    def print_results(self):
+        """Print test results summary"""
+        total = self.results["passed"] + self.results["failed"]
+        print(f"\n{'='*60}")
+        print(f"📊 TEST RESULTS: {self.results['passed']}/{total} passed")
+        print(f"{'='*60}")
+
+        if self.results["errors"]:
+            print("\n❌ Failed Tests:")
+            for error in self.results["errors"]:
+                print(f"  - {error}")
+
+        return self.results["failed"] == 0
+
+    def heatmap(self, **params):
+        response = self.session.get(f"{self.base_url}/api/visualization/heatmap", params=params)
+        assert response.status_code == 200, f"Heatmap returned {response.status_code}"
+        return response.json()
+
+    def cell(self, grid):
+        return grid[self.hour.hour][self.hour.weekday()]
+
+    def post(self, sensor_id, values):
+        readings = [
+            {"sensor_id": sensor_id, "co2": co2, "temperature": 21, "humidity": 45,
+             "recorded_at": (self.hour + timedelta(minutes=10 * index)).isoformat() + "Z"}
+            for index, co2 in enumerate(values)
+        ]
+        response = self.session.post(f"{self.base_url}/api/readings/batch", json=readings)
+        assert response.status_code == 201, f"Batch returned {response.status_code}"
+
+    # ============== SETUP ==============
+
+    def test_setup(self):
+        email = f"heatmap-{uuid.uuid4().hex[:8]}@test.com"
+        response = self.session.post(f"{self.base_url}/api/auth/register", json={
+            "email": email, "password": TEST_PASSWORD
+        })
+        assert response.status_code == 201, f"Register returned {response.status_code}"
+        response = self.session.post(f"{self.base_url}/api/auth/login", json={
+            "email": email, "password": TEST_PASSWORD
+        })
+        assert response.status_code == 200, f"Login returned {response.status_code}"
+        self.session.headers["Authorization"] = f"Bearer {response.json()['access_token']}"
+
+        for name, location in (("Room A", "North"), ("Room B", "South")):
+            response = self.session.post(f"{self.base_url}/api/sensors", json={
+                "name": name, "location": location, "sensor_type": "real"
+            })
+            assert response.status_code == 201, f"Create sensor returned {response.status_code}"
+            self.sensor_ids.append(int(response.json()["sensor"]["id"]))
+
+        self.post(self.sensor_ids[0], [600, 700, 800])
+        self.post(self.sensor_ids[1], [1000])
+
+    # ============== HEATMAP ==============
+
+    def test_grid_shape(self):
+        data = self.heatmap()
+        for key in ("heatmap", "max", "counts"):
+            grid = data[key]
+            assert len(grid) == 24 and all(len(row) == 7 for row in grid), f"{key} should be 24 x 7"
+
+    def test_cell_values(self):
+        data = self.heatmap()
+        assert self.cell(data["counts"]) == 4, f"Expected 4 readings in the cell, got {self.cell(data['counts'])}"
+        assert self.cell(data["heatmap"]) == 775, f"Expected a 775 ppm mean, got {self.cell(data['heatmap'])}"
+        assert self.cell(data["max"]) == 1000, f"Expected a 1000 ppm max, got {self.cell(data['max'])}"
+        assert sum(map(sum, data["counts"])) == 4, "Readings counted outside their cell"
+
+    def test_updated_on_ingest(self):
+        self.post(self.sensor_ids[0], [200, 200, 200, 200])
+        data = self.heatmap(sensor_id=self.sensor_ids[0])
+        assert self.cell(data["counts"]) == 7, f"Expected 7 readings after ingest, got {self.cell(data['counts'])}"
+        assert self.cell(data["heatmap"]) == 414.3, f"Mean not updated: {self.cell(data['heatmap'])}"
+
+    def test_group_by_location(self):
+        groups = {group["location"]: group for group in self.heatmap(group_by="location")["groups"]}
+        assert set(groups) == {"North", "South"}, f"Unexpected groups {list(groups)}"
+        assert self.cell(groups["South"]["heatmap"]) == 1000, "South group mean wrong"
+
+    def test_validation(self):
+        response = self.session.get(f"{self.base_url}/api/visualization/heatmap", params={"metric": "pressure"})
+        assert response.status_code == 400, f"Invalid metric should be 400, got {response.status_code}"
+        response = self.session.get(f"{self.base_url}/api/visualization/heatmap", params={"group_by": "owner"})
+        assert response.status_code == 400, f"Invalid group_by should be 400, got {response.status_code}"
+
+
+def main():
+    print(f"🔗 Connecting to: {BASE_URL}")
+
+    tester = TestRunner(BASE_URL)
+
+    print("\n🔐 SETUP")
+    if not tester.test("Register, create sensors and readings", tester.test_setup):
+        tester.print_results()
+        return 1
+
+    print("\n🗺️  HEATMAP TESTS")
+    tester.test("Grid shape", tester.test_grid_shape)
+    tester.test("Cell mean, max and count", tester.test_cell_values)
+    tester.test("Updated on ingest", tester.test_updated_on_ingest)
+    tester.test("Group by location", tester.test_group_by_location)
+    tester.test("Parameter validation", tester.test_validation)
+
+    success = tester.print_results()
+    return 0 if success else 1
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Test interrupted by user")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\n\n💥 Fatal error: {str(e)}")
+        sys.exit(1)
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Test request and SQL metrics via HTTP requests
+Tests: /api/system/performance (admin only), Prometheus counters at /metrics,
+scrape access rules
+
+Run against a server started with rate limiting off:
+    ENABLE_RATE_LIMITING=False RATELIMIT_DEFAULT=10000/minute python site/backend/app.py
+The admin checks use the seeded admin (python seed_database.py) and are
+skipped when it does not exist. Set METRICS_TOKEN to the server's token
+when it has one.
+"""
+
+import requests
+import os
+import re
+import sys
+import uuid
+
+# Configuration
+BASE_URL = os.getenv("AERIUM_URL", "http://localhost:5000")
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+TEST_PASSWORD = "TestPassword123!"
+ADMIN_EMAIL = "admin@aerium.app"
+ADMIN_PASSWORD = "admin123"
+
+
+class TestRunner:
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.session = requests.Session()
+        self.admin = None
+        self.results = {"passed": 0, "failed": 0, "errors": []}
+
+    def test(self, name, func):
+        """Run a test and track results"""
+        try:
+            print(f"\n🧪 Testing: {name}...", end=" ")
+            func()
+            print("✅ PASSED")
+            self.results["passed"] += 1
+            return True
+        except AssertionError as e:
+            print(f"❌ FAILED")
+            self.results["failed"] += 1
+            self.results["errors"].append(f"{name}: {str(e)}")
+            return False
+        except Exception as e:
+            print(f"⚠️  ERROR")
+            self.results["failed"] += 1
+            self.results["errors"].append(f"{name}: {str(e)}")
+            return False
+
+    def print_results(self):
+        """Print test results summary"""
+        total = self.results["passed"] + self.results["failed"]
+        print(f"\n{'='*60}")
+        print(f"📊 TEST RESULTS: {self.results['passed']}/{total} passed")
+        print(f"{'='*60}")
+
+        if self.results["errors"]:
+            print("\n❌ Failed Tests:")
+            for error in self.results["errors"]:
+                print(f"  - {error}")
+
+        return self.results["failed"] == 0
+
+    def scrape(self):
+        headers = {"Authorization": f"Bearer {METRICS_TOKEN}"} if METRICS_TOKEN else {}
+        response = requests.get(f"{self.base_url}/metrics", headers=headers)
+        assert response.status_code == 200, f"/metrics returned {response.status_code}"
+        return response.text
+
+    @staticmethod
+    def health_count(text):
+        match = re.search(
+            r'aerium_http_request_duration_seconds_count\{blueprint="app",route="/api/health",method="GET"\} (\d+)',
+            text
+        )
+        return int(match.group(1)) if match else 0
+
+    # ============== SETUP ==============
+
+    def test_setup(self):
+        email = f"metrics-{uuid.uuid4().hex[:8]}@test.com"
+        response = self.session.post(f"{self.base_url}/api/auth/register", json={
+            "email": email, "password": TEST_PASSWORD
+        })
+        assert response.status_code == 201, f"Register returned {response.status_code}"
+        response = self.session.post(f"{self.base_url}/api/auth/login", json={
+            "email": email, "password": TEST_PASSWORD
+        })
+        assert response.status_code == 200, f"Login returned {response.status_code}"
+        self.session.headers["Authorization"] = f"Bearer {response.json()['access_token']}"
+
+        admin = requests.Session()
+        response = admin.post(f"{self.base_url}/api/auth/login", json={
+            "email": ADMIN_EMAIL, "password": ADMIN_PASSWORD
+        })
+        if response.status_code == 200:
+            admin.headers["Authorization"] = f"Bearer {response.json()['access_token']}"
+            self.admin = admin
+
+    # ============== PERFORMANCE ==============
+
+    def test_performance_requires_admin(self):
+        response = self.session.get(f"{self.base_url}/api/system/performance")
+        assert response.status_code == 403, f"Non-admin should get 403, got {response.status_code}"
+
+    def test_performance_admin(self):
+        self.admin.get(f"{self.base_url}/api/sensors")
+        response = self.admin.get(f"{self.base_url}/api/system/performance")
+        assert response.status_code == 200, f"Admin got {response.status_code}"
+        data = response.json()
+        performance = data["performance"]
+        assert performance["total_requests"] > 0, "No requests recorded"
+        route = next((r for r in performance["routes"] if r["route"] == "/api/sensors" and r["method"] == "GET"), None)
+        assert route, "GET /api/sensors missing from the routes"
+        assert route["p95_ms"] is not None and route["sql_queries_per_request"] > 0, f"Incomplete route stats {route}"
+        assert "primary" in performance["sql"], "Primary engine SQL stats missing"
+        assert "audit_queue" in data["caches"], "Cache statistics missing"
+
+    # ============== PROMETHEUS ==============
+
+    def test_counters_increase(self):
+        before = self.health_count(self.scrape())
+        for _ in range(3):
+            requests.get(f"{self.base_url}/api/health")
+        after = self.health_count(self.scrape())
+        assert after == before + 3, f"/api/health count went {before} -> {after}, expected +3"
+
+    def test_exposition_format(self):
+        text = self.scrape()
+        for name in ("aerium_http_requests_total", "aerium_http_requests_in_flight",
+                     "aerium_db_queries_total", "aerium_uptime_seconds", "aerium_audit_queue_depth"):
+            assert f"# TYPE {name} " in text, f"{name} missing"
+        assert 'le="+Inf"' in text, "Histogram lacks its +Inf bucket"
+
+    def test_wrong_token_rejected(self):
+        response = requests.get(f"{self.base_url}/metrics", headers={"Authorization": "Bearer wrong"})
+        expected = 401 if METRICS_TOKEN else 200
+        assert response.status_code == expected, f"Expected {expected} with a wrong token, got {response.status_code}"
+
+
+def main():
+    print(f"🔗 Connecting to: {BASE_URL}")
+
+    tester = TestRunner(BASE_URL)
+
+    print("\n🔐 SETUP")
+    if not tester.test("Register and log in", tester.test_setup):
+        tester.print_results()
+        return 1
+
+    print("\n⚙️  PERFORMANCE TESTS")
+    tester.test("Performance requires admin", tester.test_performance_requires_admin)
+    if tester.admin:
+        tester.test("Performance as admin", tester.test_performance_admin)
+    else:
+        print(f"\n⏭️  Skipping admin checks ({ADMIN_EMAIL} not found, run seed_database.py)")
+
+    print("\n📈 PROMETHEUS TESTS")
+    tester.test("Request counters increase", tester.test_counters_increase)
+    tester.test("Exposition format", tester.test_exposition_format)
+    tester.test("Scrape token checked", tester.test_wrong_token_rejected)
+
+    success = tester.print_results()
+    return 0 if success else 1
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Test interrupted by user")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\n\n💥 Fatal error: {str(e)}")
+        sys.exit(1)
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Test reading ingest via HTTP requests
+Tests: batch ingest, alert episodes from batches, rollup history, aggregates,
+readings CSV export
+
+Run against a server started with rate limiting off:
+    ENABLE_RATE_LIMITING=False RATELIMIT_DEFAULT=10000/minute python site/backend/app.py
+"""
+
+import requests
+import json
+import os
+import sys
+import uuid
+from datetime import datetime, timedelta
+
+# Configuration
+BASE_URL = os.getenv("AERIUM_URL", "http://localhost:5000")
+TEST_PASSWORD = "TestPassword123!"
+
+
+class TestRunner:
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.session = requests.Session()
+        self.results = {"passed": 0, "failed": 0, "errors": []}
+        self.sensor_id = None
+        # Back-filled readings: yesterday 10:00-10:20 UTC, CO2 spike at 10:05-10:06
+        self.day = (datetime.utcnow() - timedelta(days=1)).replace(hour=10, minute=0, second=0, microsecond=0)
+
+    def test(self, name, func):
+        """Run a test and track results"""
+        try:
+            print(f"\n🧪 Testing: {name}...", end=" ")
+            func()
+            print("✅ PASSED")
+            self.results["passed"] += 1
+            return True
+        except AssertionError as e:
+            print(f"❌ FAILED")
+            self.results["failed"] += 1
+            self.results["errors"].append(f"{name}: {str(e)}")
+            return False
+        except Exception as e:
+            print(f"⚠️  ERROR")
+            self.results["failed"] += 1
+            self.results["errors"].append(f"{name}: {str(e)}")
+            return False
+
+    def print_results(self):
+        """Print test results summary"""
+        total = self.results["passed"] + self.results["failed"]
+        print(f"\n{'='*60}")
+        print(f"📊 TEST RESULTS: {self.results['passed']}/{total} passed")
+        print(f"{'='*60}")
+
+        if self.results["errors"]:
+            print("\n❌ Failed Tests:")
+            for error in self.results["errors"]:
+                print(f"  - {error}")
+
+        return self.results["failed"] == 0
+
+    def at(self, minutes):
+        return (self.day + timedelta(minutes=minutes)).isoformat() + "Z"
+
+    def alerts(self):
+        response = self.session.get(
+            f"{self.base_url}/api/alerts/history/list",
+            params={"sensor_id": self.sensor_id, "days": 7}
+        )
+        assert response.status_code == 200, f"Alert history returned {response.status_code}"
+        return response.json()["alerts"]
+
+    # ============== SETUP ==============
+
+    def test_register_and_login(self):
+        email = f"ingest-{uuid.uuid4().hex[:8]}@test.com"
+        response = self.session.post(f"{self.base_url}/api/auth/register", json={
+            "email": email, "password": TEST_PASSWORD
+        })
+        assert response.status_code == 201, f"Register returned {response.status_code}"
+        response = self.session.post(f"{self.base_url}/api/auth/login", json={
+            "email": email, "password": TEST_PASSWORD
+        })
+        assert response.status_code == 200, f"Login returned {response.status_code}"
+        self.session.headers["Authorization"] = f"Bearer {response.json()['access_token']}"
+
+        response = self.session.post(f"{self.base_url}/api/sensors", json={
+            "name": "Batch test", "location": "Lab", "sensor_type": "real"
+        })
+        assert response.status_code == 201, f"Create sensor returned {response.status_code}"
+        self.sensor_id = int(response.json()["sensor"]["id"])
+
+    # ============== BATCH INGEST ==============
+
+    def test_batch_accepted(self):
+        values = [(0, 800), (5, 2500), (6, 2600), (10, 900), (20, 700)]
+        readings = [
+            {"sensor_id": self.sensor_id, "co2": co2, "temperature": 22, "humidity": 45,
+             "recorded_at": self.at(minutes)}
+            for minutes, co2 in values
+        ]
+        # Out of order on purpose: alerting must follow recorded_at
+        response = self.session.post(f"{self.base_url}/api/readings/batch", json=readings[::-1])
+        assert response.status_code == 201, f"Expected 201, got {response.status_code}: {response.text[:200]}"
+        stats = response.json()["stats"]
+        assert stats["accepted"] == 5 and stats["rejected"] == 0, f"Unexpected stats {stats}"
+
+    def test_batch_breach_raises_alert(self):
+        alerts = [a for a in self.alerts() if a["metric"] == "co2"]
+        assert len(alerts) == 1, f"Expected 1 co2 alert episode from the batch, got {len(alerts)}"
+        alert = alerts[0]
+        assert alert["metricValue"] == 2600, f"Episode peak should be 2600, is {alert['metricValue']}"
+        assert alert["status"] == "resolved", f"Episode should be resolved by the 10:10 reading, is {alert['status']}"
+        assert alert["createdAt"].startswith(self.at(5)[:16]), f"Episode should start at 10:05, starts {alert['createdAt']}"
+        assert alert["resolvedAt"].startswith(self.at(10)[:16]), f"Episode should end at 10:10, ends {alert['resolvedAt']}"
+
+    def test_batch_partial_results(self):
+        readings = [
+            {"sensor_id": self.sensor_id, "co2": 600, "temperature": 21, "humidity": 40, "recorded_at": self.at(30)},
+            {"sensor_id": self.sensor_id, "co2": -5, "temperature": 21, "humidity": 40},
+            {"sensor_id": 999999, "co2": 600, "temperature": 21, "humidity": 40},
+        ]
+        response = self.session.post(f"{self.base_url}/api/readings/batch", json=readings)
+        assert response.status_code == 207, f"Expected 207, got {response.status_code}"
+        statuses = [result["status"] for result in response.json()["results"]]
+        assert statuses == [201, 400, 404], f"Unexpected per-item statuses {statuses}"
+
+    def test_batch_ndjson(self):
+        lines = [
+            json.dumps({"sensor_id": self.sensor_id, "co2": 650, "temperature": 21, "humidity": 40,
+                        "recorded_at": self.at(minutes)})
+            for minutes in (40, 50)
+        ]
+        response = self.session.post(
+            f"{self.base_url}/api/readings/batch",
+            data="\n".join(lines) + "\nnot json\n",
+            headers={"Content-Type": "application/x-ndjson"}
+        )
+        assert response.status_code == 207, f"Expected 207, got {response.status_code}"
+        assert response.json()["stats"]["accepted"] == 2, "NDJSON lines not accepted"
+
+    def test_single_reading_alert(self):
+        # As the web client sends it: the string id the API returned
+        response = self.session.post(f"{self.base_url}/api/readings", json={
+            "sensor_id": str(self.sensor_id), "co2": 1500, "temperature": 22, "humidity": 45
+        })
+        assert response.status_code == 201, f"Expected 201, got {response.status_code}"
+        triggered = [a for a in self.alerts() if a["metric"] == "co2" and a["status"] == "triggered"]
+        assert len(triggered) == 1, f"Expected a new triggered co2 episode, got {len(triggered)}"
+
+    def test_out_of_order_batch_keeps_episode(self):
+        # A back-filled row older than the live episode must not resolve it
+        response = self.session.post(f"{self.base_url}/api/readings/batch", json=[
+            {"sensor_id": self.sensor_id, "co2": 400, "temperature": 22, "humidity": 45, "recorded_at": self.at(-60)}
+        ])
+        assert response.status_code == 201, f"Expected 201, got {response.status_code}"
+        triggered = [a for a in self.alerts() if a["metric"] == "co2" and a["status"] == "triggered"]
+        assert len(triggered) == 1, f"Live co2 episode resolved by an older reading: {len(triggered)} triggered"
+        assert triggered[0]["resolvedAt"] is None, f"Live episode has resolvedAt {triggered[0]['resolvedAt']}"
+
+    def test_out_of_order_batch_keeps_status(self):
+        # The 1500 ppm live reading set the warning; the older 400 ppm row must not clear it
+        response = self.session.get(f"{self.base_url}/api/sensors/{self.sensor_id}")
+        assert response.status_code == 200, f"Get sensor returned {response.status_code}"
+        status = response.json()["sensor"]["status"]
+        assert status == "avertissement", f"Status taken from an older batch row: {status}"
+
+    def test_alert_stats_follow_resolution(self):
+        def stats():
+            response = self.session.get(f"{self.base_url}/api/alerts/history/stats")
+            assert response.status_code == 200, f"Alert stats returned {response.status_code}"
+            return response.json()
+
+        assert stats()["triggered"] == 1, "Live episode missing from the (now cached) stats"
+        # Resolving the episode is a bulk UPDATE; the cached stats must still be dropped
+        response = self.session.post(f"{self.base_url}/api/readings", json={
+            "sensor_id": self.sensor_id, "co2": 400, "temperature": 22, "humidity": 45
+        })
+        assert response.status_code == 201, f"Expected 201, got {response.status_code}"
+        data = stats()
+        assert data["triggered"] == 0 and data["resolved"] == 2, f"Stale alert stats after resolving: {data}"
+
+    # ============== HISTORY AND AGGREGATES ==============
+
+    def test_rollup_history(self):
+        response = self.session.get(
+            f"{self.base_url}/api/readings/sensor/{self.sensor_id}",
+            params={"hours": 48, "resolution": "1h"}
+        )
+        assert response.status_code == 200, f"History returned {response.status_code}"
+        data = response.json()
+        assert data["resolution"] == "1h", f"Wrong resolution {data['resolution']}"
+        bucket = next((r for r in data["readings"] if r["recorded_at"].startswith(self.day.isoformat()[:13])), None)
+        assert bucket, "10:00 hourly bucket missing"
+        assert bucket["count"] == 8 and bucket["co2_max"] == 2600, f"Unexpected bucket {bucket}"
+
+        # 48 hours in 100 points: hourly buckets reach back to yesterday's readings
+        response = self.session.get(f"{self.base_url}/api/readings/sensor/{self.sensor_id}", params={"hours": 48})
+        assert response.status_code == 200, f"History returned {response.status_code}"
+        data = response.json()
+        assert data["resolution"] == "1h", f"resolution=auto picked {data['resolution']} for 48 hours"
+        times = [r["recorded_at"] for r in data["readings"]]
+        assert times == sorted(times, reverse=True), "Rollup history should be most recent first"
+        assert all("id" in r for r in data["readings"]), "Rollup history readings lack an id"
+        assert any(r["recorded_at"].startswith(self.day.isoformat()[:13]) for r in data["readings"]), \
+            "resolution=auto history does not cover the whole window"
+
+    def test_aggregate(self):
+        response = self.session.get(f"{self.base_url}/api/readings/aggregate", params={
+            "start": self.at(0), "end": self.at(59), "group_by": "sensor", "bucket": "1h"
+        })
+        assert response.status_code == 200, f"Aggregate returned {response.status_code}"
+        data = response.json()
+        assert data["totalReadings"] == 8, f"Expected 8 readings in the window, got {data['totalReadings']}"
+        assert data["maxCo2"] == 2600, f"Expected max 2600, got {data['maxCo2']}"
+
+    def test_readings_csv_with_offset(self):
+        response = self.session.get(f"{self.base_url}/api/reports/export/readings.csv", params={
+            "sensor_id": self.sensor_id, "start": self.day.isoformat() + "+00:00", "end": self.at(59)
+        })
+        assert response.status_code == 200, f"Export returned {response.status_code}: {response.text[:200]}"
+        lines = [line for line in response.text.splitlines()[1:] if line]
+        assert len(lines) == 8, f"Expected 8 CSV rows, got {len(lines)}"
+
+        response = self.session.get(f"{self.base_url}/api/reports/export/readings.csv", params={
+            "start": self.at(59), "end": self.at(0)
+        })
+        assert response.status_code == 400, f"start after end should be 400, got {response.status_code}"
+
+
+def main():
+    print(f"🔗 Connecting to: {BASE_URL}")
+
+    tester = TestRunner(BASE_URL)
+
+    print("\n🔐 SETUP")
+    if not tester.test("Register, login and create a sensor", tester.test_register_and_login):
+        tester.print_results()
+        return 1
+
+    print("\n📦 BATCH INGEST TESTS")
+    tester.test("Batch accepted", tester.test_batch_accepted)
+    tester.test("Breach inside a batch raises one episode", tester.test_batch_breach_raises_alert)
+    tester.test("Per-item results (207)", tester.test_batch_partial_results)
+    tester.test("NDJSON body", tester.test_batch_ndjson)
+    tester.test("Single reading with a string sensor_id raises an alert", tester.test_single_reading_alert)
+    tester.test("Older batch row leaves the live episode open", tester.test_out_of_order_batch_keeps_episode)
+    tester.test("Older batch row leaves the sensor status", tester.test_out_of_order_batch_keeps_status)
+    tester.test("Alert stats refreshed when an episode resolves", tester.test_alert_stats_follow_resolution)
+
+    print("\n📈 HISTORY TESTS")
+    tester.test("Hourly rollup history", tester.test_rollup_history)
+    tester.test("Aggregates", tester.test_aggregate)
+    tester.test("Readings CSV export with UTC offset", tester.test_readings_csv_with_offset)
+
+    success = tester.print_results()
+    return 0 if success else 1
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Test interrupted by user")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\n\n💥 Fatal error: {str(e)}")
+        sys.exit(1)
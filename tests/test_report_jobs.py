@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Test report jobs via HTTP requests
+Tests: PDF export answered within REPORT_WAIT_TIMEOUT (file or 202 with a
+job), job polling and download, job ownership
+
+Run against a server started with rate limiting off:
+    ENABLE_RATE_LIMITING=False RATELIMIT_DEFAULT=10000/minute python site/backend/app.py
+"""
+
+import requests
+import os
+import sys
+import time
+import uuid
+
+# Configuration
+BASE_URL = os.getenv("AERIUM_URL", "http://localhost:5000")
+TEST_PASSWORD = "TestPassword123!"
+# REPORT_WAIT_TIMEOUT of the server, plus slack for the request itself
+MAX_EXPORT_SECONDS = float(os.getenv("REPORT_WAIT_TIMEOUT", 2)) + 3
+
+
+class TestRunner:
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.session = requests.Session()
+        self.results = {"passed": 0, "failed": 0, "errors": []}
+        self.job = None
+
+    def test(self, name, func):
+        """Run a test and track results"""
+        try:
+            print(f"\n🧪 Testing: {name}...", end=" ")
+            func()
+            print("✅ PASSED")
+            self.results["passed"] += 1
+            return True
+        except AssertionError as e:
+            print(f"❌ FAILED")
+            self.results["failed"] += 1
+            self.results["errors"].append(f"{name}: {str(e)}")
+            return False
+        except Exception as e:
+            print(f"⚠️  ERROR")
+            self.results["failed"] += 1
+            self.results["errors"].append(f"{name}: {str(e)}")
+            return False
+
+    def print_results(self):
+        """Print test results summary"""
+        total = self.results["passed"] + self.results["failed"]
+        print(f"\n{'='*60}")
+        print(f"📊 TEST RESULTS: {self.results['passed']}/{total} passed")
+        print(f"{'='*60}")
+
+        if self.results["errors"]:
+            print("\n❌ Failed Tests:")
+            for error in self.results["errors"]:
+                print(f"  - {error}")
+
+        return self.results["failed"] == 0
+
+    def login(self, session, prefix):
+        email = f"{prefix}-{uuid.uuid4().hex[:8]}@test.com"
+        response = session.post(f"{self.base_url}/api/auth/register", json={
+            "email": email, "password": TEST_PASSWORD
+        })
+        assert response.status_code == 201, f"Register returned {response.status_code}"
+        response = session.post(f"{self.base_url}/api/auth/login", json={
+            "email": email, "password": TEST_PASSWORD
+        })
+        assert response.status_code == 200, f"Login returned {response.status_code}"
+        session.headers["Authorization"] = f"Bearer {response.json()['access_token']}"
+
+    def wait_for(self, job):
+        deadline = time.time() + 60
+        while job["status"] in ("queued", "running"):
+            assert time.time() < deadline, f"Job {job['id']} still {job['status']} after 60s"
+            time.sleep(0.5)
+            response = self.session.get(f"{self.base_url}/api/reports/jobs/{job['id']}")
+            assert response.status_code == 200, f"Job poll returned {response.status_code}"
+            job = response.json()["job"]
+        return job
+
+    # ============== SETUP ==============
+
+    def test_setup(self):
+        self.login(self.session, "reports")
+        response = self.session.post(f"{self.base_url}/api/sensors", json={
+            "name": "Report test", "location": "Lab", "sensor_type": "real"
+        })
+        assert response.status_code == 201, f"Create sensor returned {response.status_code}"
+        sensor_id = int(response.json()["sensor"]["id"])
+        response = self.session.post(f"{self.base_url}/api/readings", json={
+            "sensor_id": sensor_id, "co2": 1500, "temperature": 22, "humidity": 45
+        })
+        assert response.status_code == 201, f"Add reading returned {response.status_code}"
+
+    # ============== REPORTS ==============
+
+    def test_export_does_not_block(self):
+        started = time.time()
+        response = self.session.get(f"{self.base_url}/api/reports/export/pdf", params={"days": 7})
+        elapsed = time.time() - started
+        assert elapsed < MAX_EXPORT_SECONDS, f"Export held the request for {elapsed:.1f}s"
+        if response.status_code == 202:
+            job = self.wait_for(response.json()["job"])
+            assert job["status"] == "done", f"Report job ended {job['status']}: {job['error']}"
+        else:
+            assert response.status_code == 200, f"Export returned {response.status_code}"
+            assert response.content.startswith(b"%PDF"), "Export did not return a PDF"
+
+    def test_job_poll_and_download(self):
+        response = self.session.post(f"{self.base_url}/api/reports/jobs", json={"type": "alerts_pdf", "days": 14})
+        assert response.status_code == 202, f"Queue job returned {response.status_code}"
+        self.job = self.wait_for(response.json()["job"])
+        assert self.job["status"] == "done", f"Report job ended {self.job['status']}: {self.job['error']}"
+        response = self.session.get(f"{self.base_url}{self.job['downloadUrl']}")
+        assert response.status_code == 200, f"Download returned {response.status_code}"
+        assert response.content.startswith(b"%PDF"), "Downloaded report is not a PDF"
+
+    def test_job_owned(self):
+        other = requests.Session()
+        self.login(other, "reports-other")
+        response = other.get(f"{self.base_url}/api/reports/jobs/{self.job['id']}")
+        assert response.status_code == 404, f"Another user's job returned {response.status_code}"
+
+
+def main():
+    print(f"🔗 Connecting to: {BASE_URL}")
+
+    tester = TestRunner(BASE_URL)
+
+    print("\n🔐 SETUP")
+    if not tester.test("Register, create a sensor and an alert", tester.test_setup):
+        tester.print_results()
+        return 1
+
+    print("\n📄 REPORT TESTS")
+    tester.test("PDF export answers without blocking", tester.test_export_does_not_block)
+    if tester.test("Job polled and downloaded", tester.test_job_poll_and_download):
+        tester.test("Jobs visible to their owner only", tester.test_job_owned)
+
+    success = tester.print_results()
+    return 0 if success else 1
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Test interrupted by user")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\n\n💥 Fatal error: {str(e)}")
+        sys.exit(1)
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Test the retention job against a temporary database
+Tests: raw readings purged with rollups kept, purged readings archived and
+still aggregated, resolved alerts purged, audit log purged, purge queries
+indexed, job off by default
+
+Runs in-process, no running server.
+"""
+
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "site" / "backend"
+DB_DIR = tempfile.mkdtemp(prefix="aerium-retention-")
+
+# Configure the app before it is imported: temporary database, short
+# retention windows, small chunks so a purge spans several transactions,
+# purged readings archived next to the database (needs pyarrow and duckdb).
+# RETENTION_ENABLED is left at its default.
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{DB_DIR}/retention.db",
+    "EMAIL_SENDER_THREADS": "0",
+    "READINGS_RETENTION_DAYS": "30",
+    "ROLLUP_MINUTE_RETENTION_DAYS": "7",
+    "ALERT_HISTORY_RETENTION_DAYS": "90",
+    "AUDIT_RETENTION_DAYS": "90",
+    "RETENTION_CHUNK_SIZE": "50",
+    "RETENTION_CHUNK_PAUSE": "0",
+    "ARCHIVE_ENABLED": "True",
+    "ARCHIVE_DIR": f"{DB_DIR}/archive",
+})
+os.environ.pop("RETENTION_ENABLED", None)
+sys.path.insert(0, str(BACKEND_DIR))
+os.chdir(DB_DIR)  # the app writes logs/ under the working directory
+
+from sqlalchemy import insert, text  # noqa: E402
+from flask_jwt_extended import create_access_token  # noqa: E402
+from app import app  # noqa: E402
+from auth_context import identity_claims  # noqa: E402
+from database import (  # noqa: E402
+    db, User, Sensor, SensorReading, SensorReadingMinute, SensorReadingHour, SensorReadingDay, AlertHistory
+)
+from audit_logger import AuditLog  # noqa: E402
+from ingest import on_readings_stored  # noqa: E402
+from retention import run_retention  # noqa: E402
+from scheduler import scheduler  # noqa: E402
+
+NOW = datetime.utcnow()
+OLD_DAY = (NOW - timedelta(days=40)).replace(hour=0, minute=0, second=0, microsecond=0)
+RECENT_DAY = (NOW - timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+class TestRunner:
+    def __init__(self):
+        self.results = {"passed": 0, "failed": 0, "errors": []}
+        self.user_id = None
+        self.sensor_id = None
+        self.summary = None
+
+    def test(self, name, func):
+        """Run a test and track results"""
+        try:
+            print(f"\n🧪 Testing: {name}...", end=" ")
+            with app.app_context():
+                func()
+            print("✅ PASSED")
+            self.results["passed"] += 1
+            return True
+        except AssertionError as e:
+            print(f"❌ FAILED")
+            self.results["failed"] += 1
+            self.results["errors"].append(f"{name}: {str(e)}")
+            return False
+        except Exception as e:
+            print(f"⚠️  ERROR")
+            self.results["failed"] += 1
+            self.results["errors"].append(f"{name}: {str(e)}")
+            return False
+        finally:
+            with app.app_context():
+                db.session.remove()
+
+    def print_results(self):
+        """Print test results summary"""
+        total = self.results["passed"] + self.results["failed"]
+        print(f"\n{'='*60}")
+        print(f"📊 TEST RESULTS: {self.results['passed']}/{total} passed")
+        print(f"{'='*60}")
+
+        if self.results["errors"]:
+            print("\n❌ Failed Tests:")
+            for error in self.results["errors"]:
+                print(f"  - {error}")
+
+        return self.results["failed"] == 0
+
+    def readings(self, start, end):
+        return SensorReading.query.filter(
+            SensorReading.sensor_id == self.sensor_id,
+            SensorReading.recorded_at >= start,
+            SensorReading.recorded_at < end
+        ).count()
+
+    @staticmethod
+    def query_plan(statement):
+        rows = db.session.execute(text(f"EXPLAIN QUERY PLAN {statement}")).all()
+        return " ".join(row[-1] for row in rows)
+
+    def get(self, path, **params):
+        user = User.query.get(self.user_id)
+        token = create_access_token(identity=str(user.id), additional_claims=identity_claims(user))
+        return app.test_client().get(path, query_string=params, headers={"Authorization": f"Bearer {token}"})
+
+    # ============== SETUP ==============
+
+    def test_seed(self):
+        user = User(email="retention@test.com", password_hash="x")
+        db.session.add(user)
+        db.session.flush()
+        self.user_id = user.id
+        sensor = Sensor(user_id=user.id, name="Salle 1", location="Lab", sensor_type="real")
+        db.session.add(sensor)
+        db.session.flush()
+        self.sensor_id = sensor.id
+
+        # 120 readings (every 6 minutes over 12 hours) on an old and a recent day
+        rows = [
+            {
+                "sensor_id": sensor.id,
+                "co2": 500 + minute % 300,
+                "temperature": 21.0,
+                "humidity": 45.0,
+                "recorded_at": day + timedelta(minutes=minute)
+            }
+            for day in (OLD_DAY, RECENT_DAY)
+            for minute in range(0, 720, 6)
+        ]
+        db.session.execute(insert(SensorReading), rows)
+        on_readings_stored(rows)
+
+        for days_ago, status in ((200, "resolved"), (200, "triggered"), (10, "resolved")):
+            db.session.add(AlertHistory(
+                sensor_id=sensor.id,
+                user_id=user.id,
+                alert_type="critique",
+                metric="co2",
+                metric_value=1500,
+                threshold_value=1200,
+                message=f"{status} {days_ago}d",
+                status=status,
+                created_at=NOW - timedelta(days=days_ago)
+            ))
+        for days_ago in (200, 10):
+            db.session.add(AuditLog(
+                user_id=user.id,
+                action="CREATE",
+                resource_type="SENSOR",
+                timestamp=NOW - timedelta(days=days_ago)
+            ))
+        db.session.commit()
+
+        assert self.readings(OLD_DAY, OLD_DAY + timedelta(days=1)) == 120, "Old readings not stored"
+        assert SensorReadingHour.query.filter_by(sensor_id=sensor.id).count() == 24, "Hourly rollups not built on ingest"
+
+    # ============== RETENTION RUN ==============
+
+    def test_run(self):
+        self.summary = run_retention(app)
+        assert self.summary.get("sensor_readings") == 120, f"Expected 120 raw readings purged, got {self.summary}"
+        assert self.summary.get("alert_history") == 1, f"Expected 1 alert purged, got {self.summary}"
+        assert self.summary.get("audit_log") == 1, f"Expected 1 audit entry purged, got {self.summary}"
+
+    def test_raw_readings_purged(self):
+        assert self.readings(OLD_DAY, OLD_DAY + timedelta(days=1)) == 0, "Old raw readings survived"
+        assert self.readings(RECENT_DAY, RECENT_DAY + timedelta(days=1)) == 120, "Recent raw readings were purged"
+
+    def test_aggregate_includes_archive(self):
+        response = self.get(
+            "/api/readings/aggregate",
+            start=OLD_DAY.isoformat(), end=NOW.isoformat(), group_by="sensor", bucket="1d"
+        )
+        assert response.status_code == 200, f"Aggregate returned {response.status_code}: {response.get_json()}"
+        data = response.get_json()
+        assert data["totalReadings"] == 240, f"Expected 240 readings (120 archived), got {data['totalReadings']}"
+        expected_avg = round(sum(500 + minute % 300 for minute in range(0, 720, 6)) / 120, 2)
+        assert data["avgCo2"] == expected_avg, f"Expected avgCo2 {expected_avg}, got {data['avgCo2']}"
+        group = data["groups"][0]
+        assert group["totalReadings"] == 240 and group["name"] == "Salle 1", f"Unexpected group {group}"
+        buckets = {point["bucket_start"]: point["totalReadings"] for point in group["buckets"]}
+        assert buckets == {OLD_DAY.isoformat(): 120, RECENT_DAY.isoformat(): 120}, f"Unexpected buckets {buckets}"
+
+    def test_rollups_kept(self):
+        old_hours = SensorReadingHour.query.filter(
+            SensorReadingHour.sensor_id == self.sensor_id,
+            SensorReadingHour.bucket_start < OLD_DAY + timedelta(days=1)
+        ).all()
+        assert len(old_hours) == 12, f"Expected 12 hourly rollups for the purged day, got {len(old_hours)}"
+        assert sum(hour.count for hour in old_hours) == 120, "Hourly rollups lost readings"
+        old_day = SensorReadingDay.query.filter_by(sensor_id=self.sensor_id, bucket_start=OLD_DAY).first()
+        assert old_day and old_day.count == 120, "Daily rollup of the purged day missing"
+
+        old_minutes = SensorReadingMinute.query.filter(SensorReadingMinute.bucket_start < RECENT_DAY).count()
+        recent_minutes = SensorReadingMinute.query.filter(SensorReadingMinute.bucket_start >= RECENT_DAY).count()
+        assert old_minutes == 0, f"{old_minutes} minute buckets older than ROLLUP_MINUTE_RETENTION_DAYS survived"
+        assert recent_minutes == 120, f"Expected 120 recent minute buckets, got {recent_minutes}"
+
+    def test_alerts_purged(self):
+        messages = sorted(alert.message for alert in AlertHistory.query.all())
+        assert messages == ["resolved 10d", "triggered 200d"], f"Unexpected alerts left: {messages}"
+
+    def test_audit_purged(self):
+        remaining = AuditLog.query.filter(AuditLog.timestamp < NOW - timedelta(days=90)).count()
+        assert remaining == 0, "Old audit entries survived"
+        assert AuditLog.query.count() == 1, "Recent audit entry was purged"
+
+    def test_second_run_is_noop(self):
+        summary = run_retention(app)
+        assert not any(value for key, value in summary.items() if key != "vacuumed_pages"), f"Second run deleted rows: {summary}"
+
+    # ============== INDEXES AND SCHEDULING ==============
+
+    def test_purge_queries_use_indexes(self):
+        cutoff = "'2000-01-01'"
+        plans = {
+            "ix_sensor_readings_recorded": "SELECT min(recorded_at) FROM sensor_readings",
+            "ix_alert_history_created_at": f"SELECT id FROM alert_history WHERE status = 'resolved' AND created_at < {cutoff}",
+            "ix_audit_log_timestamp": f"SELECT id FROM audit_log WHERE timestamp < {cutoff}",
+        }
+        for index, statement in plans.items():
+            plan = self.query_plan(statement)
+            assert index in plan, f"{index} not used: {plan}"
+
+    def test_job_disabled_by_default(self):
+        assert app.config["RETENTION_ENABLED"] is False, "RETENTION_ENABLED should default to False"
+        assert scheduler.get_job("run_retention") is None, "Retention job scheduled without RETENTION_ENABLED"
+
+
+def main():
+    print("\n🧹 RETENTION TESTS")
+    print(f"🔗 Database in {DB_DIR}")
+
+    tester = TestRunner()
+    if not tester.test("Seed readings, alerts and audit entries", tester.test_seed):
+        tester.print_results()
+        return 1
+
+    tester.test("Retention run", tester.test_run)
+    tester.test("Raw readings past READINGS_RETENTION_DAYS purged", tester.test_raw_readings_purged)
+    tester.test("Aggregates include archived readings", tester.test_aggregate_includes_archive)
+    tester.test("Rollups of purged days kept", tester.test_rollups_kept)
+    tester.test("Resolved alerts purged, open ones kept", tester.test_alerts_purged)
+    tester.test("Audit log purged", tester.test_audit_purged)
+    tester.test("Second run deletes nothing", tester.test_second_run_is_noop)
+    tester.test("Purge queries use their indexes", tester.test_purge_queries_use_indexes)
+    tester.test("Job disabled by default", tester.test_job_disabled_by_default)
+
+    success = tester.print_results()
+    return 0 if success else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
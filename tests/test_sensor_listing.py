@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Test the sensor listing via HTTP requests
+Tests: latest values in the listing, sort by CO2, keyset pagination, filters
+
+Run against a server started with rate limiting off:
+    ENABLE_RATE_LIMITING=False RATELIMIT_DEFAULT=10000/minute python site/backend/app.py
+"""
+
+import requests
+import os
+import sys
+import uuid
+from datetime import datetime, timedelta
+
+# Configuration
+BASE_URL = os.getenv("AERIUM_URL", "http://localhost:5000")
+TEST_PASSWORD = "TestPassword123!"
+
+
+class TestRunner:
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.session = requests.Session()
+        self.results = {"passed": 0, "failed": 0, "errors": []}
+        self.sensor_ids = []
+
+    def test(self, name, func):
+        """Run a test and track results"""
+        try:
+            print(f"\n🧪 Testing: {name}...", end=" ")
+            func()
+            print("✅ PASSED")
+            self.results["passed"] += 1
+            return True
+        except AssertionError as e:
+            print(f"❌ FAILED")
+            self.results["failed"] += 1
+            self.results["errors"].append(f"{name}: {str(e)}")
+            return False
+        except Exception as e:
+            print(f"⚠️  ERROR")
+            self.results["failed"] += 1
+            self.results["errors"].append(f"{name}: {str(e)}")
+            return False
+
+    def print_results(self):
+        """Print test results summary"""
+        total = self.results["passed"] + self.results["failed"]
+        print(f"\n{'='*60}")
+        print(f"📊 TEST RESULTS: {self.results['passed']}/{total} passed")
+        print(f"{'='*60}")
+
+        if self.results["errors"]:
+            print("\n❌ Failed Tests:")
+            for error in self.results["errors"]:
+                print(f"  - {error}")
+
+        return self.results["failed"] == 0
+
+    def listing(self, **params):
+        response = self.session.get(f"{self.base_url}/api/sensors", params=params)
+        assert response.status_code == 200, f"Listing returned {response.status_code}"
+        return response.json()
+
+    # ============== SETUP ==============
+
+    def test_setup(self):
+        email = f"listing-{uuid.uuid4().hex[:8]}@test.com"
+        response = self.session.post(f"{self.base_url}/api/auth/register", json={
+            "email": email, "password": TEST_PASSWORD
+        })
+        assert response.status_code == 201, f"Register returned {response.status_code}"
+        response = self.session.post(f"{self.base_url}/api/auth/login", json={
+            "email": email, "password": TEST_PASSWORD
+        })
+        assert response.status_code == 200, f"Login returned {response.status_code}"
+        self.session.headers["Authorization"] = f"Bearer {response.json()['access_token']}"
+
+        # Three real sensors at 600, 900 and 1100 ppm, and one without readings
+        recorded_at = (datetime.utcnow() - timedelta(minutes=5)).isoformat() + "Z"
+        readings = []
+        for index, co2 in enumerate((600, 900, 1100, None)):
+            response = self.session.post(f"{self.base_url}/api/sensors", json={
+                "name": f"Room {index}", "location": "Annex" if index == 1 else "Main", "sensor_type": "real"
+            })
+            assert response.status_code == 201, f"Create sensor returned {response.status_code}"
+            sensor_id = int(response.json()["sensor"]["id"])
+            self.sensor_ids.append(sensor_id)
+            if co2 is not None:
+                readings.append({
+                    "sensor_id": sensor_id, "co2": co2, "temperature": 21, "humidity": 45,
+                    "recorded_at": recorded_at
+                })
+        response = self.session.post(f"{self.base_url}/api/readings/batch", json=readings)
+        assert response.status_code == 201, f"Batch returned {response.status_code}"
+
+    # ============== LISTING ==============
+
+    def test_latest_values(self):
+        sensors = {int(sensor["id"]): sensor for sensor in self.listing()["sensors"]}
+        assert len(sensors) == 4, f"Expected 4 sensors, got {len(sensors)}"
+        co2 = sensors[self.sensor_ids[2]]["co2"]
+        assert co2 == 1100, f"Latest CO2 missing from the listing: {co2}"
+
+    def test_sort_by_co2(self):
+        ids = [int(sensor["id"]) for sensor in self.listing(sort="co2")["sensors"]]
+        expected = [self.sensor_ids[2], self.sensor_ids[1], self.sensor_ids[0], self.sensor_ids[3]]
+        assert ids == expected, f"Not sorted by CO2 (no reading last): {ids}"
+
+    def test_cursor_pagination(self):
+        for sort in ("co2", "name"):
+            single = [int(sensor["id"]) for sensor in self.listing(sort=sort)["sensors"]]
+            seen = []
+            cursor = None
+            for _ in range(10):
+                params = {"sort": sort, "limit": 1}
+                if cursor:
+                    params["cursor"] = cursor
+                data = self.listing(**params)
+                seen.extend(int(sensor["id"]) for sensor in data["sensors"])
+                cursor = data["next_cursor"]
+                if not cursor:
+                    break
+            assert seen == single, f"sort={sort}: pages {seen} differ from one page {single}"
+
+        response = self.session.get(f"{self.base_url}/api/sensors", params={"sort": "co2", "cursor": "garbage"})
+        assert response.status_code == 400, f"Bad cursor should be 400, got {response.status_code}"
+
+    def test_search_filter(self):
+        ids = [int(sensor["id"]) for sensor in self.listing(search="Annex")["sensors"]]
+        assert ids == [self.sensor_ids[1]], f"Search by location returned {ids}"
+
+
+def main():
+    print(f"🔗 Connecting to: {BASE_URL}")
+
+    tester = TestRunner(BASE_URL)
+
+    print("\n🔐 SETUP")
+    if not tester.test("Register, create sensors and readings", tester.test_setup):
+        tester.print_results()
+        return 1
+
+    print("\n📟 SENSOR LISTING TESTS")
+    tester.test("Latest values in the listing", tester.test_latest_values)
+    tester.test("Sort by CO2", tester.test_sort_by_co2)
+    tester.test("Cursor pagination", tester.test_cursor_pagination)
+    tester.test("Search filter", tester.test_search_filter)
+
+    success = tester.print_results()
+    return 0 if success else 1
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Test interrupted by user")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\n\n💥 Fatal error: {str(e)}")
+        sys.exit(1)
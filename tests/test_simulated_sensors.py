@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Test simulated sensors via HTTP requests
+Tests: computed latest reading and history, no rows written on read,
+ranking by computed CO2 in the sensor listing
+
+Run against a server started with rate limiting off:
+    ENABLE_RATE_LIMITING=False RATELIMIT_DEFAULT=10000/minute python site/backend/app.py
+"""
+
+import requests
+import os
+import sys
+import uuid
+from datetime import datetime, timedelta
+
+# Configuration
+BASE_URL = os.getenv("AERIUM_URL", "http://localhost:5000")
+TEST_PASSWORD = "TestPassword123!"
+
+
+class TestRunner:
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.session = requests.Session()
+        self.results = {"passed": 0, "failed": 0, "errors": []}
+        self.simulated_id = None
+        self.real_ids = []
+
+    def test(self, name, func):
+        """Run a test and track results"""
+        try:
+            print(f"\n🧪 Testing: {name}...", end=" ")
+            func()
+            print("✅ PASSED")
+            self.results["passed"] += 1
+            return True
+        except AssertionError as e:
+            print(f"❌ FAILED")
+            self.results["failed"] += 1
+            self.results["errors"].append(f"{name}: {str(e)}")
+            return False
+        except Exception as e:
+            print(f"⚠️  ERROR")
+            self.results["failed"] += 1
+            self.results["errors"].append(f"{name}: {str(e)}")
+            return False
+
+    def print_results(self):
+        """Print test results summary"""
+        total = self.results["passed"] + self.results["failed"]
+        print(f"\n{'='*60}")
+        print(f"📊 TEST RESULTS: {self.results['passed']}/{total} passed")
+        print(f"{'='*60}")
+
+        if self.results["errors"]:
+            print("\n❌ Failed Tests:")
+            for error in self.results["errors"]:
+                print(f"  - {error}")
+
+        return self.results["failed"] == 0
+
+    def get(self, path, **params):
+        response = self.session.get(f"{self.base_url}{path}", params=params)
+        assert response.status_code == 200, f"{path} returned {response.status_code}"
+        return response.json()
+
+    def create_sensor(self, name, sensor_type):
+        response = self.session.post(f"{self.base_url}/api/sensors", json={
+            "name": name, "location": "Lab", "sensor_type": sensor_type
+        })
+        assert response.status_code == 201, f"Create sensor returned {response.status_code}"
+        return int(response.json()["sensor"]["id"])
+
+    # ============== SETUP ==============
+
+    def test_setup(self):
+        email = f"simulated-{uuid.uuid4().hex[:8]}@test.com"
+        response = self.session.post(f"{self.base_url}/api/auth/register", json={
+            "email": email, "password": TEST_PASSWORD
+        })
+        assert response.status_code == 201, f"Register returned {response.status_code}"
+        response = self.session.post(f"{self.base_url}/api/auth/login", json={
+            "email": email, "password": TEST_PASSWORD
+        })
+        assert response.status_code == 200, f"Login returned {response.status_code}"
+        self.session.headers["Authorization"] = f"Bearer {response.json()['access_token']}"
+
+        self.simulated_id = self.create_sensor("Simulated room", "simulation")
+
+        # Real sensors above and below any simulated CO2 value
+        recorded_at = (datetime.utcnow() - timedelta(minutes=5)).isoformat() + "Z"
+        readings = []
+        for name, co2 in (("High", 4900), ("Low", 50)):
+            sensor_id = self.create_sensor(name, "real")
+            self.real_ids.append(sensor_id)
+            readings.append({"sensor_id": sensor_id, "co2": co2, "temperature": 21, "humidity": 45,
+                             "recorded_at": recorded_at})
+        response = self.session.post(f"{self.base_url}/api/readings/batch", json=readings)
+        assert response.status_code == 201, f"Batch returned {response.status_code}"
+
+    # ============== READ-ONLY PROVIDER ==============
+
+    def test_latest_computed(self):
+        reading = self.get(f"/api/readings/latest/{self.simulated_id}")["reading"]
+        assert 300 <= reading["co2"] <= 3000, f"Implausible simulated CO2 {reading['co2']}"
+        sensor = self.get(f"/api/sensors/{self.simulated_id}")["sensor"]
+        assert sensor["sensor_type"] == "simulation", "Wrong sensor type"
+
+    def test_history_computed(self):
+        readings = self.get(f"/api/readings/sensor/{self.simulated_id}", hours=6)["readings"]
+        assert len(readings) >= 12, f"Expected simulated history, got {len(readings)} readings"
+        times = [reading["recorded_at"] for reading in readings]
+        assert times == sorted(times, reverse=True), "Simulated history should be most recent first"
+        assert all("id" in reading and reading["sensor_id"] == self.simulated_id for reading in readings), \
+            f"Simulated history not shaped like stored readings: {readings[0]}"
+        empty = self.get(f"/api/readings/sensor/{self.simulated_id}", hours=0)["readings"]
+        assert empty == [], f"Empty window should give no readings, got {len(empty)}"
+
+    def test_reads_store_nothing(self):
+        for _ in range(3):
+            self.get("/api/sensors")
+            self.get(f"/api/sensors/{self.simulated_id}")
+            self.get(f"/api/readings/latest/{self.simulated_id}")
+        response = self.session.get(f"{self.base_url}/api/reports/export/readings.csv", params={
+            "sensor_id": self.simulated_id, "days": 1
+        })
+        assert response.status_code == 200, f"Export returned {response.status_code}"
+        rows = [line for line in response.text.splitlines()[1:] if line]
+        assert not rows, f"{len(rows)} readings stored for a simulated sensor"
+
+    # ============== LISTING ==============
+
+    def test_ranked_by_computed_co2(self):
+        ids = [int(sensor["id"]) for sensor in self.get("/api/sensors", sort="co2")["sensors"]]
+        expected = [self.real_ids[0], self.simulated_id, self.real_ids[1]]
+        assert ids == expected, f"Simulated sensor not ranked on its computed CO2: {ids}"
+
+    def test_cursor_with_simulated(self):
+        seen = []
+        cursor = None
+        for _ in range(10):
+            params = {"sort": "co2", "limit": 1}
+            if cursor:
+                params["cursor"] = cursor
+            data = self.get("/api/sensors", **params)
+            seen.extend(int(sensor["id"]) for sensor in data["sensors"])
+            cursor = data["next_cursor"]
+            if not cursor:
+                break
+        expected = [self.real_ids[0], self.simulated_id, self.real_ids[1]]
+        assert seen == expected, f"Pages skipped or repeated sensors: {seen}"
+
+
+def main():
+    print(f"🔗 Connecting to: {BASE_URL}")
+
+    tester = TestRunner(BASE_URL)
+
+    print("\n🔐 SETUP")
+    if not tester.test("Register and create sensors", tester.test_setup):
+        tester.print_results()
+        return 1
+
+    print("\n🤖 SIMULATED SENSOR TESTS")
+    tester.test("Latest reading computed", tester.test_latest_computed)
+    tester.test("History computed", tester.test_history_computed)
+    tester.test("Reads store no rows", tester.test_reads_store_nothing)
+    tester.test("Ranked by computed CO2", tester.test_ranked_by_computed_co2)
+    tester.test("Cursor pagination across simulated sensors", tester.test_cursor_with_simulated)
+
+    success = tester.print_results()
+    return 0 if success else 1
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Test interrupted by user")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\n\n💥 Fatal error: {str(e)}")
+        sys.exit(1)